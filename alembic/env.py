@@ -4,6 +4,7 @@ from pathlib import Path
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from dynaconf import settings
+import re
 import sys
 
 from alembic import context
@@ -39,6 +40,15 @@ sys.path.append(str(MODEL_PATH))
 from billing.db.models import metadata
 target_metadata = metadata
 
+# Partitions of partitioned tables are created by billing.jobs.partitions
+PARTITION_NAME = re.compile(r'^(transaction|transaction_log)_(\d{6}|default)$')
+
+
+def include_object(object_, name, type_, reflected, compare_to):
+    """Skip partitions on autogenerate."""
+    return not (type_ == 'table' and reflected and PARTITION_NAME.match(name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -61,6 +71,7 @@ def run_migrations_offline():
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -84,7 +95,9 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
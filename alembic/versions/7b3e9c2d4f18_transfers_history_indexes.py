@@ -0,0 +1,31 @@
+"""transfers history indexes
+
+Revision ID: 7b3e9c2d4f18
+Revises: 6d2f8b1a4c93
+Create Date: 2026-10-18 18:05:37.514902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9c2d4f18'
+down_revision = '6d2f8b1a4c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Indexes of big tables are built without write locks
+    with op.get_context().autocommit_block():
+        op.create_index('transaction_from_wallet_id_created_at_idx', 'transaction', ['from_wallet_id', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('transaction_to_wallet_id_created_at_idx', 'transaction', ['to_wallet_id', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('transaction_log_transaction_id_idx', 'transaction_log', ['transaction_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('transaction_log_transaction_id_idx', table_name='transaction_log', postgresql_concurrently=True)
+        op.drop_index('transaction_to_wallet_id_created_at_idx', table_name='transaction', postgresql_concurrently=True)
+        op.drop_index('transaction_from_wallet_id_created_at_idx', table_name='transaction', postgresql_concurrently=True)
@@ -0,0 +1,218 @@
+"""partition transaction and transaction_log by month
+
+Revision ID: 9f2a6c8e1d54
+Revises: 7b3e9c2d4f18
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2a6c8e1d54'
+down_revision = '7b3e9c2d4f18'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions are created in advance for this count of months
+# (next ones are created by billing.jobs.partitions)
+MONTHS_AHEAD = 3
+
+TRANSACTION_COLUMNS = (
+    'id, from_wallet_id, to_wallet_id, state, amount, created_at, '
+    'updated_at, new_balance_from, new_balance_to, exchange_from_rate, '
+    'exchange_to_rate, exchange_rates_snapshot_id, failed_reason'
+)
+TRANSACTION_LOG_COLUMNS = 'id, transaction_id, state, comment, created_at'
+
+HISTORY_INDEXES = (
+    ('transaction_from_wallet_id_created_at_idx', 'transaction', ['from_wallet_id', 'created_at']),
+    ('transaction_to_wallet_id_created_at_idx', 'transaction', ['to_wallet_id', 'created_at']),
+    ('transaction_log_transaction_id_idx', 'transaction_log', ['transaction_id']),
+)
+
+
+def transaction_state():
+    return postgresql.ENUM(name='transactionstate', create_type=False)
+
+
+def transaction_columns(**id_kwargs):
+    return [
+        sa.Column('id', sa.Integer(), nullable=False, **id_kwargs),
+        sa.Column('from_wallet_id', sa.Integer(), nullable=False),
+        sa.Column('to_wallet_id', sa.Integer(), nullable=False),
+        sa.Column('state', transaction_state(), nullable=False),
+        sa.Column('amount', sa.Numeric(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('new_balance_from', sa.Numeric(), nullable=True),
+        sa.Column('new_balance_to', sa.Numeric(), nullable=True),
+        sa.Column('exchange_from_rate', sa.Numeric(), nullable=True),
+        sa.Column('exchange_to_rate', sa.Numeric(), nullable=True),
+        sa.Column('exchange_rates_snapshot_id', sa.BigInteger(), nullable=True),
+        sa.Column('failed_reason', postgresql.ENUM(name='failedreason', create_type=False), nullable=True),
+        sa.ForeignKeyConstraint(['from_wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['to_wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    ]
+
+
+def transaction_log_columns(**id_kwargs):
+    return [
+        sa.Column('id', sa.Integer(), nullable=False, **id_kwargs),
+        sa.Column('transaction_id', sa.Integer(), nullable=False),
+        sa.Column('state', transaction_state(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def sequence_default(table_name):
+    return {
+        'server_default': sa.text(
+            "nextval('{0}_id_seq'::regclass)".format(table_name),
+        ),
+    }
+
+
+def create_month_partitions(table_name, source_table_name):
+    """Partitions from first month of source rows to MONTHS_AHEAD months."""
+    op.execute(
+        'CREATE TABLE {0}_default PARTITION OF "{0}" DEFAULT'.format(table_name),
+    )
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc(
+                        'month',
+                        least(
+                            (SELECT min(created_at) FROM {1}),
+                            now()
+                        )
+                    ),
+                    date_trunc('month', now()) + interval '{2} months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    '{0}_' || to_char(month, 'YYYYMM'),
+                    '{0}',
+                    month,
+                    month + 1 * interval '1 month'
+                );
+            END LOOP;
+        END
+        $$
+        """.format(table_name, source_table_name, MONTHS_AHEAD),
+    )
+
+
+def move_table(table_name, new_table_name, columns):
+    """Copy rows, move id sequence and drop old table."""
+    op.execute(
+        'INSERT INTO "{1}" ({2}) SELECT {2} FROM "{0}"'.format(
+            table_name,
+            new_table_name,
+            columns,
+        ),
+    )
+    op.execute(
+        'ALTER SEQUENCE {0}_id_seq OWNED BY "{0}".id'.format(
+            new_table_name,
+        ),
+    )
+    op.drop_table(table_name)
+
+
+def create_history_indexes():
+    for index_name, table_name, columns in HISTORY_INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False)
+
+
+def drop_history_indexes():
+    for index_name, table_name, _ in HISTORY_INDEXES:
+        op.drop_index(index_name, table_name=table_name)
+
+
+def upgrade():
+    op.drop_constraint(
+        'transaction_log_transaction_id_fkey',
+        'transaction_log',
+        type_='foreignkey',
+    )
+    drop_history_indexes()
+    for table_name in ('transaction', 'transaction_log'):
+        op.rename_table(table_name, '{0}_unpartitioned'.format(table_name))
+        op.execute(
+            'ALTER INDEX {0}_pkey RENAME TO {0}_unpartitioned_pkey'.format(
+                table_name,
+            ),
+        )
+
+    op.create_table(
+        'transaction',
+        *transaction_columns(**sequence_default('transaction')),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    op.create_table(
+        'transaction_log',
+        *transaction_log_columns(**sequence_default('transaction_log')),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    create_history_indexes()
+    create_month_partitions('transaction', 'transaction_unpartitioned')
+    create_month_partitions('transaction_log', 'transaction_log_unpartitioned')
+    move_table('transaction_unpartitioned', 'transaction', TRANSACTION_COLUMNS)
+    move_table(
+        'transaction_log_unpartitioned',
+        'transaction_log',
+        TRANSACTION_LOG_COLUMNS,
+    )
+
+
+def downgrade():
+    drop_history_indexes()
+    for table_name in ('transaction', 'transaction_log'):
+        op.rename_table(table_name, '{0}_partitioned'.format(table_name))
+        op.execute(
+            'ALTER INDEX {0}_pkey RENAME TO {0}_partitioned_pkey'.format(
+                table_name,
+            ),
+        )
+
+    op.create_table(
+        'transaction',
+        *transaction_columns(**sequence_default('transaction')),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'transaction_log',
+        *transaction_log_columns(**sequence_default('transaction_log')),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Partitions are dropped with partitioned tables
+    move_table('transaction_partitioned', 'transaction', TRANSACTION_COLUMNS)
+    move_table(
+        'transaction_log_partitioned',
+        'transaction_log',
+        TRANSACTION_LOG_COLUMNS,
+    )
+    op.create_foreign_key(
+        'transaction_log_transaction_id_fkey',
+        'transaction_log',
+        'transaction',
+        ['transaction_id'],
+        ['id'],
+        onupdate='CASCADE',
+        ondelete='CASCADE',
+    )
+    create_history_indexes()
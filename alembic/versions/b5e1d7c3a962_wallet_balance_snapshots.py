@@ -0,0 +1,92 @@
+"""wallet top ups and balance snapshots
+
+Revision ID: b5e1d7c3a962
+Revises: 9f2a6c8e1d54
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d7c3a962'
+down_revision = '9f2a6c8e1d54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('transaction', sa.Column('credit_amount', sa.Numeric(), nullable=True))
+    op.create_table('wallet_top_up',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('wallet_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('wallet_top_up_created_at_idx', 'wallet_top_up', ['created_at'], unique=False)
+    op.create_index('wallet_top_up_wallet_id_created_at_idx', 'wallet_top_up', ['wallet_id', 'created_at'], unique=False)
+    op.create_table('wallet_balance_snapshot',
+    sa.Column('wallet_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('closing_balance', sa.Numeric(), nullable=False),
+    sa.Column('in_total', sa.Numeric(), nullable=False),
+    sa.Column('out_total', sa.Numeric(), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('wallet_id', 'day')
+    )
+    op.create_index('wallet_balance_snapshot_day_idx', 'wallet_balance_snapshot', ['day'], unique=False)
+
+    # Credits of executed transfers by their rates
+    # (transfers executed from now store exact credited amount)
+    op.execute(
+        """
+        UPDATE "transaction"
+        SET credit_amount = amount * exchange_from_rate / exchange_to_rate
+        WHERE state = 'SUCCESED'
+        """
+    )
+    # Top ups made before are not recorded: balance which is not explained
+    # by transfers is recorded as top up before first transfer of wallet
+    op.execute(
+        """
+        WITH movements AS (
+            SELECT to_wallet_id AS wallet_id, credit_amount AS credit,
+                0 AS debit, created_at
+            FROM "transaction" WHERE state = 'SUCCESED'
+            UNION ALL
+            SELECT from_wallet_id, 0, amount, created_at
+            FROM "transaction" WHERE state = 'SUCCESED'
+        ),
+        wallet_movements AS (
+            SELECT wallet_id, sum(credit) - sum(debit) AS total,
+                min(created_at) AS first_at
+            FROM movements GROUP BY wallet_id
+        )
+        INSERT INTO wallet_top_up (wallet_id, amount, created_at)
+        SELECT
+            wallet.id,
+            wallet.balance
+            + coalesce(
+                (SELECT sum(balance) FROM wallet_shard
+                 WHERE wallet_shard.wallet_id = wallet.id),
+                0
+            )
+            - coalesce(wallet_movements.total, 0),
+            coalesce(wallet_movements.first_at, now())
+        FROM wallet
+        LEFT JOIN wallet_movements ON wallet_movements.wallet_id = wallet.id
+        """
+    )
+    op.execute('DELETE FROM wallet_top_up WHERE amount = 0')
+
+
+def downgrade():
+    op.drop_index('wallet_balance_snapshot_day_idx', table_name='wallet_balance_snapshot')
+    op.drop_table('wallet_balance_snapshot')
+    op.drop_index('wallet_top_up_wallet_id_created_at_idx', table_name='wallet_top_up')
+    op.drop_index('wallet_top_up_created_at_idx', table_name='wallet_top_up')
+    op.drop_table('wallet_top_up')
+    op.drop_column('transaction', 'credit_amount')
@@ -0,0 +1,72 @@
+"""wallet balance changes notifications
+
+Revision ID: d3f8a1b6c5e7
+Revises: b5e1d7c3a962
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a1b6c5e7'
+down_revision = 'b5e1d7c3a962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE FUNCTION notify_wallet_balance() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('wallet_balance', changed.user_id::text)
+            FROM (
+                SELECT DISTINCT new_wallet.user_id
+                FROM new_wallet
+                JOIN old_wallet ON old_wallet.id = new_wallet.id
+                WHERE old_wallet.balance <> new_wallet.balance
+            ) AS changed;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER wallet_balance_notify AFTER UPDATE ON wallet
+        REFERENCING OLD TABLE AS old_wallet NEW TABLE AS new_wallet
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_wallet_balance()
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION notify_wallet_shard_balance() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('wallet_balance', changed.user_id::text)
+            FROM (
+                SELECT DISTINCT wallet.user_id
+                FROM new_shard
+                JOIN wallet ON wallet.id = new_shard.wallet_id
+            ) AS changed;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER wallet_shard_balance_notify AFTER UPDATE ON wallet_shard
+        REFERENCING NEW TABLE AS new_shard
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_wallet_shard_balance()
+        """
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER wallet_shard_balance_notify ON wallet_shard')
+    op.execute('DROP FUNCTION notify_wallet_shard_balance()')
+    op.execute('DROP TRIGGER wallet_balance_notify ON wallet')
+    op.execute('DROP FUNCTION notify_wallet_balance()')
@@ -0,0 +1,55 @@
+"""transaction logs notifications
+
+Revision ID: e6a2c4f8b9d1
+Revises: d3f8a1b6c5e7
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c4f8b9d1'
+down_revision = 'd3f8a1b6c5e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE FUNCTION notify_transaction_log() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'transaction_log',
+                json_build_object(
+                    'id', new_log.id,
+                    'transaction_id', new_log.transaction_id,
+                    'from_wallet_id', "transaction".from_wallet_id,
+                    'to_wallet_id', "transaction".to_wallet_id,
+                    'amount', "transaction".amount::text,
+                    'state', new_log.state,
+                    'comment', new_log.comment,
+                    'created_at', new_log.created_at
+                )::text
+            )
+            FROM new_log
+            JOIN "transaction" ON "transaction".id = new_log.transaction_id;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transaction_log_notify AFTER INSERT ON transaction_log
+        REFERENCING NEW TABLE AS new_log
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_transaction_log()
+        """
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER transaction_log_notify ON transaction_log')
+    op.execute('DROP FUNCTION notify_transaction_log()')
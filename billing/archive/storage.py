@@ -0,0 +1,212 @@
+"""Cold archive of finished transactions.
+
+Archived transactions (with their logs) are written to append-only
+segment files in settings.ARCHIVE.path:
+
+    segments/<segment>.gz   - gzip member per wallet with ndjson
+                              transactions from and to wallet
+    wallets/<wallet_id>.ndjson - index of wallet: segment, offset
+                              and length of wallet member,
+                              created_at of its first and last transactions
+
+Transactions of wallet are read by its index: only members of wallet
+which overlap requested range are read and decompressed.
+Segments and index entries are never changed: archived transaction
+can be written twice if archivation fails after write
+(readers skip duplicates).
+"""
+
+import asyncio
+import fcntl
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from aiohttp.web_app import Application
+from dynaconf import settings
+
+# (created_at, id) of archived transaction
+ArchivePosition = Tuple[datetime, int]
+
+
+def archive_position(archived: Dict[str, Any]) -> ArchivePosition:
+    """Position of archived transaction in history order."""
+    return (datetime.fromisoformat(archived['created_at']), archived['id'])
+
+
+def _encode(archived: Iterable[Dict[str, Any]]) -> bytes:
+    return ''.join(
+        '{0}\n'.format(json.dumps(transaction, default=str))
+        for transaction in archived
+    ).encode()
+
+
+def _decode(member: bytes) -> List[Dict[str, Any]]:
+    return [
+        json.loads(line)
+        for line in gzip.decompress(member).decode().splitlines()
+    ]
+
+
+def _fsync_dir(path: Path) -> None:
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:  # NOQA: WPS501
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class ArchiveStorage:
+    """Segments of archived transactions on local disk."""
+
+    def __init__(self, path: str) -> None:
+        """Init archive in directory path."""
+        self.path = Path(path)
+        self.segments_path = self.path / 'segments'
+        self.wallets_path = self.path / 'wallets'
+
+    async def write_segment(self, transactions: List[Dict[str, Any]]) -> str:
+        """Write new segment of transactions.
+
+        Segment and index entries are synced to disk on return.
+
+        :param transactions: transactions ordered by (created_at, id),
+            values are json serializable or converted by str
+        :return: segment name
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            partial(self._write_segment, transactions),
+        )
+
+    async def wallet_transactions(
+        self,
+        *,
+        wallet_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[ArchivePosition] = None,
+    ) -> List[Dict[str, Any]]:
+        """Archived transactions from and to wallet.
+
+        :return: transactions ordered by (created_at, id)
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            partial(
+                self._wallet_transactions,
+                wallet_id=wallet_id,
+                start=start,
+                end=end,
+                after=after,
+            ),
+        )
+
+    def _index_path(self, wallet_id: int) -> Path:
+        return self.wallets_path / '{0}.ndjson'.format(wallet_id)
+
+    def _write_segment(self, transactions: List[Dict[str, Any]]) -> str:
+        by_wallets: Dict[int, List[Dict[str, Any]]] = {}
+        for transaction in transactions:
+            wallet_ids = {
+                transaction['from_wallet_id'],
+                transaction['to_wallet_id'],
+            }
+            for wallet_id in wallet_ids:
+                by_wallets.setdefault(wallet_id, []).append(transaction)
+
+        self.segments_path.mkdir(parents=True, exist_ok=True)
+        self.wallets_path.mkdir(parents=True, exist_ok=True)
+        segment = '{0:%Y%m%d%H%M%S}-{1}'.format(
+            datetime.utcnow(),
+            uuid.uuid4().hex[:8],
+        )
+        segment_path = self.segments_path / '{0}.gz'.format(segment)
+        tmp_path = segment_path.with_suffix('.tmp')
+        index_entries = []
+        with open(tmp_path, 'wb') as segment_file:
+            for wallet_id, wallet_transactions in by_wallets.items():
+                member = gzip.compress(_encode(wallet_transactions))
+                index_entries.append((wallet_id, {
+                    'segment': segment,
+                    'offset': segment_file.tell(),
+                    'length': len(member),
+                    'first': str(wallet_transactions[0]['created_at']),
+                    'last': str(wallet_transactions[-1]['created_at']),
+                }))
+                segment_file.write(member)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        os.rename(tmp_path, segment_path)
+        _fsync_dir(self.segments_path)
+
+        for wallet_id, index_entry in index_entries:  # NOQA: WPS440
+            with open(self._index_path(wallet_id), 'a') as index_file:
+                # Entries of concurrent archivations are not mixed
+                fcntl.flock(index_file, fcntl.LOCK_EX)
+                index_file.write('{0}\n'.format(json.dumps(index_entry)))
+                index_file.flush()
+                os.fsync(index_file.fileno())
+        _fsync_dir(self.wallets_path)
+        return segment
+
+    def _wallet_transactions(
+        self,
+        *,
+        wallet_id: int,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        after: Optional[ArchivePosition],
+    ) -> List[Dict[str, Any]]:
+        try:
+            with open(self._index_path(wallet_id)) as index_file:
+                index_entries = [json.loads(line) for line in index_file]
+        except FileNotFoundError:
+            return []
+
+        lower = start
+        if after is not None and (lower is None or after[0] > lower):
+            lower = after[0]
+        transactions: Dict[int, Dict[str, Any]] = {}
+        for index_entry in index_entries:
+            first = datetime.fromisoformat(index_entry['first'])
+            last = datetime.fromisoformat(index_entry['last'])
+            if lower is not None and last < lower:
+                continue
+            if end is not None and first > end:
+                continue
+            segment_path = self.segments_path / '{0}.gz'.format(
+                index_entry['segment'],
+            )
+            with open(segment_path, 'rb') as segment_file:
+                segment_file.seek(index_entry['offset'])
+                member = segment_file.read(index_entry['length'])
+            for transaction in _decode(member):
+                created_at, _ = position = archive_position(transaction)
+                if start is not None and created_at < start:
+                    continue
+                if end is not None and created_at > end:
+                    continue
+                if after is not None and position <= after:
+                    continue
+                transactions[transaction['id']] = transaction
+        return sorted(transactions.values(), key=archive_position)
+
+
+async def init_archive(app: Application) -> None:
+    """Create transactions archive of app."""
+    app['archive'] = ArchiveStorage(settings.ARCHIVE.path)
@@ -2,7 +2,16 @@
 
 import asyncio
 import random
+import time
+from collections import Counter
 from decimal import Decimal
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
 
 from dynaconf import settings
 
@@ -13,12 +22,13 @@ async def get_currency_rate(currency_name: str) -> Decimal:
     Return random currency rate to USD base
     """
     # Its not suitable for security, but its mock function...
-    random.seed(settings.RANDOM_SEED)  # NOQA:S311
+    # Own generator: dont reseed global random.
+    rate_random = random.Random(settings.RANDOM_SEED)  # NOQA:S311
 
     # For transfer state system we need emulate api delay.
     # For testing we dont want wait sleeping time.
     if settings.TESTING is False:
-        await asyncio.sleep(random.uniform(1, 5))  # NOQA:S311
+        await asyncio.sleep(rate_random.uniform(1, 5))  # NOQA:S311
 
     # default currency rates
     default_currencies = {
@@ -36,5 +46,123 @@ async def get_currency_rate(currency_name: str) -> Decimal:
 
     default_currency = default_currencies[currency_name]
 
-    currency = default_currency * random.uniform(1.0, 1.05)  # NOQA:S311
+    currency = default_currency * rate_random.uniform(1.0, 1.05)  # NOQA:S311
     return Decimal(currency)
+
+
+class CurrencyRateCache:
+    """Currency rates cache.
+
+    Cached rate is fresh for `ttl` seconds. If rates api fails,
+    cached rate can be used up to `max_staleness` seconds.
+    Concurrent misses for the same currency share one api request.
+
+    Stats:
+    - hits: fresh rate from cache
+    - misses: rates api requests
+    - collapsed: waiting for already running api request
+    - stale: stale rate returned after api error
+    """
+
+    def __init__(
+        self,
+        get_rate: Callable[[str], Awaitable[Decimal]],
+        *,
+        ttl: Optional[float] = None,
+        max_staleness: Optional[float] = None,
+    ) -> None:
+        """Init cache.
+
+        By default ttl and max_staleness are taken from
+        settings.CURRENCY_RATE.
+        """
+        self._get_rate = get_rate
+        self._ttl = ttl
+        self._max_staleness = max_staleness
+        # currency -> (monotonic time of request, rate)
+        self._rates: Dict[str, Tuple[float, Decimal]] = {}
+        self._requests: Dict[str, 'asyncio.Future[Decimal]'] = {}
+        self.stats: Counter = Counter()
+
+    @property
+    def ttl(self) -> float:
+        """Seconds while cached rate is fresh."""
+        if self._ttl is None:
+            return float(settings.CURRENCY_RATE.ttl)
+        return self._ttl
+
+    @property
+    def max_staleness(self) -> float:
+        """Seconds while cached rate can be used on api errors."""
+        if self._max_staleness is None:
+            return float(settings.CURRENCY_RATE.max_staleness)
+        return self._max_staleness
+
+    async def get(self, currency_name: str) -> Decimal:
+        """Get currency rate."""
+        cached = self._rates.get(currency_name)
+        if cached is not None:
+            cached_age = time.monotonic() - cached[0]
+            if cached_age < self.ttl:
+                self.stats['hits'] += 1
+                return cached[1]
+
+        request = self._requests.get(currency_name)
+        if request is None:
+            self.stats['misses'] += 1
+            request = asyncio.ensure_future(self._request(currency_name))
+            self._requests[currency_name] = request
+            request.add_done_callback(self._request_done)
+        else:
+            self.stats['collapsed'] += 1
+
+        try:
+            # One waiter cancellation must not cancel shared request
+            return await asyncio.shield(request)
+        except Exception:
+            if cached is None:
+                raise
+            cached_age = time.monotonic() - cached[0]
+            if cached_age >= self.max_staleness:
+                raise
+            self.stats['stale'] += 1
+            return cached[1]
+
+    def clear(self) -> None:
+        """Clear cached rates."""
+        self._rates.clear()
+
+    async def _request(self, currency_name: str) -> Decimal:
+        try:  # NOQA: WPS501
+            currency_rate = await self._get_rate(currency_name)
+        finally:
+            self._requests.pop(currency_name, None)
+        self._rates[currency_name] = (time.monotonic(), currency_rate)
+        return currency_rate
+
+    def _request_done(self, request: 'asyncio.Future[Decimal]') -> None:
+        # Mark exception retrieved: all waiters could be cancelled.
+        if not request.cancelled():
+            request.exception()
+
+
+currency_rate_cache = CurrencyRateCache(get_currency_rate)
+
+
+async def get_cached_currency_rate(currency_name: str) -> Decimal:
+    """Currency rate from cache."""
+    return await currency_rate_cache.get(currency_name)
+
+
+async def get_currency_rates(*currency_names: str) -> Tuple[Decimal, ...]:
+    """Currency rates.
+
+    Rates are requested concurrently (and cached).
+    """
+    currency_rates = await asyncio.gather(
+        *[
+            get_cached_currency_rate(currency_name)
+            for currency_name in currency_names
+        ],
+    )
+    return tuple(currency_rates)
@@ -0,0 +1,168 @@
+"""In-memory currency rates table.
+
+Rates of all currencies are refreshed by background task
+and published as immutable versioned snapshots.
+Transfers read rates from last snapshot without awaiting rates api.
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from types import MappingProxyType
+from typing import (
+    Mapping,
+    NamedTuple,
+    Optional,
+)
+
+from aiohttp.web_app import Application
+from dynaconf import settings
+
+from billing.currency_rate.currency_rate import get_currency_rate
+from billing.db.models import Currency
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeRates(NamedTuple):
+    """Exchange rates of transfer currencies to USD."""
+
+    from_rate: Decimal
+    to_rate: Decimal
+    # None if rates are not taken from snapshot
+    snapshot_id: Optional[int] = None
+
+
+class RatesSnapshot(NamedTuple):
+    """Immutable snapshot of currency rates to USD."""
+
+    # Snapshot version: publish time in milliseconds
+    snapshot_id: int
+    rates: Mapping[str, Decimal]
+    # time.monotonic() of publishing
+    published_at: float
+
+    def get_exchange_rates(
+        self,
+        from_currency: str,
+        to_currency: str,
+    ) -> ExchangeRates:
+        """Exchange rates of currencies from snapshot."""
+        return ExchangeRates(
+            from_rate=self.rates[from_currency],
+            to_rate=self.rates[to_currency],
+            snapshot_id=self.snapshot_id,
+        )
+
+
+class RatesTable:
+    """Holder of last published rates snapshot."""
+
+    def __init__(self) -> None:
+        """Init empty table."""
+        self.snapshot: Optional[RatesSnapshot] = None
+
+    def publish(self, rates: Mapping[str, Decimal]) -> RatesSnapshot:
+        """Publish new snapshot of rates."""
+        snapshot_id = int(time.time() * 1000)
+        if self.snapshot is not None:
+            # Versions must grow even if clock goes back
+            snapshot_id = max(snapshot_id, self.snapshot.snapshot_id + 1)
+        self.snapshot = RatesSnapshot(
+            snapshot_id=snapshot_id,
+            rates=MappingProxyType(dict(rates)),
+            published_at=time.monotonic(),
+        )
+        return self.snapshot
+
+    def clear(self) -> None:
+        """Drop published snapshot."""
+        self.snapshot = None
+
+    def fresh_snapshot(self) -> Optional[RatesSnapshot]:
+        """Last snapshot.
+
+        :return: None if there are no snapshot or it is too stale
+            (settings.CURRENCY_RATE.max_staleness)
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        snapshot_age = time.monotonic() - snapshot.published_at
+        if snapshot_age >= settings.CURRENCY_RATE.max_staleness:
+            return None
+        return snapshot
+
+    def get_exchange_rates(
+        self,
+        from_currency: str,
+        to_currency: str,
+    ) -> Optional[ExchangeRates]:
+        """Exchange rates from last snapshot.
+
+        :return: None if there are no fresh snapshot (see fresh_snapshot)
+        """
+        snapshot = self.fresh_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.get_exchange_rates(from_currency, to_currency)
+
+
+rates_table = RatesTable()
+
+
+async def refresh_rates() -> RatesSnapshot:
+    """Request rates of all currencies and publish snapshot."""
+    currency_names = [currency.value for currency in Currency]
+    currency_rates = await asyncio.gather(
+        *[
+            get_currency_rate(currency_name)
+            for currency_name in currency_names
+        ],
+    )
+    return rates_table.publish(dict(zip(currency_names, currency_rates)))
+
+
+async def rates_refresher(interval: float) -> None:
+    """Refresh rates periodically.
+
+    On rates api errors previous snapshot is kept.
+    """
+    while True:  # NOQA: WPS457
+        await asyncio.sleep(interval)
+        try:
+            await refresh_rates()
+        except Exception:
+            logger.exception('Currency rates refresh failed')
+
+
+async def start_rates_refresher() -> 'asyncio.Future[None]':
+    """Publish first rates snapshot and start refresher task."""
+    try:
+        await refresh_rates()
+    except Exception:
+        logger.exception('Currency rates refresh failed')
+    return asyncio.ensure_future(
+        rates_refresher(settings.CURRENCY_RATE.refresh_interval),
+    )
+
+
+async def stop_rates_refresher(refresher: 'asyncio.Future[None]') -> None:
+    """Stop refresher task and drop published snapshot."""
+    refresher.cancel()
+    try:
+        await refresher
+    except asyncio.CancelledError:
+        pass  # NOQA: WPS420
+    rates_table.clear()
+
+
+async def init_currency_rates(app: Application) -> None:
+    """Start currency rates refresher for app."""
+    app['currency_rates_refresher'] = await start_rates_refresher()
+
+
+async def close_currency_rates(app: Application) -> None:
+    """Stop currency rates refresher of app."""
+    await stop_rates_refresher(app['currency_rates_refresher'])
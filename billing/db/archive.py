@@ -0,0 +1,94 @@
+from datetime import timedelta
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+from asyncpg.pool import PoolConnectionProxy
+from sqlalchemy import (
+    Integer,
+    Interval,
+    any_,
+    cast,
+    func,
+    select,
+)
+
+from billing.db.models import (
+    TransactionState,
+    transaction,
+    transaction_log,
+)
+from billing.db.utils import array_param
+
+
+async def claim_archivable_transactions(
+    conn: PoolConnectionProxy,
+    *,
+    age: timedelta,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Lock oldest finished transactions older than age with their logs.
+
+    Must be called inside db transaction: transactions are locked
+    until its end, transactions locked by other archivations are skipped.
+
+    :return: transactions ordered by (created_at, id),
+        logs of transaction are in its 'logs' item
+    """
+    archivable_query = select([transaction]).where(
+        transaction.c.state.in_(
+            [TransactionState.SUCCESED, TransactionState.FAILED],
+        ),
+    ).where(
+        transaction.c.created_at < func.now() - cast(age, Interval),
+    ).order_by(
+        transaction.c.created_at,
+        transaction.c.id,
+    ).limit(limit).with_for_update(skip_locked=True)
+    archivable = [dict(record) for record in await conn.fetch(archivable_query)]
+    if not archivable:
+        return []
+
+    transaction_ids = [archived['id'] for archived in archivable]
+    logs_query = select(
+        [
+            transaction_log.c.transaction_id,
+            transaction_log.c.state,
+            transaction_log.c.comment,
+            transaction_log.c.created_at,
+        ],
+    ).where(
+        transaction_log.c.transaction_id == any_(
+            array_param(transaction_ids, Integer),
+        ),
+    ).order_by(transaction_log.c.id)
+    logs: Dict[int, List[Dict[str, Any]]] = {}
+    log_records = await conn.fetch(logs_query)
+    for log_record in log_records:
+        log = dict(log_record)
+        logs.setdefault(log.pop('transaction_id'), []).append(log)
+    for archived in archivable:
+        archived['logs'] = logs.get(archived['id'], [])
+    return archivable
+
+
+async def delete_archived_transactions(
+    conn: PoolConnectionProxy,
+    *,
+    transaction_ids: List[int],
+) -> None:
+    """Delete archived transactions with their logs."""
+    await conn.execute(
+        transaction_log.delete().where(
+            transaction_log.c.transaction_id == any_(
+                array_param(transaction_ids, Integer),
+            ),
+        ),
+    )
+    await conn.execute(
+        transaction.delete().where(
+            transaction.c.id == any_(array_param(transaction_ids, Integer)),
+        ),
+    )
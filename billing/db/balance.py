@@ -0,0 +1,285 @@
+"""Balances of wallets at time.
+
+Balance of wallet is changed by top ups (wallet_top_up, with initial
+balance of wallet) and by successful transfers: debit of amount
+and credit of credit_amount. Transfer changes balances at time
+of its creation (as in transfers history).
+
+Balance at the end of day is kept in wallet_balance_snapshot:
+snapshot of day is closing balance of previous snapshot of wallet plus
+credits minus debits of day. Days are snapshotted one by one in order,
+so snapshot of day is made from changes of this day only.
+Balance at time is closing balance of nearest snapshot before
+day of time plus changes after this snapshot.
+"""
+
+from datetime import (
+    date,
+    datetime,
+    timedelta,
+)
+from decimal import (
+    MAX_PREC,
+    Decimal,
+    localcontext,
+)
+from typing import (
+    Callable,
+    List,
+)
+
+from asyncpg.pool import PoolConnectionProxy
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Interval,
+    Numeric,
+    and_,
+    bindparam,
+    cast,
+    func,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from billing.db.compiled import (
+    CompiledQuery,
+    compiled_query,
+)
+from billing.db.models import (
+    TransactionState,
+    transaction,
+    wallet_balance_snapshot,
+    wallet_top_up,
+)
+
+ONE_DAY = timedelta(days=1)
+
+
+def _movements(period: Callable, *, wallet_id=None):
+    """Changes of balances (wallet_id, credit, debit) within period.
+
+    :param period: created_at column -> condition
+    :param wallet_id: changes of one wallet (None - of all wallets)
+    """
+    zero = cast(literal(0), Numeric)
+    top_ups = select(
+        [
+            wallet_top_up.c.wallet_id,
+            wallet_top_up.c.amount.label('credit'),
+            zero.label('debit'),
+        ],
+    ).where(period(wallet_top_up.c.created_at))
+    is_success = transaction.c.state == TransactionState.SUCCESED
+    credits = select(
+        [transaction.c.to_wallet_id, transaction.c.credit_amount, zero],
+    ).where(and_(is_success, period(transaction.c.created_at)))
+    debits = select(
+        [transaction.c.from_wallet_id, zero, transaction.c.amount],
+    ).where(and_(is_success, period(transaction.c.created_at)))
+    if wallet_id is not None:
+        top_ups = top_ups.where(wallet_top_up.c.wallet_id == wallet_id)
+        credits = credits.where(transaction.c.to_wallet_id == wallet_id)
+        debits = debits.where(transaction.c.from_wallet_id == wallet_id)
+    return union_all(top_ups, credits, debits).alias('movements')
+
+
+def _snapshot_day_query():
+    day = cast(bindparam('day', type_=Date), Date)
+    day_start = bindparam('day_start', type_=DateTime)
+    day_end = bindparam('day_end', type_=DateTime)
+    movements = _movements(
+        lambda created_at: and_(created_at >= day_start, created_at < day_end),
+    )
+    totals = select(
+        [
+            movements.c.wallet_id,
+            func.sum(movements.c.credit).label('in_total'),
+            func.sum(movements.c.debit).label('out_total'),
+        ],
+    ).group_by(movements.c.wallet_id).alias('totals')
+    previous_balance = select(
+        [wallet_balance_snapshot.c.closing_balance],
+    ).where(
+        and_(
+            wallet_balance_snapshot.c.wallet_id == totals.c.wallet_id,
+            wallet_balance_snapshot.c.day < day,
+        ),
+    ).order_by(
+        wallet_balance_snapshot.c.day.desc(),
+    ).limit(1).as_scalar()
+    return insert(wallet_balance_snapshot).from_select(
+        ['wallet_id', 'day', 'closing_balance', 'in_total', 'out_total'],
+        select(
+            [
+                totals.c.wallet_id,
+                day,
+                func.coalesce(previous_balance, 0)
+                + totals.c.in_total
+                - totals.c.out_total,
+                totals.c.in_total,
+                totals.c.out_total,
+            ],
+        ),
+    ).on_conflict_do_nothing()
+
+
+def _balance_delta_query(*, with_since: bool):
+    since = bindparam('since', type_=DateTime)
+    at = bindparam('at', type_=DateTime)
+
+    def period(created_at):  # NOQA: WPS430
+        if with_since:
+            return and_(created_at >= since, created_at <= at)
+        return created_at <= at
+
+    movements = _movements(period, wallet_id=bindparam('wallet_id'))
+    return select(
+        [
+            func.coalesce(
+                func.sum(movements.c.credit) - func.sum(movements.c.debit),
+                0,
+            ),
+        ],
+    )
+
+
+snapshot_day_query = CompiledQuery(
+    'snapshot_day',
+    _snapshot_day_query(),
+)
+nearest_snapshot_query = CompiledQuery(
+    'nearest_snapshot',
+    select(
+        [
+            wallet_balance_snapshot.c.day,
+            wallet_balance_snapshot.c.closing_balance,
+        ],
+    ).where(
+        and_(
+            wallet_balance_snapshot.c.wallet_id == bindparam('wallet_id'),
+            wallet_balance_snapshot.c.day < bindparam('day', type_=Date),
+        ),
+    ).order_by(
+        wallet_balance_snapshot.c.day.desc(),
+    ).limit(1),
+)
+
+
+async def snapshot_day(
+    conn: PoolConnectionProxy,
+    *,
+    day: date,
+) -> None:
+    """Snapshot balances of wallets changed within day.
+
+    Previous days must be snapshotted. Snapshotted wallets are skipped.
+    """
+    day_start = datetime(day.year, day.month, day.day)
+    await snapshot_day_query.execute(
+        conn,
+        day=day,
+        day_start=day_start,
+        day_end=day_start + ONE_DAY,
+    )
+
+
+async def days_to_snapshot(
+    conn: PoolConnectionProxy,
+    *,
+    delay: timedelta,
+) -> List[date]:
+    """Days which are not snapshotted and can be snapshotted.
+
+    Day can be snapshotted after delay since its end (changes
+    of day are committed) if all transfers of day and of previous days
+    are executed.
+
+    :return: days in order
+    """
+    last_day = await conn.fetchval(
+        select([func.max(wallet_balance_snapshot.c.day)]),
+    )
+    if last_day is not None:
+        first_day = last_day + ONE_DAY
+    else:
+        first_change = await conn.fetchval(
+            select(
+                [
+                    func.least(
+                        select([func.min(wallet_top_up.c.created_at)]).as_scalar(),
+                        select([func.min(transaction.c.created_at)]).as_scalar(),
+                    ),
+                ],
+            ),
+        )
+        if first_change is None:
+            return []
+        first_day = first_change.date()
+
+    # Local time as created_at default
+    ready_before = await conn.fetchval(
+        select([func.localtimestamp() - cast(delay, Interval)]),
+    )
+    end_day = ready_before.date()
+    first_pending = await conn.fetchval(
+        select([func.min(transaction.c.created_at)]).where(
+            and_(
+                transaction.c.state == TransactionState.CREATED,
+                transaction.c.created_at >= datetime(
+                    first_day.year,
+                    first_day.month,
+                    first_day.day,
+                ),
+            ),
+        ),
+    )
+    if first_pending is not None:
+        end_day = min(end_day, first_pending.date())
+
+    days = []
+    day = first_day
+    while day < end_day:
+        days.append(day)
+        day += ONE_DAY
+    return days
+
+
+async def balance_at(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_id: int,
+    at: datetime,
+) -> Decimal:
+    """Balance of wallet at time.
+
+    Changes after nearest snapshot are scanned: changes of day of at
+    and of days which are not snapshotted yet.
+    """
+    at = at.replace(tzinfo=None)
+    snapshot = await nearest_snapshot_query.fetchrow(
+        conn,
+        wallet_id=wallet_id,
+        day=at.date(),
+    )
+    delta_params = {'wallet_id': wallet_id, 'at': at}
+    closing_balance = Decimal(0)
+    if snapshot is not None:
+        closing_balance = snapshot['closing_balance']
+        snapshot_day_start = snapshot['day'] + ONE_DAY
+        delta_params['since'] = datetime(
+            snapshot_day_start.year,
+            snapshot_day_start.month,
+            snapshot_day_start.day,
+        )
+    delta_query = compiled_query(
+        'balance_delta:{0:d}'.format(snapshot is not None),
+        lambda: _balance_delta_query(with_since=snapshot is not None),
+    )
+    delta: Decimal = await delta_query.fetchval(conn, **delta_params)
+    # Exact as numeric of db
+    with localcontext() as ctx:
+        ctx.prec = MAX_PREC
+        return closing_balance + delta
@@ -0,0 +1,193 @@
+"""Precompiled queries.
+
+Queries of hot paths are compiled to parameterized SQL once
+instead of compiling SQLAlchemy expression on every call,
+and are executed as prepared statements (from statements cache
+of connection). Statements of all compiled queries are prepared
+on new pool connections.
+"""
+
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from asyncpg import Record
+from asyncpg.cursor import CursorFactory
+from asyncpgsa.connection import (
+    SAConnection,
+    _dialect,
+    execute_defaults,
+)
+from sqlalchemy.sql import ClauseElement
+
+# Name -> compiled query
+compiled_queries: Dict[str, 'CompiledQuery'] = {}
+
+
+class CompiledQuery:
+    """Query compiled to parameterized SQL.
+
+    Parameters are bindparam() of query, constants of query
+    are compiled as parameters with fixed values.
+    Query is compiled on first use or on connections priming
+    (see prime_connection).
+
+    stats counters:
+    - compiles: count of query compilations
+    - hits: count of query executions (without compilation)
+    - prepares: count of statements prepared on connections
+    """
+
+    def __init__(self, name: str, query: ClauseElement) -> None:
+        """Register query."""
+        if name in compiled_queries:
+            raise ValueError('Query {0} is already compiled'.format(name))
+        self.name = name
+        self.stats: Counter = Counter()
+        self._query = query
+        self._sql: Optional[str] = None
+        compiled_queries[name] = self
+
+    @property
+    def sql(self) -> str:
+        """Parameterized SQL of query."""
+        if self._sql is None:
+            self.compile()
+        return self._sql  # type: ignore
+
+    def compile(self) -> None:
+        """Compile query."""
+        compiled = execute_defaults(self._query).compile(dialect=_dialect)
+        self.stats['compiles'] += 1
+        params = sorted(compiled.params.items())
+        self._param_names = [param_name for param_name, _ in params]
+        self._required = {
+            param_name
+            for param_name, bind in compiled.binds.items()
+            if bind.required
+        }
+        self._constants = dict(params)
+        self._processors = compiled._bind_processors  # NOQA: WPS437
+        self._sql = compiled.string % {
+            param_name: '${0}'.format(param_number)
+            for param_number, param_name in enumerate(
+                self._param_names,
+                start=1,
+            )
+        }
+
+    def args(self, **params) -> List[Any]:
+        """Positional statement arguments."""
+        if self._sql is None:
+            self.compile()
+        unknown_params = set(params) - self._required
+        if unknown_params:
+            raise TypeError(
+                'Unknown parameters of query {0}: {1}'.format(
+                    self.name,
+                    ', '.join(sorted(unknown_params)),
+                ),
+            )
+        missing_params = self._required - set(params)
+        if missing_params:
+            raise TypeError(
+                'Missing parameters of query {0}: {1}'.format(
+                    self.name,
+                    ', '.join(sorted(missing_params)),
+                ),
+            )
+        statement_args = []
+        for param_name in self._param_names:
+            param_value = params.get(param_name, self._constants[param_name])
+            processor = self._processors.get(param_name)
+            if processor is not None and param_value is not None:
+                param_value = processor(param_value)
+            statement_args.append(param_value)
+        return statement_args
+
+    async def fetch(self, conn, **params) -> List[Record]:
+        """Fetch all records."""
+        statement_args = self.args(**params)
+        self.stats['hits'] += 1
+        return await conn.fetch(self.sql, *statement_args)
+
+    async def fetchrow(self, conn, **params) -> Optional[Record]:
+        """Fetch first record."""
+        statement_args = self.args(**params)
+        self.stats['hits'] += 1
+        return await conn.fetchrow(self.sql, *statement_args)
+
+    async def fetchval(self, conn, **params) -> Any:
+        """Fetch first value of first record."""
+        statement_args = self.args(**params)
+        self.stats['hits'] += 1
+        return await conn.fetchval(self.sql, *statement_args)
+
+    async def execute(self, conn, **params) -> None:
+        """Execute query."""
+        statement_args = self.args(**params)
+        self.stats['hits'] += 1
+        await conn.execute(self.sql, *statement_args)
+
+    def cursor(self, conn, *, prefetch: int, **params) -> CursorFactory:
+        """Server-side cursor of records.
+
+        Must be iterated inside db transaction: records are fetched
+        by prefetch records on iteration.
+        """
+        statement_args = self.args(**params)
+        self.stats['hits'] += 1
+        return conn.cursor(self.sql, *statement_args, prefetch=prefetch)
+
+
+def compiled_query(
+    name: str,
+    build_query: Callable[[], ClauseElement],
+) -> CompiledQuery:
+    """Compiled query by name.
+
+    For queries which depend on call arguments (one per variant):
+    query is built and compiled on first call only.
+    """
+    query = compiled_queries.get(name)
+    if query is None:
+        query = CompiledQuery(name, build_query())
+    return query
+
+
+class CompiledQueriesConnection(SAConnection):
+    """Connection which can be primed with statements of queries."""
+
+    async def prime_statements(self, queries: Iterable[str]) -> None:
+        """Put prepared statements of queries to statements cache.
+
+        asyncpg has no public api for it: statements are prepared
+        as on first execution of query.
+        Statements are prepared inside transaction: tables locks
+        taken by prepare are released on commit.
+        """
+        async with self.transaction():
+            for query in queries:
+                await self._get_statement(query, None)  # NOQA: WPS437
+
+
+async def prime_connection(conn: CompiledQueriesConnection) -> None:
+    """Prepare statements of all compiled queries (pool init hook)."""
+    queries = list(compiled_queries.values())
+    await conn.prime_statements([query.sql for query in queries])
+    for query in queries:  # NOQA: WPS440
+        query.stats['prepares'] += 1
+
+
+def compiled_queries_stats() -> Dict[str, Dict[str, int]]:
+    """Counters of compiled queries."""
+    return {
+        name: dict(query.stats)
+        for name, query in compiled_queries.items()
+    }
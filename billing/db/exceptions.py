@@ -1,2 +1,10 @@
 class WalletDoesNotExists(ValueError):
     """Wallet does not exists."""
+
+
+class IdempotencyKeyReused(ValueError):
+    """Idempotency key is used by request with other parameters."""
+
+
+class WalletShardDoesNotExists(ValueError):
+    """Shard of hot wallet does not exists."""
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from typing import Optional
+
+from asyncpg import Record
+from asyncpg.pool import PoolConnectionProxy
+from sqlalchemy import (
+    Interval,
+    and_,
+    cast,
+    func,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from billing.db.exceptions import IdempotencyKeyReused
+from billing.db.models import idempotent_request
+
+
+async def claim_idempotency_key(
+    conn: PoolConnectionProxy,
+    *,
+    endpoint: str,
+    idempotency_key: str,
+    request_hash: str,
+) -> Optional[Record]:
+    """Claim idempotency key for request.
+
+    Must be called inside request db transaction before any changes:
+    concurrent request with the same key waits until this transaction
+    is finished on unique index.
+
+    :raises IdempotencyKeyReused: key is used by request
+        with other parameters
+    :return: None if key is claimed,
+        else stored response (status, content_type, body)
+        of previous request with this key
+    """
+    claim_query = insert(idempotent_request).values(
+        endpoint=endpoint,
+        idempotency_key=idempotency_key,
+        request_hash=request_hash,
+    ).on_conflict_do_nothing(
+        index_elements=['endpoint', 'idempotency_key'],
+    ).returning(idempotent_request.c.id)
+    if await conn.fetchval(claim_query) is not None:
+        return None
+
+    stored_response_query = select(
+        [
+            idempotent_request.c.status,
+            idempotent_request.c.content_type,
+            idempotent_request.c.body,
+            idempotent_request.c.request_hash,
+        ],
+    ).where(
+        and_(
+            idempotent_request.c.endpoint == endpoint,
+            idempotent_request.c.idempotency_key == idempotency_key,
+        ),
+    )
+    stored_response = await conn.fetchrow(stored_response_query)
+    if stored_response['request_hash'] != request_hash:
+        raise IdempotencyKeyReused(
+            'Idempotency key is used by other request',
+        )
+    return stored_response
+
+
+async def save_idempotent_response(  # NOQA:WPS211
+    conn: PoolConnectionProxy,
+    *,
+    endpoint: str,
+    idempotency_key: str,
+    status: int,
+    content_type: str,
+    body: str,
+) -> None:
+    """Save response of request with claimed idempotency key."""
+    save_response_query = idempotent_request.update().where(
+        and_(
+            idempotent_request.c.endpoint == endpoint,
+            idempotent_request.c.idempotency_key == idempotency_key,
+        ),
+    ).values(
+        status=status,
+        content_type=content_type,
+        body=body,
+    )
+    await conn.execute(save_response_query)
+
+
+async def delete_expired_requests(
+    conn: PoolConnectionProxy,
+    *,
+    retention: timedelta,
+    limit: int,
+) -> int:
+    """Delete requests with idempotency keys older than retention.
+
+    At most limit rows are deleted: short statement for big backlog.
+
+    :return: count of deleted requests
+    """
+    expired = select(
+        [idempotent_request.c.id],
+    ).where(
+        idempotent_request.c.created_at < func.now() - cast(retention, Interval),
+    ).limit(limit)
+    deleted = await conn.fetch(
+        idempotent_request.delete().where(
+            idempotent_request.c.id.in_(expired),
+        ).returning(idempotent_request.c.id),
+    )
+    return len(deleted)
@@ -4,17 +4,23 @@ import enum
 from decimal import Decimal
 
 from sqlalchemy import (
+    BigInteger,
     CheckConstraint,
+    DDL,
     Column,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     Numeric,
     String,
     Table,
     Text,
+    UniqueConstraint,
+    event,
 )
 from sqlalchemy.sql import func
 
@@ -58,9 +64,135 @@ wallet = Table(
     ),
     Column('balance', Numeric, nullable=False, default=Decimal(0.0)),
     Column('currency', Enum(Currency), nullable=False, default=Currency.USD),
+    # Count of sub-balances of hot wallet (0 - wallet is not hot)
+    Column('shards', Integer, nullable=False, server_default='0'),
     CheckConstraint('balance >= 0', name='positive_balance'),
 )
 
+# Top ups of wallets (and initial balances of registered wallets)
+wallet_top_up = Table(
+    'wallet_top_up',
+    metadata,
+    Column('id', Integer, primary_key=True),  # NOQA
+    Column(
+        'wallet_id',
+        Integer,
+        ForeignKey(
+            'wallet.id',
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+        ),
+        nullable=False,
+    ),
+    Column('amount', Numeric, nullable=False),
+    Column('created_at', DateTime, nullable=False, server_default=func.now()),
+    Index('wallet_top_up_wallet_id_created_at_idx', 'wallet_id', 'created_at'),
+    # Top ups of day (see billing.db.balance)
+    Index('wallet_top_up_created_at_idx', 'created_at'),
+)
+
+# Daily balances of wallets (see billing.db.balance).
+# Row of wallet is added only for days with balance changes.
+wallet_balance_snapshot = Table(
+    'wallet_balance_snapshot',
+    metadata,
+    Column(
+        'wallet_id',
+        Integer,
+        ForeignKey(
+            'wallet.id',
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+        ),
+        primary_key=True,
+    ),
+    Column('day', Date, primary_key=True),
+    # Balance at the end of day
+    Column('closing_balance', Numeric, nullable=False),
+    # Sums of credits and debits of day
+    Column('in_total', Numeric, nullable=False),
+    Column('out_total', Numeric, nullable=False),
+    Index('wallet_balance_snapshot_day_idx', 'day'),
+)
+
+# Sub-balances of hot wallets.
+# Top ups of hot wallet are spread over its shards,
+# wallet balance is balance of wallet row plus its shards balances.
+wallet_shard = Table(
+    'wallet_shard',
+    metadata,
+    Column(
+        'wallet_id',
+        Integer,
+        ForeignKey(
+            'wallet.id',
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+        ),
+        primary_key=True,
+    ),
+    Column('slot', Integer, primary_key=True),
+    Column('balance', Numeric, nullable=False, server_default='0'),
+    CheckConstraint('balance >= 0', name='positive_shard_balance'),
+)
+
+# Changes of wallets balances are notified with user_id of wallet
+# on commit (see billing.db.user_info_cache)
+WALLET_BALANCE_CHANNEL = 'wallet_balance'
+
+# Statement triggers: one notification per changed wallet
+notify_wallet_balance_ddl = DDL(
+    """
+    CREATE FUNCTION notify_wallet_balance() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('{0}', changed.user_id::text)
+        FROM (
+            SELECT DISTINCT new_wallet.user_id
+            FROM new_wallet
+            JOIN old_wallet ON old_wallet.id = new_wallet.id
+            WHERE old_wallet.balance <> new_wallet.balance
+        ) AS changed;
+        RETURN NULL;
+    END
+    $$;
+    CREATE TRIGGER wallet_balance_notify AFTER UPDATE ON wallet
+    REFERENCING OLD TABLE AS old_wallet NEW TABLE AS new_wallet
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_wallet_balance();
+    """.format(WALLET_BALANCE_CHANNEL),
+)
+notify_wallet_shard_balance_ddl = DDL(
+    """
+    CREATE FUNCTION notify_wallet_shard_balance() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('{0}', changed.user_id::text)
+        FROM (
+            SELECT DISTINCT wallet.user_id
+            FROM new_shard
+            JOIN wallet ON wallet.id = new_shard.wallet_id
+        ) AS changed;
+        RETURN NULL;
+    END
+    $$;
+    CREATE TRIGGER wallet_shard_balance_notify AFTER UPDATE ON wallet_shard
+    REFERENCING NEW TABLE AS new_shard
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_wallet_shard_balance();
+    """.format(WALLET_BALANCE_CHANNEL),
+)
+event.listen(wallet, 'after_create', notify_wallet_balance_ddl)
+event.listen(
+    wallet,
+    'after_drop',
+    DDL('DROP FUNCTION IF EXISTS notify_wallet_balance()'),
+)
+event.listen(wallet_shard, 'after_create', notify_wallet_shard_balance_ddl)
+event.listen(
+    wallet_shard,
+    'after_drop',
+    DDL('DROP FUNCTION IF EXISTS notify_wallet_shard_balance()'),
+)
+
 
 @enum.unique
 class TransactionState(enum.Enum):
@@ -82,11 +214,12 @@ class FailedReason(enum.Enum):
     UNKNOWN = enum.auto()
 
 
-# Table of transactions beetween wallets
+# Table of transactions beetween wallets.
+# Partitioned by month of created_at (see billing.db.partitions).
 transaction = Table(
     'transaction',
     metadata,
-    Column('id', Integer, primary_key=True),  # NOQA
+    Column('id', Integer, primary_key=True, autoincrement=True),  # NOQA
     Column(
         'from_wallet_id',
         Integer,
@@ -109,7 +242,8 @@ transaction = Table(
     ),
     Column('state', Enum(TransactionState), nullable=False),
     Column('amount', Numeric, nullable=False),
-    Column('created_at', DateTime, nullable=False, server_default=func.now()),
+    # Partition key is part of primary key
+    Column('created_at', DateTime, primary_key=True, server_default=func.now()),
     Column(
         'updated_at',
         DateTime,
@@ -120,27 +254,111 @@ transaction = Table(
 
     Column('new_balance_from', Numeric),
     Column('new_balance_to', Numeric),
+    # Amount credited to wallet to (in its currency)
+    Column('credit_amount', Numeric),
     Column('exchange_from_rate', Numeric),
     Column('exchange_to_rate', Numeric),
+    # Version of currency rates snapshot used for exchange
+    Column('exchange_rates_snapshot_id', BigInteger),
     Column('failed_reason', Enum(FailedReason)),
+    # Wallet history (see transfers_history)
+    Index(
+        'transaction_from_wallet_id_created_at_idx',
+        'from_wallet_id',
+        'created_at',
+    ),
+    Index(
+        'transaction_to_wallet_id_created_at_idx',
+        'to_wallet_id',
+        'created_at',
+    ),
+    postgresql_partition_by='RANGE (created_at)',
 )
 
-# Transaction log table
+# Transaction log table.
+# Partitioned by month of created_at as transaction table,
+# so transaction_id can not reference transaction (its key is id, created_at).
 transaction_log = Table(
     'transaction_log',
     metadata,
-    Column('id', Integer, primary_key=True),  # NOQA
-    Column(
-        'transaction_id',
-        Integer,
-        ForeignKey(
-            'transaction.id',
-            onupdate='CASCADE',
-            ondelete='CASCADE',
-        ),
-        nullable=False,
-    ),
+    Column('id', Integer, primary_key=True, autoincrement=True),  # NOQA
+    Column('transaction_id', Integer, nullable=False),
     Column('state', Enum(TransactionState), nullable=False),
     Column('comment', Text),
+    Column('created_at', DateTime, primary_key=True, server_default=func.now()),
+    Index('transaction_log_transaction_id_idx', 'transaction_id'),
+    postgresql_partition_by='RANGE (created_at)',
+)
+
+# Rows out of created monthly partitions
+for partitioned_table in (transaction, transaction_log):
+    event.listen(
+        partitioned_table,
+        'after_create',
+        DDL(
+            'CREATE TABLE {0}_default PARTITION OF "{0}" DEFAULT'.format(
+                partitioned_table.name,
+            ),
+        ),
+    )
+
+# New transactions logs are notified as json with wallets of transaction
+# on commit (see billing.db.wallet_events)
+TRANSACTION_LOG_CHANNEL = 'transaction_log'
+
+notify_transaction_log_ddl = DDL(
+    """
+    CREATE FUNCTION notify_transaction_log() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify(
+            '{0}',
+            json_build_object(
+                'id', new_log.id,
+                'transaction_id', new_log.transaction_id,
+                'from_wallet_id', "transaction".from_wallet_id,
+                'to_wallet_id', "transaction".to_wallet_id,
+                'amount', "transaction".amount::text,
+                'state', new_log.state,
+                'comment', new_log.comment,
+                'created_at', new_log.created_at
+            )::text
+        )
+        FROM new_log
+        JOIN "transaction" ON "transaction".id = new_log.transaction_id;
+        RETURN NULL;
+    END
+    $$;
+    CREATE TRIGGER transaction_log_notify AFTER INSERT ON transaction_log
+    REFERENCING NEW TABLE AS new_log
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_transaction_log();
+    """.format(TRANSACTION_LOG_CHANNEL),
+)
+event.listen(transaction_log, 'after_create', notify_transaction_log_ddl)
+event.listen(
+    transaction_log,
+    'after_drop',
+    DDL('DROP FUNCTION IF EXISTS notify_transaction_log()'),
+)
+
+# Responses of requests with idempotency keys
+idempotent_request = Table(
+    'idempotent_request',
+    metadata,
+    Column('id', Integer, primary_key=True),  # NOQA
+    Column('endpoint', String, nullable=False),
+    Column('idempotency_key', String, nullable=False),
+    Column('status', Integer),
+    Column('content_type', String),
+    Column('body', Text),
+    # Hash of request parameters: key can not be reused for other request
+    Column('request_hash', String),
     Column('created_at', DateTime, nullable=False, server_default=func.now()),
+    UniqueConstraint(
+        'endpoint',
+        'idempotency_key',
+        name='idempotent_request_endpoint_key',
+    ),
+    # Expired requests cleanup
+    Index('idempotent_request_created_at_idx', 'created_at'),
 )
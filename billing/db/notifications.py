@@ -0,0 +1,165 @@
+"""Listener of db notifications.
+
+One connection per process (out of pool) listens all channels
+of subscribers: users info cache (billing.db.user_info_cache),
+wallets events (billing.db.wallet_events).
+Notifications are lost while connection is lost:
+subscribers are told when listening starts and stops.
+"""
+
+import asyncio
+import logging
+from typing import (
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+import asyncpg
+from aiohttp.web_app import Application
+from dynaconf import settings
+
+logger = logging.getLogger(__name__)
+
+LISTENER_APPLICATION_NAME = 'billing_listener'
+
+
+class Subscriber(NamedTuple):
+    """Subscriber of channel notifications."""
+
+    # payload -> None
+    on_notification: Callable[[str], None]
+    # listening -> None (called with True when listening starts,
+    # with False when it stops)
+    on_listening: Callable[[bool], None]
+
+
+def _set_done(future: 'asyncio.Future[None]') -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+async def connect_listener() -> asyncpg.Connection:
+    """Connection to listen notifications."""
+    return await asyncpg.connect(
+        database=settings.DB.dbname,
+        user=settings.DB.username,
+        password=settings.DB.password,
+        host=settings.DB.host,
+        port=settings.DB.port,
+        server_settings={'application_name': LISTENER_APPLICATION_NAME},
+    )
+
+
+class NotificationsListener:
+    """Shared listener of db notifications."""
+
+    def __init__(
+        self,
+        *,
+        reconnect_interval: float,
+        ping_interval: float,
+    ) -> None:
+        """Init listener.
+
+        :param reconnect_interval: seconds between reconnects
+        :param ping_interval: seconds between checks of connection
+        """
+        self.reconnect_interval = reconnect_interval
+        self.ping_interval = ping_interval
+        self.listening = False
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+
+    def subscribe(
+        self,
+        channel: str,
+        *,
+        on_notification: Callable[[str], None],
+        on_listening: Callable[[bool], None],
+    ) -> None:
+        """Subscribe to channel (before run)."""
+        self._subscribers.setdefault(channel, []).append(
+            Subscriber(
+                on_notification=on_notification,
+                on_listening=on_listening,
+            ),
+        )
+
+    async def run(self) -> None:
+        """Listen notifications forever (reconnect on errors)."""
+        while True:  # NOQA: WPS457
+            try:
+                conn = await connect_listener()
+            except Exception:
+                logger.exception('Notifications listener connection failed')
+                await asyncio.sleep(self.reconnect_interval)
+                continue
+            try:
+                await self._listen(conn)
+            except Exception:
+                logger.exception('Notifications listener failed')
+            finally:
+                self._set_listening(False)
+                conn.terminate()
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def _listen(self, conn: asyncpg.Connection) -> None:
+        terminated = asyncio.get_event_loop().create_future()
+        conn.add_termination_listener(
+            lambda connection: _set_done(terminated),
+        )
+        for channel in self._subscribers:
+            await conn.add_listener(channel, self._notify)
+        self._set_listening(True)
+        while not terminated.done():
+            await asyncio.wait([terminated], timeout=self.ping_interval)
+            if not terminated.done():
+                await conn.fetchval('SELECT 1', timeout=self.ping_interval)
+
+    def _notify(self, connection, pid, channel, payload) -> None:
+        for subscriber in self._subscribers[channel]:
+            try:
+                subscriber.on_notification(payload)
+            except Exception:
+                logger.exception('Notification handling failed')
+
+    def _set_listening(self, listening: bool) -> None:
+        if self.listening == listening:
+            return
+        self.listening = listening
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.on_listening(listening)
+
+
+async def init_notifications(app: Application) -> None:
+    """Create notifications listener of app.
+
+    Subscribers are added by next startup handlers,
+    listener is started by start_notifications.
+    """
+    app['notifications'] = NotificationsListener(
+        reconnect_interval=settings.NOTIFICATIONS.reconnect_interval,
+        ping_interval=settings.NOTIFICATIONS.ping_interval,
+    )
+    app['notifications_listener'] = None
+
+
+async def start_notifications(app: Application) -> None:
+    """Start notifications listener of app."""
+    app['notifications_listener'] = asyncio.ensure_future(
+        app['notifications'].run(),
+    )
+
+
+async def close_notifications(app: Application) -> None:
+    """Stop notifications listener of app."""
+    listener: Optional['asyncio.Future[None]'] = app['notifications_listener']
+    if listener is not None:
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass  # NOQA: WPS420
@@ -0,0 +1,108 @@
+"""Monthly partitions of transaction and transaction_log tables.
+
+Tables are partitioned by range of created_at. Partition of month
+is <table>_YYYYMM, rows out of created partitions are kept
+by <table>_default partition.
+"""
+
+from datetime import date
+from typing import List
+
+from asyncpg.pool import PoolConnectionProxy
+
+from billing.db.models import (
+    transaction,
+    transaction_log,
+)
+
+PARTITIONED_TABLES = (transaction.name, transaction_log.name)
+
+# Partitions creation of concurrent processes is serialized
+PARTITIONS_LOCK_ID = 1916
+
+
+def month_start(day: date, *, months: int = 0) -> date:
+    """First day of month of day shifted by months."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    """Name of month partition of table."""
+    return '{0}_{1:%Y%m}'.format(table_name, month)
+
+
+async def create_month_partition(
+    conn: PoolConnectionProxy,
+    *,
+    table_name: str,
+    month: date,
+) -> bool:
+    """Create partition of month if it does not exist.
+
+    Rows of month are moved from default partition to created one
+    (partition can not be attached while default one has its rows).
+
+    :return: partition is created
+    """
+    name = partition_name(table_name, month)
+    start = month_start(month)
+    end = month_start(month, months=1)
+    async with conn.transaction():
+        await conn.execute(
+            'SELECT pg_advisory_xact_lock($1)',
+            PARTITIONS_LOCK_ID,
+        )
+        if await conn.fetchval('SELECT to_regclass($1)', name) is not None:
+            return False
+        await conn.execute(
+            'CREATE TABLE {0} (LIKE "{1}" INCLUDING DEFAULTS)'.format(
+                name,
+                table_name,
+            ),
+        )
+        await conn.execute(
+            """
+            WITH moved AS (
+                DELETE FROM {1}_default
+                WHERE created_at >= $1 AND created_at < $2
+                RETURNING *
+            )
+            INSERT INTO {0} SELECT * FROM moved
+            """.format(name, table_name),
+            start,
+            end,
+        )
+        await conn.execute(
+            """
+            ALTER TABLE "{1}" ATTACH PARTITION {0}
+            FOR VALUES FROM ('{2}') TO ('{3}')
+            """.format(name, table_name, start.isoformat(), end.isoformat()),
+        )
+    return True
+
+
+async def create_partitions(
+    conn: PoolConnectionProxy,
+    *,
+    months_ahead: int,
+) -> List[str]:
+    """Create partitions of current month and months_ahead next months.
+
+    Current month is month of db server time (as created_at default).
+
+    :return: names of created partitions
+    """
+    today = await conn.fetchval('SELECT current_date')
+    created = []
+    for months in range(months_ahead + 1):
+        month = month_start(today, months=months)
+        for table_name in PARTITIONED_TABLES:
+            is_created = await create_month_partition(
+                conn,
+                table_name=table_name,
+                month=month,
+            )
+            if is_created:
+                created.append(partition_name(table_name, month))
+    return created
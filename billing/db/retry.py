@@ -0,0 +1,84 @@
+"""Retry db transactions on concurrency errors."""
+
+import asyncio
+import random
+from collections import Counter
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+    TypeVar,
+)
+
+from asyncpg.exceptions import (
+    DeadlockDetectedError,
+    SerializationError,
+)
+from asyncpg.pool import PoolConnectionProxy
+from dynaconf import settings
+
+ResultType = TypeVar('ResultType')
+
+RETRY_ERRORS = (DeadlockDetectedError, SerializationError)
+
+
+class RetryStats:
+    """Retries statistics."""
+
+    def __init__(self) -> None:
+        """Init empty stats."""
+        # count of retries -> count of transactions
+        self.retries: Counter = Counter()
+        # count of transactions failed after all retries
+        self.exhausted = 0
+
+    def clear(self) -> None:
+        """Clear stats."""
+        self.retries.clear()
+        self.exhausted = 0
+
+
+retry_stats = RetryStats()
+
+
+async def run_in_transaction(
+    conn: PoolConnectionProxy,
+    run: Callable[[], Awaitable[ResultType]],
+    *,
+    retries: Optional[int] = None,
+    retry_delay: Optional[float] = None,
+) -> ResultType:
+    """Run function in db transaction.
+
+    Transaction is retried on deadlock and serialization errors
+    with exponential backoff and full jitter.
+    By default retries count and base delay (seconds) are taken
+    from settings.TRANSFER.
+
+    Must not be called inside other transaction: deadlock or
+    serialization error aborts whole transaction, retry of savepoint
+    can not help.
+    """
+    if conn.is_in_transaction():
+        raise RuntimeError('Retried transaction can not be nested')
+    if retries is None:
+        retries = settings.TRANSFER.retries
+    if retry_delay is None:
+        retry_delay = settings.TRANSFER.retry_delay
+
+    attempt = 0
+    while True:  # NOQA: WPS457
+        try:
+            async with conn.transaction():
+                run_result = await run()
+        except RETRY_ERRORS:
+            if attempt >= retries:
+                retry_stats.exhausted += 1
+                raise
+            attempt += 1
+            await asyncio.sleep(
+                random.uniform(0, retry_delay * 2 ** attempt),  # NOQA: S311
+            )
+        else:
+            retry_stats.retries[attempt] += 1
+            return run_result
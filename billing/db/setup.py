@@ -1,28 +1,186 @@
-"""Setup postgresql connection pool."""
+"""Setup postgresql connection pools.
+
+App has pool of primary db (app['db']) and pools of its replicas
+(settings.REPLICAS.servers). Reads which can be stale are routed
+to replicas by app['db_router'] (see DbRouter.read_pool).
+"""
+
+import asyncio
+import logging
+import random
+from typing import (
+    Any,
+    List,
+    Mapping,
+    Optional,
+)
 
 import asyncpgsa
 from aiohttp.web_app import Application
 from asyncpg.pool import Pool
 from dynaconf import settings
 
+from billing.db.compiled import (
+    CompiledQueriesConnection,
+    prime_connection,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds since last replayed transaction (0 - replica replayed all
+# received changes or db is not replica)
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery()
+        OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+    THEN 0
+    ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+async def create_pool(
+    server: Optional[Mapping[str, Any]] = None,
+    **pool_kwargs,
+) -> Pool:
+    """Create connection pool.
+
+    Statements of compiled queries are prepared on new connections.
 
-async def create_pool() -> Pool:
-    """Create connection pool."""
+    :param server: db server options which override settings.DB
+        (host, port of replica)
+    :param pool_kwargs: extra pool options (min_size, max_size, ...)
+    """
+    db_settings = dict(settings.DB)
+    db_settings.update(server or {})
+    pool_kwargs.setdefault('init', prime_connection)
+    pool_kwargs.setdefault('connection_class', CompiledQueriesConnection)
     return await asyncpgsa.create_pool(
-        database=settings.DB.dbname,
-        user=settings.DB.username,
-        password=settings.DB.password,
-        host=settings.DB.host,
-        port=settings.DB.port,
+        database=db_settings['dbname'],
+        user=db_settings['username'],
+        password=db_settings['password'],
+        host=db_settings['host'],
+        port=db_settings['port'],
+        **pool_kwargs,
     )
 
 
+class Replica:
+    """Pool of replica with its last measured lag."""
+
+    def __init__(self, pool: Pool) -> None:
+        """Init replica with unknown lag (it is not used until check)."""
+        self.pool = pool
+        self.lag: Optional[float] = None
+
+    async def check_lag(self, *, timeout: float) -> Optional[float]:
+        """Measure lag (None if replica is not available)."""
+        try:
+            async with self.pool.acquire(timeout=timeout) as conn:
+                self.lag = float(
+                    await conn.fetchval(REPLICA_LAG_QUERY, timeout=timeout),
+                )
+        except Exception:
+            logger.exception('Replica lag check failed')
+            self.lag = None
+        return self.lag
+
+
+class DbRouter:
+    """Router of queries to primary db and replicas."""
+
+    def __init__(
+        self,
+        primary: Pool,
+        replicas: List[Replica],
+        *,
+        max_lag: float,
+    ) -> None:
+        """Init router.
+
+        :param max_lag: seconds of lag while replica is used
+        """
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+
+    def read_pool(self, *, pinned: bool = False) -> Pool:
+        """Pool for reads which can be a bit stale.
+
+        Random replica with lag not more than max_lag,
+        primary if there are no such replicas.
+
+        :param pinned: reads must see recent writes of client
+            (primary is used)
+        """
+        if pinned:
+            return self.primary
+        fresh_replicas = [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None and replica.lag <= self.max_lag
+        ]
+        if not fresh_replicas:
+            return self.primary
+        return random.choice(fresh_replicas).pool  # NOQA: S311
+
+    async def check_lags(self) -> None:
+        """Measure lags of replicas."""
+        await asyncio.gather(
+            *[
+                replica.check_lag(timeout=settings.REPLICAS.check_timeout)
+                for replica in self.replicas
+            ],
+        )
+
+    async def run_lag_checks(self, interval: float) -> None:
+        """Measure lags of replicas forever."""
+        while True:  # NOQA: WPS457
+            await asyncio.sleep(interval)
+            await self.check_lags()
+
+    async def close(self) -> None:
+        """Close replicas pools (primary is closed by owner)."""
+        for replica in self.replicas:
+            await replica.pool.close()
+
+
+async def create_replicas() -> List[Replica]:
+    """Replicas of settings.REPLICAS.
+
+    Replicas which are not available on start are skipped.
+    """
+    replicas = []
+    for server in settings.REPLICAS.servers:
+        try:
+            replicas.append(Replica(await create_pool(server)))
+        except Exception:
+            logger.exception('Replica pool creation failed')
+    return replicas
+
+
 async def init_pg(app: Application) -> None:
-    """Init pg pool for app."""
+    """Init pg pools and router for app."""
     pool = await create_pool()
     app['db'] = pool
+    db_router = DbRouter(
+        pool,
+        await create_replicas(),
+        max_lag=settings.REPLICAS.max_lag,
+    )
+    await db_router.check_lags()
+    app['db_router'] = db_router
+    app['db_lag_checks'] = asyncio.ensure_future(
+        db_router.run_lag_checks(settings.REPLICAS.check_interval),
+    )
 
 
 async def close_pg(app: Application) -> None:
-    """Close pg pool for app."""
+    """Close pg pools of app."""
+    app['db_lag_checks'].cancel()
+    try:
+        await app['db_lag_checks']
+    except asyncio.CancelledError:
+        pass  # NOQA: WPS420
+    await app['db_router'].close()
     await app['db'].close()
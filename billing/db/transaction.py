@@ -1,11 +1,47 @@
+import heapq
+from collections import deque
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
+from asyncpg import Record
 from asyncpg.pool import PoolConnectionProxy
-from sqlalchemy import select
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Integer,
+    Numeric,
+    Text,
+    and_,
+    bindparam,
+    case,
+    cast,
+    exists,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    tuple_,
+    union_all,
+)
 
-from billing.currency_rate.currency_rate import get_currency_rate
+from billing.archive.storage import ArchiveStorage
+from billing.currency_rate.rates_table import ExchangeRates
+from billing.db.compiled import (
+    CompiledQuery,
+    compiled_query,
+)
 from billing.db.exceptions import WalletDoesNotExists
 from billing.db.models import (
     FailedReason,
@@ -13,12 +49,374 @@ from billing.db.models import (
     transaction,
     transaction_log,
     wallet,
+    wallet_shard,
+)
+from billing.db.utils import array_bindparam
+from billing.db.wallet import shards_balance
+
+# (created_at, id) of transfers history record
+HistoryPosition = Tuple[datetime, int]
+
+# Columns of archived transaction in transfers history record
+ARCHIVED_HISTORY_COLUMNS = (
+    'id',
+    'from_wallet_id',
+    'to_wallet_id',
+    'amount',
+    'created_at',
+    'state',
+    'new_balance_from',
+    'new_balance_to',
+)
+
+
+def state_literal(state: TransactionState):
+    """Transaction state as sql expression."""
+    state_type = transaction.c.state.type
+    return cast(literal(state, state_type), state_type)
+
+
+def execution_comment(state: TransactionState) -> str:
+    """Log comment of executed transaction."""
+    if state == TransactionState.SUCCESED:
+        return 'Success'
+    return 'Not enough balance'
+
+
+def execution_comment_column(state_column):
+    """Log comment of executed transaction as sql expression."""
+    return case(
+        [(state_column == TransactionState.SUCCESED, 'Success')],
+        else_='Not enough balance',
+    )
+
+
+def _create_transaction_query():
+    new_transaction = transaction.insert().values(
+        from_wallet_id=bindparam('from_wallet_id'),
+        to_wallet_id=bindparam('to_wallet_id'),
+        state=TransactionState.CREATED,
+        amount=bindparam('amount', type_=Numeric),
+    ).returning(transaction.c.id).cte('new_transaction')
+    return transaction_log.insert().from_select(
+        ['transaction_id', 'state', 'comment'],
+        select(
+            [
+                new_transaction.c.id,
+                state_literal(TransactionState.CREATED),
+                literal('Transaction created'),
+            ],
+        ),
+    ).returning(transaction_log.c.transaction_id)
+
+
+def _create_transactions_query():
+    new_transactions = transaction.insert().from_select(
+        ['id', 'from_wallet_id', 'to_wallet_id', 'state', 'amount'],
+        select(
+            [
+                func.unnest(array_bindparam('transaction_ids', Integer)),
+                func.unnest(array_bindparam('from_wallet_ids', Integer)),
+                func.unnest(array_bindparam('to_wallet_ids', Integer)),
+                state_literal(TransactionState.CREATED),
+                func.unnest(array_bindparam('amounts', Numeric)),
+            ],
+        ),
+    ).returning(transaction.c.id).cte('new_transactions')
+    return transaction_log.insert().from_select(
+        ['transaction_id', 'state', 'comment'],
+        select(
+            [
+                new_transactions.c.id,
+                state_literal(TransactionState.CREATED),
+                literal('Transaction created'),
+            ],
+        ),
+    )
+
+
+def _execute_transaction_query(*, with_log: bool):  # NOQA: WPS210
+    pending = select(
+        [transaction.c.id],
+    ).where(
+        and_(
+            transaction.c.id == bindparam('transaction_id'),
+            transaction.c.state == TransactionState.CREATED,
+        ),
+    ).with_for_update().cte('pending')
+
+    amount = bindparam('amount', type_=Numeric)
+    debit = wallet.update().where(
+        and_(
+            wallet.c.id == bindparam('from_wallet_id'),
+            wallet.c.balance >= amount,
+            exists(select([pending.c.id])),
+        ),
+    ).values(
+        balance=wallet.c.balance - amount,
+    ).returning(wallet.c.balance).cte('debit')
+
+    to_wallet_id = bindparam('to_wallet_id')
+    to_slot = bindparam('to_slot', type_=Integer)
+    add_amount = bindparam('add_amount', type_=Numeric)
+    # Credit of hot wallet goes to shard (slot is NULL for other wallets)
+    credit_shard = wallet_shard.update().where(
+        and_(
+            wallet_shard.c.wallet_id == to_wallet_id,
+            wallet_shard.c.slot == to_slot,
+            exists(select([debit.c.balance])),
+        ),
+    ).values(
+        balance=wallet_shard.c.balance + add_amount,
+    ).returning(wallet_shard.c.balance).cte('credit_shard')
+
+    credit = wallet.update().where(
+        and_(
+            wallet.c.id == to_wallet_id,
+            exists(select([debit.c.balance])),
+            ~exists(select([credit_shard.c.balance])),
+        ),
+    ).values(
+        balance=wallet.c.balance + add_amount,
+    ).returning(wallet.c.balance).cte('credit')
+
+    # Statement snapshot does not see credit: credited shard is replaced
+    to_balance_without_shard = select(
+        [
+            wallet.c.balance + select(
+                [func.coalesce(func.sum(wallet_shard.c.balance), 0)],
+            ).where(
+                and_(
+                    wallet_shard.c.wallet_id == to_wallet_id,
+                    wallet_shard.c.slot != to_slot,
+                ),
+            ).as_scalar(),
+        ],
+    ).where(wallet.c.id == to_wallet_id).as_scalar()
+
+    is_success = or_(
+        exists(select([credit.c.balance])),
+        exists(select([credit_shard.c.balance])),
+    )
+
+    def on_success(success_value, fail_value=None):  # NOQA: WPS430
+        return case([(is_success, success_value)], else_=fail_value)
+
+    failed_reason_type = transaction.c.failed_reason.type
+    done = transaction.update().where(
+        transaction.c.id.in_(select([pending.c.id])),
+    ).values(
+        state=on_success(
+            state_literal(TransactionState.SUCCESED),
+            state_literal(TransactionState.FAILED),
+        ),
+        failed_reason=on_success(
+            null(),
+            cast(
+                literal(FailedReason.NEM_FROM_WALLET, failed_reason_type),
+                failed_reason_type,
+            ),
+        ),
+        exchange_from_rate=on_success(
+            cast(bindparam('from_rate', type_=Numeric), Numeric),
+        ),
+        exchange_to_rate=on_success(
+            cast(bindparam('to_rate', type_=Numeric), Numeric),
+        ),
+        exchange_rates_snapshot_id=on_success(
+            cast(bindparam('snapshot_id', type_=BigInteger), BigInteger),
+        ),
+        credit_amount=on_success(cast(add_amount, Numeric)),
+        new_balance_from=select(
+            [debit.c.balance + shards_balance(bindparam('from_wallet_id'))],
+        ).as_scalar(),
+        new_balance_to=func.coalesce(
+            select(
+                [credit.c.balance + shards_balance(to_wallet_id)],
+            ).as_scalar(),
+            select(
+                [credit_shard.c.balance + to_balance_without_shard],
+            ).as_scalar(),
+        ),
+    ).returning(transaction.c.id, transaction.c.state).cte('done')
+
+    if not with_log:
+        return select([done.c.state])
+    return transaction_log.insert().from_select(
+        ['transaction_id', 'state', 'comment'],
+        select(
+            [
+                done.c.id,
+                done.c.state,
+                execution_comment_column(done.c.state),
+            ],
+        ),
+    ).returning(transaction_log.c.state)
+
+
+def _fail_transaction_query():
+    failed = transaction.update().where(
+        transaction.c.id == bindparam('transaction_id'),
+    ).values(
+        failed_reason=bindparam('failed_reason'),
+        state=TransactionState.FAILED,
+    ).returning(transaction.c.id).cte('failed')
+    return transaction_log.insert().from_select(
+        ['transaction_id', 'state', 'comment'],
+        select(
+            [
+                failed.c.id,
+                state_literal(TransactionState.FAILED),
+                cast(bindparam('comment'), Text),
+            ],
+        ),
+    )
+
+
+def _transfers_history_query(  # NOQA: WPS211
+    *,
+    with_start: bool,
+    with_end: bool,
+    with_after: bool,
+    with_limit: bool,
+):
+    wallet_id = bindparam('wallet_id')
+    created_at = transaction.c.created_at
+
+    def wallet_transfers(wallet_column):  # NOQA: WPS430
+        # Branch of one wallet column: range scan of its index
+        query = select(
+            [
+                transaction.c.id,
+                transaction.c.from_wallet_id,
+                transaction.c.to_wallet_id,
+                transaction.c.amount,
+                created_at,
+                transaction.c.state,
+                transaction.c.new_balance_from,
+                transaction.c.new_balance_to,
+            ],
+        ).where(wallet_column == wallet_id)
+        if with_start:
+            query = query.where(created_at >= bindparam('start'))
+        if with_end:
+            query = query.where(created_at <= bindparam('end'))
+        if with_after:
+            after_created_at = bindparam('after_created_at', type_=DateTime)
+            query = query.where(
+                and_(
+                    # Index range condition
+                    created_at >= after_created_at,
+                    tuple_(created_at, transaction.c.id) > tuple_(
+                        after_created_at,
+                        bindparam('after_id', type_=Integer),
+                    ),
+                ),
+            )
+        return query
+
+    def limited(query):  # NOQA: WPS430
+        if not with_limit:
+            return query
+        # Every branch reads one page at most
+        page = query.order_by(created_at, transaction.c.id).limit(
+            bindparam('limit'),
+        ).alias()
+        return select([page])
+
+    history = union_all(
+        limited(wallet_transfers(transaction.c.from_wallet_id)),
+        limited(
+            wallet_transfers(transaction.c.to_wallet_id).where(
+                transaction.c.from_wallet_id != wallet_id,
+            ),
+        ),
+    ).alias('history')
+    history_query = select([history]).order_by(
+        history.c.created_at,
+        history.c.id,
+    )
+    if with_limit:
+        history_query = history_query.limit(bindparam('limit'))
+    return history_query
+
+
+add_transaction_log_query = CompiledQuery(
+    'add_transaction_log',
+    transaction_log.insert().values(
+        transaction_id=bindparam('transaction_id'),
+        state=bindparam('state'),
+        comment=bindparam('comment'),
+    ),
+)
+create_transaction_query = CompiledQuery(
+    'create_transaction',
+    _create_transaction_query(),
+)
+allocate_transaction_ids_query = CompiledQuery(
+    'allocate_transaction_ids',
+    select(
+        [func.nextval('transaction_id_seq')],
+    ).select_from(
+        func.generate_series(1, cast(bindparam('count'), Integer)),
+    ),
+)
+create_transactions_query = CompiledQuery(
+    'create_transactions',
+    _create_transactions_query(),
+)
+fail_transaction_query = CompiledQuery(
+    'fail_transaction',
+    _fail_transaction_query(),
+)
+execute_transaction_query = CompiledQuery(
+    'execute_transaction',
+    _execute_transaction_query(with_log=True),
+)
+# Log is written by caller (see TransactionLogWriter)
+execute_unlogged_transaction_query = CompiledQuery(
+    'execute_unlogged_transaction',
+    _execute_transaction_query(with_log=False),
+)
+transfer_currencies_query = CompiledQuery(
+    'transfer_currencies',
+    select(
+        [
+            wallet.c.id,
+            wallet.c.currency,
+        ],
+    ).where(
+        wallet.c.id.in_(
+            [bindparam('from_wallet_id'), bindparam('to_wallet_id')],
+        ),
+    ),
 )
-from billing.db.wallet import (
-    add_to_wallet,
-    get_from_wallet,
-    get_wallet_info,
-    is_wallet_exists,
+claim_pending_transactions_query = CompiledQuery(
+    'claim_pending_transactions',
+    select(
+        [
+            transaction.c.id,
+            transaction.c.from_wallet_id,
+            transaction.c.to_wallet_id,
+            transaction.c.amount,
+        ],
+    ).where(
+        transaction.c.state == TransactionState.CREATED,
+    ).order_by(
+        transaction.c.id,
+    ).limit(bindparam('limit')).with_for_update(skip_locked=True),
+)
+transaction_logs_query = CompiledQuery(
+    'transaction_logs',
+    select(
+        [
+            transaction_log.c.state,
+            transaction_log.c.comment,
+            transaction_log.c.created_at,
+        ],
+    ).select_from(transaction_log).where(
+        transaction_log.c.transaction_id == bindparam('transaction_id'),
+    ),
 )
 
 
@@ -30,12 +428,12 @@ async def add_transaction_log(
     comment: str,
 ) -> None:
     """Add log to transaction."""
-    create_log_query = transaction_log.insert().values(
+    await add_transaction_log_query.execute(
+        conn,
         transaction_id=transaction_id,
         state=state,
         comment=comment,
     )
-    await conn.execute(create_log_query)
 
 
 async def create_transaction(
@@ -45,251 +443,375 @@ async def create_transaction(
     to_wallet_id: int,
     amount: Decimal,
 ) -> int:
-    """Create new transaction."""
+    """Create new transaction.
+
+    Transaction and its creation log are inserted by one statement.
+    """
     if from_wallet_id == to_wallet_id:
         raise ValueError('Cant transfer yourself')
-    create_transaction_query = transaction.insert().values(
+    new_transaction_id: int = await create_transaction_query.fetchval(
+        conn,
         from_wallet_id=from_wallet_id,
         to_wallet_id=to_wallet_id,
-        state=TransactionState.CREATED,
         amount=amount,
-    ).returning(transaction.c.id)
-    new_transaction_record = await conn.fetchrow(create_transaction_query)
-    new_transaction_id: int = new_transaction_record['id']
-    await add_transaction_log(
-        conn,
-        transaction_id=new_transaction_id,
-        state=TransactionState.CREATED,
-        comment='Transaction created',
     )
     return new_transaction_id
 
 
-async def fail_transaction(
+async def create_transactions(
     conn: PoolConnectionProxy,
     *,
-    transaction_id: int,
-    reason: FailedReason,
-    comment: str,
-):
-    """Set transaction to failed."""
-    await add_transaction_log(
-        conn,
-        transaction_id=transaction_id,
-        state=TransactionState.FAILED,
-        comment=comment,
-    )
+    transfers: Sequence[Tuple[int, int, Decimal]],
+) -> List[int]:
+    """Create many new transactions.
+
+    Two statements for any count of transactions:
+    ids allocation, then bulk insert of transactions with creation logs.
 
-    update_transaction_query = transaction \
-        .update() \
-        .where(transaction.c.id == transaction_id) \
-        .values(
-            failed_reason=reason,
-            state=TransactionState.FAILED,
+    :param transfers: (from_wallet_id, to_wallet_id, amount) items
+    :return: new transactions ids in order of transfers
+    """
+    for from_wallet_id, to_wallet_id, amount in transfers:
+        if from_wallet_id == to_wallet_id:
+            raise ValueError('Cant transfer yourself')
+        if amount < 0:
+            raise ValueError('Amount must be positive')
+    if not transfers:
+        return []
+
+    new_transaction_ids = [
+        record[0]
+        for record in await allocate_transaction_ids_query.fetch(
+            conn,
+            count=len(transfers),
         )
-    await conn.execute(update_transaction_query)
+    ]
+
+    from_wallet_ids, to_wallet_ids, amounts = zip(*transfers)
+    await create_transactions_query.execute(
+        conn,
+        transaction_ids=new_transaction_ids,
+        from_wallet_ids=list(from_wallet_ids),
+        to_wallet_ids=list(to_wallet_ids),
+        amounts=list(amounts),
+    )
+    return new_transaction_ids
 
 
-async def success_transaction(
+async def fail_transaction(
     conn: PoolConnectionProxy,
     *,
     transaction_id: int,
-    exchange_from_rate: Decimal,
-    exchange_to_rate: Decimal,
-    new_balance_from: Decimal,
-    new_balance_to: Decimal,
+    reason: FailedReason,
     comment: str,
 ):
-    """Set transaction to success."""
-    await add_transaction_log(
+    """Set transaction to failed.
+
+    Transaction update and its log are written by one statement.
+    """
+    await fail_transaction_query.execute(
         conn,
         transaction_id=transaction_id,
-        state=TransactionState.SUCCESED,
+        failed_reason=reason,
         comment=comment,
     )
 
-    update_transaction_query = transaction \
-        .update() \
-        .where(transaction.c.id == transaction_id) \
-        .values(
-            exchange_from_rate=exchange_from_rate,
-            exchange_to_rate=exchange_to_rate,
-            new_balance_from=new_balance_from,
-            new_balance_to=new_balance_to,
-            state=TransactionState.SUCCESED,
-        )
-    await conn.execute(update_transaction_query)
 
-
-async def validate_transaction(
+async def execute_transaction(  # NOQA:WPS211
     conn: PoolConnectionProxy,
     *,
     transaction_id: int,
-) -> bool:
-    """Check transaction valid.
-
-    In demo case we check that balance > transfer amount.
+    from_wallet_id: int,
+    to_wallet_id: int,
+    amount: Decimal,
+    exchange_rates: ExchangeRates,
+    to_slot: Optional[int] = None,
+    with_log: bool = True,
+) -> TransactionState:
+    """Execute created transaction.
+
+    One statement:
+    - debits from wallet if it has enough money
+      (not enough money is detected by debit result)
+    - credits to wallet if debit was done
+      (to shard to_slot of hot wallet, see credit_slots)
+    - sets transaction state to success or failed
+    - adds transaction log (if with_log, otherwise log
+      is written by caller, see execution_comment)
+
+    :return: new transaction state
     """
-    transaction_info_query = select(
-        [
-            transaction.c.amount,
-            wallet.c.balance,
-        ],
-    ).select_from(
-        transaction.join(
-            wallet,
-            transaction.c.from_wallet_id == wallet.c.id,
-        ),
-    ).where(transaction.c.id == transaction_id)
-    transaction_info_record = await conn.fetchrow(transaction_info_query)
-    amount = transaction_info_record['amount']
-    balance = transaction_info_record['balance']
-    if amount > balance:
-        await fail_transaction(
-            conn,
-            transaction_id=transaction_id,
-            reason=FailedReason.NEM_FROM_WALLET,
-            comment='Not enough balance',
+    add_amount = amount * exchange_rates.from_rate / exchange_rates.to_rate
+    if with_log:
+        query = execute_transaction_query
+    else:
+        query = execute_unlogged_transaction_query
+    new_state = await query.fetchval(
+        conn,
+        transaction_id=transaction_id,
+        from_wallet_id=from_wallet_id,
+        to_wallet_id=to_wallet_id,
+        amount=amount,
+        add_amount=add_amount,
+        from_rate=exchange_rates.from_rate,
+        to_rate=exchange_rates.to_rate,
+        snapshot_id=exchange_rates.snapshot_id,
+        to_slot=to_slot,
+    )
+    if new_state is None:
+        raise ValueError(
+            'Transaction {transaction_id} is not pending'.format(
+                transaction_id=transaction_id,
+            ),
         )
-        return False
-    return True
+    return TransactionState[new_state]
 
 
-async def transfer_between_wallets(  # NOQA:WPS211
+async def get_transfer_currencies(
     conn: PoolConnectionProxy,
     *,
     from_wallet_id: int,
     to_wallet_id: int,
-    amount: Decimal,
-) -> None:
-    """Transfer betwen wallets."""
-    if not isinstance(amount, Decimal):
-        raise ValueError('Wrong type of amount')
-    if amount < 0:
-        raise ValueError('Amount must be positive')
-    async with conn.transaction():
-        # 1. first check wallets exists
-        # This check need be duplicated in api
-        for wallet_id in (from_wallet_id, to_wallet_id):
-            if await is_wallet_exists(conn, wallet_id=wallet_id) is False:
-                raise WalletDoesNotExists(
-                    'Wallet {wallet_id} does not exist'.format(
-                        wallet_id=wallet_id,
-                    ),
-                )
+) -> Tuple[str, str]:
+    """Currencies of transfer wallets.
 
-        # 2. Create transaction
-        transaction_id = await create_transaction(
-            conn,
-            from_wallet_id=from_wallet_id,
-            to_wallet_id=to_wallet_id,
-            amount=amount,
-        )
+    :return: (from wallet currency, to wallet currency)
+    """
+    currencies_records = await transfer_currencies_query.fetch(
+        conn,
+        from_wallet_id=from_wallet_id,
+        to_wallet_id=to_wallet_id,
+    )
+    currencies = {
+        record['id']: record['currency']
+        for record in currencies_records
+    }
+    for wallet_id in (from_wallet_id, to_wallet_id):
+        if wallet_id not in currencies:
+            raise WalletDoesNotExists(
+                'Wallet {wallet_id} does not exist'.format(
+                    wallet_id=wallet_id,
+                ),
+            )
+    return (currencies[from_wallet_id], currencies[to_wallet_id])
+
+
+async def claim_pending_transactions(
+    conn: PoolConnectionProxy,
+    *,
+    limit: int,
+) -> List[Record]:
+    """Claim batch of created transactions for execution.
 
-        # 3. Validate transaction
-        is_valid = await validate_transaction(
-            conn,
-            transaction_id=transaction_id,
-        )
-        if is_valid is False:
-            return
+    Must be called inside db transaction: claimed rows stay locked
+    until its end. Rows locked by other workers are skipped.
+    """
+    return await claim_pending_transactions_query.fetch(conn, limit=limit)
 
-        # 4. Get currency rate
-        wallet_from_info = await get_wallet_info(
-            conn,
-            wallet_id=from_wallet_id,
-            columns=[wallet.c.currency],
-        )
-        wallet_from_currency = wallet_from_info['currency']
-        exchange_from_rate = await get_currency_rate(wallet_from_currency)
 
-        wallet_to_info = await get_wallet_info(
-            conn,
-            wallet_id=to_wallet_id,
-            columns=[wallet.c.currency],
-        )
-        wallet_to_currency = wallet_to_info['currency']
-        exchange_to_rate = await get_currency_rate(wallet_to_currency)
-
-        add_amount = amount * exchange_from_rate / exchange_to_rate
+def history_record(
+    record: Mapping[str, Any],
+    *,
+    wallet_id: int,
+) -> Dict[str, Any]:
+    """Transfers history record with new balance of wallet."""
+    record_dict = dict(record)
+    new_balance_from = record_dict.pop('new_balance_from')
+    new_balance_to = record_dict.pop('new_balance_to')
+    if record_dict['from_wallet_id'] == wallet_id:
+        new_balance = str(new_balance_from)
+    else:
+        new_balance = str(new_balance_to)
+    record_dict['new_balance'] = new_balance
+    record_dict['amount'] = str(record_dict['amount'])
+    record_dict['created_at'] = str(record_dict['created_at'])
+    record_dict['transaction_id'] = record_dict.pop('id')
+    return record_dict
+
+
+def _history_query(
+    *,
+    wallet_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[HistoryPosition] = None,
+    limit: Optional[int] = None,
+) -> Tuple[CompiledQuery, Dict[str, Any]]:
+    history_query = compiled_query(
+        'transfers_history:{0:d}{1:d}{2:d}{3:d}'.format(
+            start is not None,
+            end is not None,
+            after is not None,
+            limit is not None,
+        ),
+        lambda: _transfers_history_query(
+            with_start=start is not None,
+            with_end=end is not None,
+            with_after=after is not None,
+            with_limit=limit is not None,
+        ),
+    )
+    history_params: Dict[str, Any] = {'wallet_id': wallet_id}
+    if start is not None:
+        history_params['start'] = start.replace(tzinfo=None)
+    if end is not None:
+        history_params['end'] = end.replace(tzinfo=None)
+    if after is not None:
+        history_params['after_created_at'], history_params['after_id'] = after
+    if limit is not None:
+        history_params['limit'] = limit
+    return history_query, history_params
 
-        # 5. Transfer money
-        new_balance_from = await get_from_wallet(
-            conn,
-            wallet_id=from_wallet_id,
-            amount=amount,
-        )
-        new_balance_to = await add_to_wallet(
-            conn,
-            wallet_id=to_wallet_id,
-            amount=add_amount,
-        )
 
-        # 6. Success
-        await success_transaction(
-            conn,
-            transaction_id=transaction_id,
-            exchange_from_rate=exchange_from_rate,
-            exchange_to_rate=exchange_to_rate,
-            new_balance_from=new_balance_from,
-            new_balance_to=new_balance_to,
-            comment='Success',
-        )
+async def transfers_history(  # NOQA:WPS211
+    conn: PoolConnectionProxy,
+    *,
+    wallet_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[HistoryPosition] = None,
+    limit: Optional[int] = None,
+    archive: Optional[ArchiveStorage] = None,
+) -> List[Dict[str, Any]]:
+    """Transactions histroy.
+
+    Transactions from and to wallet are read by two branches
+    of UNION ALL: each uses (wallet, created_at) index.
+    History is ordered by (created_at, id): page after position
+    is read by index range scan whatever count of previous pages.
+
+    :param after: position of last record of previous page
+        (see history_position)
+    :param limit: count of records (None - all)
+    :param archive: archived transactions are merged to history
+    """
+    history_query, history_params = _history_query(
+        wallet_id=wallet_id,
+        start=start,
+        end=end,
+        after=after,
+        limit=limit,
+    )
+    transaction_info_records = await history_query.fetch(
+        conn,
+        **history_params,
+    )
+    history = [
+        history_record(record, wallet_id=wallet_id)
+        for record in transaction_info_records
+    ]
+    if archive is None:
+        return history
+    archived_history = await _archived_history(
+        archive,
+        wallet_id=wallet_id,
+        history_params=history_params,
+        after=after,
+    )
+    return merge_history(history, archived_history, limit=limit)
 
 
-async def transfers_history(  # NOQA:WPS211
+async def iter_transfers_history(
     conn: PoolConnectionProxy,
     *,
     wallet_id: int,
     start: Optional[datetime] = None,
     end: Optional[datetime] = None,
-):
-    """Transactions histroy."""
-    transaction_hist_query = select(
-        [
-            transaction.c.id,
-            transaction.c.from_wallet_id,
-            transaction.c.to_wallet_id,
-            transaction.c.amount,
-            transaction.c.created_at,
-            transaction.c.state,
-            transaction.c.new_balance_from,
-            transaction.c.new_balance_to,
-        ],
-    ).select_from(
-        transaction,
-    ).where(
-        (transaction.c.from_wallet_id == wallet_id) |
-        (transaction.c.to_wallet_id == wallet_id),
+    prefetch: int = 1000,
+    archive: Optional[ArchiveStorage] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Iterate whole transfers history (see transfers_history).
+
+    Must be iterated inside db transaction: records are read
+    by server-side cursor, prefetch records at once,
+    so memory does not depend on history size.
+    Archived part of history range is read at once.
+    """
+    history_query, history_params = _history_query(
+        wallet_id=wallet_id,
+        start=start,
+        end=end,
     )
-    if start is not None:
-        transaction_hist_query = transaction_hist_query.where(
-            transaction.c.created_at >= start.replace(tzinfo=None),
+    archived_history: deque = deque()
+    if archive is not None:
+        archived_history.extend(
+            await _archived_history(
+                archive,
+                wallet_id=wallet_id,
+                history_params=history_params,
+            ),
         )
-
-    if end is not None:
-        transaction_hist_query = transaction_hist_query.where(
-            transaction.c.created_at <= end.replace(tzinfo=None),
+    history_cursor = history_query.cursor(
+        conn,
+        prefetch=prefetch,
+        **history_params,
+    )
+    async for record in history_cursor:
+        live_record = history_record(record, wallet_id=wallet_id)
+        position = history_position(live_record)
+        while archived_history and (
+            history_position(archived_history[0]) < position
+        ):
+            yield archived_history.popleft()
+        if archived_history and (
+            history_position(archived_history[0]) == position
+        ):
+            # Transaction is not deleted yet after archivation
+            archived_history.popleft()
+        yield live_record
+    while archived_history:
+        yield archived_history.popleft()
+
+
+def merge_history(
+    *histories: Iterable[Dict[str, Any]],
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Merge ordered histories to one, without duplicates.
+
+    :param limit: count of records (None - all)
+    """
+    merged: List[Dict[str, Any]] = []
+    last_position = None
+    for record in heapq.merge(*histories, key=history_position):
+        position = history_position(record)
+        if position == last_position:
+            continue
+        merged.append(record)
+        last_position = position
+        if limit is not None and len(merged) >= limit:
+            break
+    return merged
+
+
+async def _archived_history(
+    archive: ArchiveStorage,
+    *,
+    wallet_id: int,
+    history_params: Dict[str, Any],
+    after: Optional[HistoryPosition] = None,
+) -> List[Dict[str, Any]]:
+    archived_transactions = await archive.wallet_transactions(
+        wallet_id=wallet_id,
+        start=history_params.get('start'),
+        end=history_params.get('end'),
+        after=after,
+    )
+    return [
+        history_record(
+            {column: archived[column] for column in ARCHIVED_HISTORY_COLUMNS},
+            wallet_id=wallet_id,
         )
-    transaction_info_records = await conn.fetch(transaction_hist_query)
+        for archived in archived_transactions
+    ]
 
-    history = []
-    for record in transaction_info_records:
-        record_dict = dict(record)
-        from_wallet_id = record_dict['from_wallet_id']
-        new_balance_from = record_dict.pop('new_balance_from')
-        new_balance_to = record_dict.pop('new_balance_to')
-
-        if from_wallet_id == wallet_id:
-            new_balance = str(new_balance_from)
-        else:
-            new_balance = str(new_balance_to)
-        record_dict['new_balance'] = new_balance
-        record_dict['amount'] = str(record_dict['amount'])
-        record_dict['created_at'] = str(record_dict['created_at'])
-        record_dict['transaction_id'] = record_dict.pop('id')
-        history.append(record_dict)
-    return history
+
+def history_position(record: Mapping[str, Any]) -> HistoryPosition:
+    """Position of transfers history record (see transfers_history)."""
+    return (
+        datetime.fromisoformat(record['created_at']),
+        record['transaction_id'],
+    )
 
 
 async def get_transaction_logs(  # NOQA:WPS211
@@ -298,18 +820,11 @@ async def get_transaction_logs(  # NOQA:WPS211
     transaction_id: int,
 ):
     """Transaction logs."""
-    transaction_log_query = select(
-        [
-            transaction_log.c.state,
-            transaction_log.c.comment,
-            transaction_log.c.created_at,
-        ],
-    ).select_from(transaction_log).where(
-        transaction_log.c.transaction_id == transaction_id,
+    transaction_log_records = await transaction_logs_query.fetch(
+        conn,
+        transaction_id=transaction_id,
     )
 
-    transaction_log_records = await conn.fetch(transaction_log_query)
-
     logs = []
     for record in transaction_log_records:
         record_dict = dict(record)
@@ -1,13 +1,75 @@
 from decimal import Decimal
-from typing import Tuple
+from typing import (
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+)
 
 from asyncpg.pool import PoolConnectionProxy
-from sqlalchemy import select
+from sqlalchemy import (
+    Integer,
+    Numeric,
+    bindparam,
+    cast,
+    func,
+    select,
+)
 
+from billing.db.compiled import CompiledQuery
 from billing.db.models import (
     Currency,
     user,
     wallet,
+    wallet_top_up,
+)
+from billing.db.wallet import (
+    add_top_up_query,
+    wallet_balance,
+)
+
+create_user_query = CompiledQuery(
+    'create_user',
+    user.insert().values(
+        name=bindparam('name'),
+        country=bindparam('country'),
+        city=bindparam('city'),
+    ).returning(user.c.id),
+)
+create_wallet_query = CompiledQuery(
+    'create_wallet',
+    wallet.insert().values(
+        user_id=bindparam('user_id'),
+        balance=bindparam('balance', type_=Numeric),
+        currency=bindparam('currency'),
+    ).returning(wallet.c.id),
+)
+allocate_user_ids_query = CompiledQuery(
+    'allocate_user_ids',
+    select(
+        [
+            func.nextval('user_id_seq'),
+            func.nextval('wallet_id_seq'),
+        ],
+    ).select_from(
+        func.generate_series(1, cast(bindparam('count'), Integer)),
+    ),
+)
+user_info_query = CompiledQuery(
+    'user_info',
+    select(
+        [
+            user.c.name,
+            user.c.country,
+            user.c.city,
+            wallet_balance(),
+            wallet.c.currency,
+        ],
+    ).select_from(
+        user.join(wallet),
+    ).where(
+        user.c.id == bindparam('user_id'),
+    ),
 )
 
 
@@ -22,48 +84,105 @@ async def create_new_user(  # NOQA:WPS211
 ) -> Tuple[int, int]:
     """Create new user with wallet.
 
+    Initial balance is recorded as top up (see billing.db.balance).
+
     :return: (new user_id,  new wallet_id)
     """
     if balance < 0:
         raise ValueError('Balance must be positive')
-    create_user_query = user.insert().values(
+    new_user_id: int = await create_user_query.fetchval(
+        conn,
         name=name,
         country=country,
         city=city,
-    ).returning(user.c.id)
-    new_user_record = await conn.fetchrow(create_user_query)
-    new_user_id: int = new_user_record['id']
-    create_wallet_query = wallet.insert().values(
+    )
+    new_wallet_id: int = await create_wallet_query.fetchval(
+        conn,
         user_id=new_user_id,
         balance=balance,
         currency=currency,
-    ).returning(wallet.c.id)
-    new_wallet_record = await conn.fetchrow(create_wallet_query)
-    new_wallet_id: int = new_wallet_record['id']
+    )
+    if balance > 0:
+        await add_top_up_query.execute(
+            conn,
+            wallet_id=new_wallet_id,
+            amount=balance,
+        )
     return (new_user_id, new_wallet_id)
 
 
+async def create_new_users(
+    conn: PoolConnectionProxy,
+    *,
+    users: Sequence[Mapping],
+) -> List[Tuple[int, int]]:
+    """Create many new users with wallets.
+
+    Four statements for any count of users:
+    ids allocation, then COPY of users, wallets
+    and initial balances top ups.
+    Must be called inside db transaction.
+
+    :param users: items with name, country, city, currency, balance
+        (see create_new_user)
+    :return: (new user_id, new wallet_id) items in order of users
+    """
+    for user_data in users:
+        if user_data['balance'] < 0:
+            raise ValueError('Balance must be positive')
+    if not users:
+        return []
+
+    new_ids = [
+        (record[0], record[1])
+        for record in await allocate_user_ids_query.fetch(
+            conn,
+            count=len(users),
+        )
+    ]
+    await conn.copy_records_to_table(
+        user.name,
+        columns=['id', 'name', 'country', 'city'],
+        records=[
+            (new_user_id, user_data['name'], user_data['country'], user_data['city'])
+            for (new_user_id, _), user_data in zip(new_ids, users)
+        ],
+    )
+    await conn.copy_records_to_table(
+        wallet.name,
+        columns=['id', 'user_id', 'balance', 'currency'],
+        records=[
+            (
+                new_wallet_id,
+                new_user_id,
+                user_data['balance'],
+                Currency(user_data['currency']).value,
+            )
+            for (new_user_id, new_wallet_id), user_data in zip(new_ids, users)
+        ],
+    )
+    await conn.copy_records_to_table(
+        wallet_top_up.name,
+        columns=['wallet_id', 'amount'],
+        records=[
+            (new_wallet_id, user_data['balance'])
+            for (_, new_wallet_id), user_data in zip(new_ids, users)
+            if user_data['balance'] > 0
+        ],
+    )
+    return new_ids
+
+
 async def get_user_info(  # NOQA:WPS211
     conn: PoolConnectionProxy,
     *,
     user_id: int,
 ):
     """User info."""
-    user_info_query = select(
-        [
-            user.c.name,
-            user.c.country,
-            user.c.city,
-            wallet.c.balance,
-            wallet.c.currency,
-        ],
-    ).select_from(
-        user.join(wallet),
-    ).where(
-        user.c.id == user_id,
+    user_info_record = await user_info_query.fetchrow(
+        conn,
+        user_id=user_id,
     )
-
-    user_info_record = await conn.fetchrow(user_info_query)
     if user_info_record is None:
         raise ValueError('Unknown user.')
     return {
@@ -0,0 +1,109 @@
+"""Cache of users info.
+
+Recent get_user_info results are cached in process (LRU).
+Changes of wallets balances are notified by db triggers on commit
+(channel WALLET_BALANCE_CHANNEL, payload - user_id), every app process
+listens them (see billing.db.notifications) and drops changed users
+from cache. Cache is off while notifications are not listened:
+they could be missed.
+"""
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Optional,
+)
+
+from aiohttp.web_app import Application
+from dynaconf import settings
+
+from billing.db.models import WALLET_BALANCE_CHANNEL
+
+UserInfo = Dict[str, Any]
+
+
+class UserInfoCache:
+    """LRU cache of users info invalidated by balances changes.
+
+    Info read from db is put with token taken before reading (see token):
+    info is not cached if user was invalidated since, it can be stale.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """Init cache (disabled until listener is connected)."""
+        self.maxsize = maxsize
+        self.enabled = False
+        self._users_info: 'OrderedDict[int, UserInfo]' = OrderedDict()
+        # Sequence number of last invalidation
+        self._sequence = 0
+        # user_id -> sequence number of its last invalidation
+        # (recent ones, older are forgotten)
+        self._invalidations: 'OrderedDict[int, int]' = OrderedDict()
+        # Tokens up to this sequence number are rejected
+        self._forgotten_sequence = 0
+
+    def get(self, user_id: int) -> Optional[UserInfo]:
+        """Get cached user info."""
+        if not self.enabled:
+            return None
+        user_info = self._users_info.get(user_id)
+        if user_info is not None:
+            self._users_info.move_to_end(user_id)
+        return user_info
+
+    def token(self) -> int:
+        """Token to put user info which is read after this call."""
+        return self._sequence
+
+    def put(self, user_id: int, user_info: UserInfo, *, token: int) -> None:
+        """Put user info read after token was taken."""
+        if not self.enabled or token < self._forgotten_sequence:
+            return
+        if self._invalidations.get(user_id, 0) > token:
+            return
+        self._users_info[user_id] = user_info
+        self._users_info.move_to_end(user_id)
+        while len(self._users_info) > self.maxsize:
+            self._users_info.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop user info (balance is changed)."""
+        self._sequence += 1
+        self._users_info.pop(user_id, None)
+        self._invalidations[user_id] = self._sequence
+        self._invalidations.move_to_end(user_id)
+        while len(self._invalidations) > self.maxsize:
+            _, forgotten_sequence = self._invalidations.popitem(last=False)
+            self._forgotten_sequence = forgotten_sequence
+
+    def set_listening(self, listening: bool) -> None:
+        """Enable cleared cache when invalidations are listened.
+
+        Cache is disabled while they are not listened.
+        """
+        if listening:
+            self.clear()
+        self.enabled = listening
+
+    def clear(self) -> None:
+        """Drop all users info (reads in progress are not cached)."""
+        self._sequence += 1
+        self._users_info.clear()
+        self._invalidations.clear()
+        self._forgotten_sequence = self._sequence
+
+
+async def init_user_info_cache(app: Application) -> None:
+    """Create users info cache of app subscribed to balances changes.
+
+    Cache is off if settings.USER_INFO_CACHE.size is 0.
+    """
+    cache = UserInfoCache(maxsize=settings.USER_INFO_CACHE.size)
+    app['user_info_cache'] = cache
+    if cache.maxsize > 0:
+        app['notifications'].subscribe(
+            WALLET_BALANCE_CHANNEL,
+            on_notification=lambda payload: cache.invalidate(int(payload)),
+            on_listening=cache.set_listening,
+        )
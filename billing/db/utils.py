@@ -0,0 +1,27 @@
+"""Query helpers."""
+
+from typing import Sequence
+
+from sqlalchemy import (
+    bindparam,
+    cast,
+    literal,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import TypeEngine
+
+
+def array_param(values: Sequence, item_type: TypeEngine):
+    """Array query parameter.
+
+    One parameter for any count of values
+    (use with ANY() or unnest() instead of IN/VALUES lists).
+    """
+    array_type = ARRAY(item_type)
+    return cast(literal(list(values), array_type), array_type)
+
+
+def array_bindparam(name: str, item_type: TypeEngine):
+    """Array query parameter of compiled query (see array_param)."""
+    array_type = ARRAY(item_type)
+    return cast(bindparam(name, type_=array_type), array_type)
@@ -1,19 +1,216 @@
+import random
 from decimal import Decimal
 from typing import (
     Dict,
+    Iterable,
     List,
+    Mapping,
     Optional,
+    Set,
 )
 
+from asyncpg import Record
 from asyncpg.pool import PoolConnectionProxy
 from sqlalchemy import (
+    Integer,
+    Numeric,
+    and_,
+    any_,
+    bindparam,
+    cast,
     exists,
+    func,
     select,
 )
 from sqlalchemy.sql.schema import Column as ColumnType
 
-from billing.db.exceptions import WalletDoesNotExists
-from billing.db.models import wallet
+from billing.db.compiled import (
+    CompiledQuery,
+    compiled_query,
+)
+from billing.db.exceptions import (
+    WalletDoesNotExists,
+    WalletShardDoesNotExists,
+)
+from billing.db.models import (
+    wallet,
+    wallet_shard,
+    wallet_top_up,
+)
+from billing.db.utils import array_bindparam
+
+
+def shards_balance(wallet_id=wallet.c.id):
+    """Sum of hot wallet sub-balances."""
+    return select(
+        [func.coalesce(func.sum(wallet_shard.c.balance), 0)],
+    ).where(
+        wallet_shard.c.wallet_id == wallet_id,
+    ).as_scalar()
+
+
+def wallet_balance():
+    """Wallet balance column (with sub-balances of hot wallet)."""
+    return (wallet.c.balance + shards_balance()).label('balance')
+
+
+def wallet_columns(columns: List[ColumnType]) -> List:
+    """Wallet columns with full balance."""
+    return [
+        wallet_balance() if column is wallet.c.balance else column
+        for column in columns
+    ]
+
+
+wallet_exists_query = CompiledQuery(
+    'wallet_exists',
+    select([exists().where(wallet.c.id == bindparam('wallet_id'))]),
+)
+existing_wallets_query = CompiledQuery(
+    'existing_wallets',
+    select([wallet.c.id]).where(
+        wallet.c.id == any_(array_bindparam('wallet_ids', Integer)),
+    ),
+)
+wallet_info_query = CompiledQuery(
+    'wallet_info',
+    select(wallet_columns(list(wallet.c))).where(
+        wallet.c.id == bindparam('wallet_id'),
+    ),
+)
+# FOR KEY SHARE: count of shards can not be changed until commit
+# (see set_wallet_shards), concurrent top ups do not wait each other
+wallet_shards_query = CompiledQuery(
+    'wallet_shards',
+    select([wallet.c.shards]).where(
+        wallet.c.id == bindparam('wallet_id'),
+    ).with_for_update(read=True, key_share=True),
+)
+add_to_wallet_query = CompiledQuery(
+    'add_to_wallet',
+    wallet.update().where(
+        wallet.c.id == bindparam('wallet_id'),
+    ).values(
+        balance=wallet.c.balance + bindparam('amount', type_=Numeric),
+    ).returning(wallet.c.balance),
+)
+add_top_up_query = CompiledQuery(
+    'add_top_up',
+    wallet_top_up.insert().values(
+        wallet_id=bindparam('wallet_id'),
+        amount=bindparam('amount', type_=Numeric),
+    ),
+)
+get_from_wallet_query = CompiledQuery(
+    'get_from_wallet',
+    wallet.update().where(
+        wallet.c.id == bindparam('wallet_id'),
+    ).values(
+        balance=wallet.c.balance - bindparam('amount', type_=Numeric),
+    ).returning(wallet_balance()),
+)
+
+
+def _locked_wallets_query(**lock_options):
+    return select(
+        list(wallet.c) + [shards_balance().label('shards_balance')],
+    ).where(
+        wallet.c.id == any_(array_bindparam('wallet_ids', Integer)),
+    ).order_by(
+        wallet.c.id,
+    ).with_for_update(**lock_options)
+
+
+share_wallets_query = CompiledQuery(
+    'share_wallets',
+    _locked_wallets_query(read=True, key_share=True),
+)
+lock_wallets_query = CompiledQuery(
+    'lock_wallets',
+    _locked_wallets_query(key_share=True),
+)
+lock_wallet_shards_query = CompiledQuery(
+    'lock_wallet_shards',
+    select([wallet.c.id]).where(
+        wallet.c.id == bindparam('wallet_id'),
+    ).with_for_update(),
+)
+
+
+def _add_to_wallet_shard_query():
+    credit = wallet_shard.update().where(
+        and_(
+            wallet_shard.c.wallet_id == bindparam('wallet_id'),
+            wallet_shard.c.slot == bindparam('slot'),
+        ),
+    ).values(
+        balance=wallet_shard.c.balance + bindparam('amount', type_=Numeric),
+    ).returning(wallet_shard.c.balance).cte('credit')
+    # Statement snapshot does not see credit: credited shard is replaced
+    other_shards_balance = select(
+        [func.coalesce(func.sum(wallet_shard.c.balance), 0)],
+    ).where(
+        and_(
+            wallet_shard.c.wallet_id == bindparam('wallet_id'),
+            wallet_shard.c.slot != bindparam('slot'),
+        ),
+    ).as_scalar()
+    return select(
+        [wallet.c.balance + other_shards_balance + credit.c.balance],
+    ).where(wallet.c.id == bindparam('wallet_id'))
+
+
+def _consolidate_wallets_query():
+    shards_to_move = select(
+        [
+            wallet_shard.c.wallet_id,
+            wallet_shard.c.slot,
+            wallet_shard.c.balance,
+        ],
+    ).where(
+        and_(
+            wallet_shard.c.wallet_id == any_(
+                array_bindparam('wallet_ids', Integer),
+            ),
+            wallet_shard.c.balance != 0,
+        ),
+    ).order_by(
+        wallet_shard.c.wallet_id,
+        wallet_shard.c.slot,
+    ).with_for_update().cte('shards_to_move')
+    moved = wallet_shard.update().where(
+        and_(
+            wallet_shard.c.wallet_id == shards_to_move.c.wallet_id,
+            wallet_shard.c.slot == shards_to_move.c.slot,
+        ),
+    ).values(balance=0).returning(
+        shards_to_move.c.wallet_id,
+        shards_to_move.c.balance,
+    ).cte('moved')
+    moved_balances = select(
+        [moved.c.wallet_id, func.sum(moved.c.balance).label('balance')],
+    ).group_by(moved.c.wallet_id).alias('moved_balances')
+    return wallet.update().where(
+        wallet.c.id == moved_balances.c.wallet_id,
+    ).values(balance=wallet.c.balance + moved_balances.c.balance)
+
+
+add_to_wallet_shard_query = CompiledQuery(
+    'add_to_wallet_shard',
+    _add_to_wallet_shard_query(),
+)
+consolidate_wallets_query = CompiledQuery(
+    'consolidate_wallets',
+    _consolidate_wallets_query(),
+)
+lock_hot_wallets_query = CompiledQuery(
+    'lock_hot_wallets',
+    select([wallet.c.id]).where(
+        wallet.c.shards > 0,
+    ).order_by(
+        wallet.c.id,
+    ).with_for_update(key_share=True, skip_locked=True),
+)
 
 
 async def is_wallet_exists(
@@ -22,11 +219,26 @@ async def is_wallet_exists(
     wallet_id: int,
 ) -> bool:
     """Existing wallet."""
-    wallet_exists_query = select([exists().where(wallet.c.id == wallet_id)])
-    wallet_exists: bool = await conn.fetchval(wallet_exists_query)
+    wallet_exists: bool = await wallet_exists_query.fetchval(
+        conn,
+        wallet_id=wallet_id,
+    )
     return wallet_exists  # NOQA:WPS331
 
 
+async def get_existing_wallets(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_ids: Iterable[int],
+) -> Set[int]:
+    """Existing wallets ids from given (one query for all)."""
+    wallet_records = await existing_wallets_query.fetch(
+        conn,
+        wallet_ids=list(set(wallet_ids)),
+    )
+    return {record['id'] for record in wallet_records}
+
+
 async def get_wallet_info(
     conn: PoolConnectionProxy,
     *,
@@ -35,17 +247,19 @@ async def get_wallet_info(
 ):
     """Get wallet info."""
     if columns is None:
-        wallet_info = await conn.fetchrow(
-            wallet.select().where(wallet.c.id == wallet_id),
-        )
+        query = wallet_info_query
     else:
-        wallet_info = await conn.fetchrow(
-            select(columns).select_from(
+        query = compiled_query(
+            'wallet_info:{0}'.format(
+                ','.join(column.name for column in columns),
+            ),
+            lambda: select(wallet_columns(columns)).select_from(
                 wallet,
             ).where(
-                wallet.c.id == wallet_id,
+                wallet.c.id == bindparam('wallet_id'),
             ),
         )
+    wallet_info = await query.fetchrow(conn, wallet_id=wallet_id)
     if wallet_info is not None:
         wallet_info_dict: Optional[Dict] = dict(wallet_info)
     else:
@@ -59,21 +273,31 @@ async def add_to_wallet(  # NOQA:WPS211
     wallet_id: int,
     amount: Decimal,
 ) -> Decimal:
-    """Wallet top up."""
+    """Wallet top up.
+
+    Should be called inside db transaction.
+    Top up of hot wallet goes to random shard:
+    concurrent top ups do not wait for one wallet row lock.
+    Top up is recorded for balance snapshots (see billing.db.balance).
+    """
     if amount < 0:
         raise ValueError('Amount must be positive')
-    wallet_exists = await is_wallet_exists(
+    shards = await wallet_shards_query.fetchval(conn, wallet_id=wallet_id)
+    if shards is None:
+        raise WalletDoesNotExists('Wallet does not exists')
+    await add_top_up_query.execute(conn, wallet_id=wallet_id, amount=amount)
+    if shards:
+        return await add_to_wallet_shard(
+            conn,
+            wallet_id=wallet_id,
+            slot=random.randrange(shards),  # NOQA: S311
+            amount=amount,
+        )
+    new_balance_record = await add_to_wallet_query.fetchrow(
         conn,
         wallet_id=wallet_id,
+        amount=amount,
     )
-    if wallet_exists is False:
-        raise WalletDoesNotExists('Wallet does not exists')
-    wallet_update_query = wallet \
-        .update() \
-        .where(wallet.c.id == wallet_id) \
-        .values(balance=wallet.c.balance + amount) \
-        .returning(wallet.c.balance)
-    new_balance_record = await conn.fetchrow(wallet_update_query)
     new_balance: Decimal = new_balance_record['balance']
     return new_balance  # NOQA:WPS331
 
@@ -84,20 +308,204 @@ async def get_from_wallet(  # NOQA:WPS211
     wallet_id: int,
     amount: Decimal,
 ) -> Decimal:
-    """Get money from wallet."""
+    """Get money from wallet.
+
+    Must be called inside db transaction.
+    Sub-balances of hot wallet are consolidated if wallet row
+    balance is not enough (see lock_wallets).
+
+    :return: new wallet balance
+    """
     if amount < 0:
         raise ValueError('Amount must be positive')
-    wallet_exists = await is_wallet_exists(
+    wallets = await lock_wallets(
         conn,
-        wallet_id=wallet_id,
+        wallet_ids=[wallet_id],
+        debits={wallet_id: amount},
     )
-    if wallet_exists is False:
+    if not wallets:
         raise WalletDoesNotExists('Wallet does not exists')
-    wallet_update_query = wallet \
-        .update() \
-        .where(wallet.c.id == wallet_id) \
-        .values(balance=wallet.c.balance - amount) \
-        .returning(wallet.c.balance)
-    new_balance_record = await conn.fetchrow(wallet_update_query)
+    new_balance_record = await get_from_wallet_query.fetchrow(
+        conn,
+        wallet_id=wallet_id,
+        amount=amount,
+    )
     new_balance: Decimal = new_balance_record['balance']
     return new_balance  # NOQA:WPS331
+
+
+async def lock_wallets(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_ids: Iterable[int],
+    debits: Optional[Mapping[int, Decimal]] = None,
+) -> Dict[int, Record]:
+    """Lock wallets rows for balance update.
+
+    Rows are locked in order of id: concurrent transactions
+    which lock the same wallets can not deadlock.
+    FOR NO KEY UPDATE does not block foreign keys checks
+    of new transactions.
+    Hot wallets which are not debited are locked FOR KEY SHARE only:
+    their credits go to shards (see credit_slots), so concurrent
+    credits do not wait each other.
+    Debited hot wallet is consolidated if its row balance
+    does not cover debits.
+
+    :param debits: wallet_id -> sum of debits from wallet
+    :return: wallet_id -> wallet record (balance of wallet row
+        and shards_balance - sum of sub-balances)
+    """
+    if debits is None:
+        debits = {}
+    wallet_records = await share_wallets_query.fetch(
+        conn,
+        wallet_ids=list(set(wallet_ids)),
+    )
+    wallets = {record['id']: record for record in wallet_records}
+
+    updated_wallet_ids = [
+        wallet_id
+        for wallet_id, wallet_info in wallets.items()
+        if not wallet_info['shards'] or wallet_id in debits
+    ]
+    if updated_wallet_ids:
+        wallet_records = await lock_wallets_query.fetch(
+            conn,
+            wallet_ids=updated_wallet_ids,
+        )
+        wallets.update((record['id'], record) for record in wallet_records)
+
+    consolidated_wallet_ids = [
+        wallet_id
+        for wallet_id, debit in debits.items()
+        if wallet_id in wallets
+        and wallets[wallet_id]['shards']
+        and wallets[wallet_id]['balance'] < debit
+    ]
+    if consolidated_wallet_ids:
+        await consolidate_wallets(conn, wallet_ids=consolidated_wallet_ids)
+        wallet_records = await lock_wallets_query.fetch(
+            conn,
+            wallet_ids=consolidated_wallet_ids,
+        )
+        wallets.update((record['id'], record) for record in wallet_records)
+    return wallets
+
+
+def credit_slots(
+    wallets: Mapping[int, Record],
+    *,
+    debits: Mapping[int, Decimal],
+) -> Dict[int, int]:
+    """Random shard slots for credits of hot wallets (see lock_wallets).
+
+    One slot per wallet: transaction locks one shard of wallet.
+    Debited wallets are credited to wallet row (it is locked anyway).
+
+    :return: wallet_id -> slot
+    """
+    return {
+        wallet_id: random.randrange(wallet_info['shards'])  # NOQA: S311
+        for wallet_id, wallet_info in wallets.items()
+        if wallet_info['shards'] and wallet_id not in debits
+    }
+
+
+async def add_to_wallet_shard(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_id: int,
+    slot: int,
+    amount: Decimal,
+) -> Decimal:
+    """Hot wallet top up.
+
+    Only shard row is locked.
+
+    :raises WalletShardDoesNotExists: shards of wallet were changed
+    :return: new wallet balance
+    """
+    new_balance: Optional[Decimal] = await add_to_wallet_shard_query.fetchval(
+        conn,
+        wallet_id=wallet_id,
+        slot=slot,
+        amount=amount,
+    )
+    if new_balance is None:
+        raise WalletShardDoesNotExists(
+            'Wallet {0} has no shard {1}'.format(wallet_id, slot),
+        )
+    return new_balance
+
+
+async def set_wallet_shards(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_id: int,
+    shards: int,
+) -> None:
+    """Set count of hot wallet sub-balances (0 - wallet is not hot).
+
+    Must be called inside db transaction.
+    Credits throughput of wallet scales with count of shards.
+    Wallet row is locked FOR UPDATE: waits top ups and transfers
+    which use current shards.
+    """
+    if shards < 0:
+        raise ValueError('Shards count must be positive')
+    if await lock_wallet_shards_query.fetchval(conn, wallet_id=wallet_id) is None:
+        raise WalletDoesNotExists('Wallet does not exists')
+    await consolidate_wallets(conn, wallet_ids=[wallet_id])
+    await conn.execute(
+        wallet_shard.delete().where(wallet_shard.c.wallet_id == wallet_id),
+    )
+    if shards:
+        await conn.execute(
+            wallet_shard.insert().from_select(
+                ['wallet_id', 'slot'],
+                select(
+                    [
+                        wallet.c.id,
+                        func.generate_series(0, cast(shards - 1, Integer)),
+                    ],
+                ).where(wallet.c.id == wallet_id),
+            ),
+        )
+    await conn.execute(
+        wallet.update().where(
+            wallet.c.id == wallet_id,
+        ).values(shards=shards),
+    )
+
+
+async def consolidate_wallets(
+    conn: PoolConnectionProxy,
+    *,
+    wallet_ids: Iterable[int],
+) -> None:
+    """Move sub-balances of hot wallets to wallets rows.
+
+    Must be called inside db transaction.
+    Wallets rows should be locked by caller (see lock_wallets).
+    Shards rows are locked: consolidation waits concurrent top ups.
+    """
+    await consolidate_wallets_query.execute(
+        conn,
+        wallet_ids=list(set(wallet_ids)),
+    )
+
+
+async def consolidate_hot_wallets(conn: PoolConnectionProxy) -> int:
+    """Consolidate hot wallets which are not locked by others.
+
+    Must be called inside db transaction.
+
+    :return: count of consolidated wallets
+    """
+    wallet_ids = [
+        record['id'] for record in await lock_hot_wallets_query.fetch(conn)
+    ]
+    if wallet_ids:
+        await consolidate_wallets(conn, wallet_ids=wallet_ids)
+    return len(wallet_ids)
@@ -0,0 +1,141 @@
+"""Events of wallets transactions.
+
+New transactions logs are notified by db trigger on commit
+(channel TRANSACTION_LOG_CHANNEL, payload - json of log with wallets
+of transaction). Every app process listens them
+(see billing.db.notifications) and fans them out to subscribers
+of wallets: both wallets of transaction get event.
+Every subscriber has bounded queue of events: slow subscriber
+is closed when its queue is full (producer never waits).
+Subscriptions are closed when notifications are not listened:
+events could be missed.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Optional,
+    Set,
+)
+
+from aiohttp.web_app import Application
+from dynaconf import settings
+
+from billing.db.models import TRANSACTION_LOG_CHANNEL
+
+WalletEvent = Dict[str, Any]
+
+
+class Subscription:
+    """Events of wallet for one subscriber."""
+
+    def __init__(self, wallet_id: int, *, maxsize: int) -> None:
+        """Init open subscription with empty queue."""
+        self.wallet_id = wallet_id
+        self.maxsize = maxsize
+        self.closed = False
+        self._events: Deque[WalletEvent] = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, event: WalletEvent) -> bool:
+        """Put event to queue.
+
+        :return: False if queue is full
+        """
+        if len(self._events) >= self.maxsize:
+            return False
+        self._events.append(event)
+        self._ready.set()
+        return True
+
+    def close(self) -> None:
+        """Close subscription (queued events can be got)."""
+        self.closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[WalletEvent]:
+        """Wait next event.
+
+        :return: None if subscription is closed and queue is empty
+        """
+        while not self._events:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._events.popleft()
+
+
+class WalletEvents:
+    """Subscriptions to wallets events."""
+
+    def __init__(self, *, queue_size: int) -> None:
+        """Init without subscriptions (closed until listening starts).
+
+        :param queue_size: max count of queued events of subscriber
+        """
+        self.queue_size = queue_size
+        self.listening = False
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, wallet_id: int) -> Subscription:
+        """Subscribe to events of wallet.
+
+        Subscription is closed at once if events are not listened.
+        """
+        subscription = Subscription(wallet_id, maxsize=self.queue_size)
+        if self.listening:
+            self._subscriptions.setdefault(wallet_id, set()).add(subscription)
+        else:
+            subscription.close()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Close subscription."""
+        subscription.close()
+        wallet_subscriptions = self._subscriptions.get(subscription.wallet_id)
+        if wallet_subscriptions is None:
+            return
+        wallet_subscriptions.discard(subscription)
+        if not wallet_subscriptions:
+            del self._subscriptions[subscription.wallet_id]  # NOQA: WPS420
+
+    def publish(self, event: WalletEvent) -> None:
+        """Put event to subscriptions of its wallets."""
+        wallet_ids = {event['from_wallet_id'], event['to_wallet_id']}
+        for wallet_id in wallet_ids:
+            for subscription in list(self._subscriptions.get(wallet_id, ())):
+                if not subscription.put(event):
+                    self.unsubscribe(subscription)
+
+    def set_listening(self, listening: bool) -> None:
+        """Close all subscriptions when events are not listened."""
+        self.listening = listening
+        if not listening:
+            for wallet_subscriptions in list(self._subscriptions.values()):
+                for subscription in list(wallet_subscriptions):
+                    self.unsubscribe(subscription)
+
+    def __len__(self) -> int:
+        """Count of subscriptions."""
+        return sum(
+            len(wallet_subscriptions)
+            for wallet_subscriptions in self._subscriptions.values()
+        )
+
+
+async def init_wallet_events(app: Application) -> None:
+    """Create wallets events of app subscribed to transactions logs."""
+    wallet_events = WalletEvents(queue_size=settings.WALLET_EVENTS.queue_size)
+    app['wallet_events'] = wallet_events
+    app['notifications'].subscribe(
+        TRANSACTION_LOG_CHANNEL,
+        on_notification=lambda payload: wallet_events.publish(
+            json.loads(payload),
+        ),
+        on_listening=wallet_events.set_listening,
+    )
@@ -0,0 +1,77 @@
+"""Archivation of old finished transactions.
+
+Finished (SUCCESED, FAILED) transactions older than settings.ARCHIVE.age
+days are moved with their logs from db to archive segments
+(see billing.archive.storage) batch by batch:
+segment is synced to disk before transactions are deleted.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from asyncpg.pool import Pool
+
+from billing.archive.storage import ArchiveStorage
+from billing.db.archive import (
+    claim_archivable_transactions,
+    delete_archived_transactions,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_transactions(
+    pool: Pool,
+    archive: ArchiveStorage,
+    *,
+    age: float,
+    batch_size: int,
+) -> int:
+    """Move transactions older than age to archive.
+
+    :param age: days
+    :return: count of archived transactions
+    """
+    archived_count = 0
+    while True:  # NOQA: WPS457
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                archivable = await claim_archivable_transactions(
+                    conn,
+                    age=timedelta(days=age),
+                    limit=batch_size,
+                )
+                if archivable:
+                    await archive.write_segment(archivable)
+                    await delete_archived_transactions(
+                        conn,
+                        transaction_ids=[
+                            archived['id'] for archived in archivable
+                        ],
+                    )
+        archived_count += len(archivable)
+        if len(archivable) < batch_size:
+            return archived_count
+
+
+async def run_archivation(
+    pool: Pool,
+    archive: ArchiveStorage,
+    *,
+    interval: float,
+    age: float,
+    batch_size: int,
+) -> None:
+    """Archive old transactions forever."""
+    while True:  # NOQA: WPS457
+        try:
+            await archive_transactions(
+                pool,
+                archive,
+                age=age,
+                batch_size=batch_size,
+            )
+        except Exception:
+            logger.exception('Transactions archivation failed')
+        await asyncio.sleep(interval)
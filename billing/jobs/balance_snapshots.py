@@ -0,0 +1,50 @@
+"""Daily balance snapshots of wallets.
+
+Days which are not snapshotted yet are snapshotted one by one
+(see billing.db.balance): every run reads changes of new days only.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from asyncpg.pool import Pool
+
+from billing.db.balance import (
+    days_to_snapshot,
+    snapshot_day,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def snapshot_balances(
+    pool: Pool,
+    *,
+    delay: float,
+) -> int:
+    """Snapshot balances of days which are ready.
+
+    :param delay: seconds since day end before it is snapshotted
+    :return: count of snapshotted days
+    """
+    async with pool.acquire() as conn:
+        days = await days_to_snapshot(conn, delay=timedelta(seconds=delay))
+        for day in days:
+            await snapshot_day(conn, day=day)
+    return len(days)
+
+
+async def run_balance_snapshots(
+    pool: Pool,
+    *,
+    interval: float,
+    delay: float,
+) -> None:
+    """Snapshot balances forever."""
+    while True:  # NOQA: WPS457
+        try:
+            await snapshot_balances(pool, delay=delay)
+        except Exception:
+            logger.exception('Balance snapshots failed')
+        await asyncio.sleep(interval)
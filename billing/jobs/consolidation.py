@@ -0,0 +1,42 @@
+"""Hot wallets consolidation.
+
+Sub-balances of hot wallets are moved to wallets rows in background,
+so debits rarely have to wait consolidation.
+"""
+
+import asyncio
+import logging
+from functools import partial
+
+from asyncpg.pool import Pool
+
+from billing.db.retry import run_in_transaction
+from billing.db.wallet import consolidate_hot_wallets
+
+logger = logging.getLogger(__name__)
+
+
+async def consolidate(pool: Pool) -> int:
+    """Consolidate hot wallets in db transaction.
+
+    :return: count of consolidated wallets
+    """
+    async with pool.acquire() as conn:
+        return await run_in_transaction(
+            conn,
+            partial(consolidate_hot_wallets, conn),
+        )
+
+
+async def run_consolidation(
+    pool: Pool,
+    *,
+    interval: float,
+) -> None:
+    """Consolidate hot wallets forever."""
+    while True:  # NOQA: WPS457
+        try:
+            await consolidate(pool)
+        except Exception:
+            logger.exception('Hot wallets consolidation failed')
+        await asyncio.sleep(interval)
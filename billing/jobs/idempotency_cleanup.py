@@ -0,0 +1,60 @@
+"""Cleanup of expired idempotency keys.
+
+Requests with idempotency keys are kept for retention period
+(settings.IDEMPOTENCY.retention): retries after it are handled
+as new requests.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from asyncpg.pool import Pool
+
+from billing.db.idempotency import delete_expired_requests
+
+logger = logging.getLogger(__name__)
+
+
+async def cleanup_expired_requests(
+    pool: Pool,
+    *,
+    retention: float,
+    batch_size: int,
+) -> int:
+    """Delete expired requests batch by batch.
+
+    :param retention: seconds
+    :return: count of deleted requests
+    """
+    deleted_count = 0
+    while True:  # NOQA: WPS457
+        async with pool.acquire() as conn:
+            deleted = await delete_expired_requests(
+                conn,
+                retention=timedelta(seconds=retention),
+                limit=batch_size,
+            )
+        deleted_count += deleted
+        if deleted < batch_size:
+            return deleted_count
+
+
+async def run_idempotency_cleanup(
+    pool: Pool,
+    *,
+    interval: float,
+    retention: float,
+    batch_size: int,
+) -> None:
+    """Cleanup expired requests forever."""
+    while True:  # NOQA: WPS457
+        try:
+            await cleanup_expired_requests(
+                pool,
+                retention=retention,
+                batch_size=batch_size,
+            )
+        except Exception:
+            logger.exception('Idempotency keys cleanup failed')
+        await asyncio.sleep(interval)
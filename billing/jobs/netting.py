@@ -0,0 +1,294 @@
+"""Netting of queued transfers.
+
+Transfers of a batch are executed in memory in id order
+(exactly as one by one execution would do), then every changed
+wallet gets one balance update with its net movement.
+Hot wallets are updated once per batch instead of once per transfer:
+credits of hot wallet which is not debited go to its shard.
+"""
+
+from decimal import (
+    MAX_PREC,
+    Decimal,
+    localcontext,
+)
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from asyncpg import Record
+from asyncpg.pool import PoolConnectionProxy
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    Numeric,
+    String,
+    and_,
+    cast,
+    func,
+    select,
+)
+
+from billing.currency_rate.rates_table import ExchangeRates
+from billing.db.exceptions import WalletShardDoesNotExists
+from billing.db.models import (
+    FailedReason,
+    TransactionState,
+    transaction,
+    transaction_log,
+    wallet,
+    wallet_shard,
+)
+from billing.db.transaction import execution_comment_column
+from billing.db.utils import array_param
+
+
+class NettedTransfer(NamedTuple):
+    """Result of netted transfer."""
+
+    transaction_id: int
+    state: TransactionState
+    exchange_rates: ExchangeRates
+    new_balance_from: Optional[Decimal] = None
+    new_balance_to: Optional[Decimal] = None
+    credit_amount: Optional[Decimal] = None
+
+
+def net_transfers(
+    transfers: Sequence[Record],
+    *,
+    balances: Mapping[int, Decimal],
+    exchange_rates: Mapping[int, ExchangeRates],
+    shards_balances: Optional[Mapping[int, Decimal]] = None,
+) -> Tuple[List[NettedTransfer], Dict[int, Decimal]]:
+    """Net transfers.
+
+    :param transfers: claimed transactions in execution order
+    :param balances: wallet id -> wallet row balance before transfers
+    :param exchange_rates: transaction id -> exchange rates
+    :param shards_balances: wallet id -> sub-balances of hot wallet
+        (added to transactions new balances)
+    :return: (transfers results, wallet id -> changed row balance)
+    """
+    if shards_balances is None:
+        shards_balances = {}
+    new_balances = dict(balances)
+    netted_transfers = []
+    for transfer in transfers:
+        from_wallet_id = transfer['from_wallet_id']
+        to_wallet_id = transfer['to_wallet_id']
+        amount = transfer['amount']
+        transfer_rates = exchange_rates[transfer['id']]
+        if new_balances[from_wallet_id] < amount:
+            netted_transfers.append(
+                NettedTransfer(
+                    transaction_id=transfer['id'],
+                    state=TransactionState.FAILED,
+                    exchange_rates=transfer_rates,
+                ),
+            )
+            continue
+
+        # Same rounding as in execute_transaction
+        add_amount = (
+            amount * transfer_rates.from_rate / transfer_rates.to_rate
+        )
+        # Balances arithmetic is exact as in postgres numeric
+        with localcontext() as ctx:
+            ctx.prec = MAX_PREC
+            new_balances[from_wallet_id] -= amount
+            new_balances[to_wallet_id] += add_amount
+            new_balance_from = (
+                new_balances[from_wallet_id]
+                + shards_balances.get(from_wallet_id, 0)
+            )
+            new_balance_to = (
+                new_balances[to_wallet_id]
+                + shards_balances.get(to_wallet_id, 0)
+            )
+        netted_transfers.append(
+            NettedTransfer(
+                transaction_id=transfer['id'],
+                state=TransactionState.SUCCESED,
+                exchange_rates=transfer_rates,
+                new_balance_from=new_balance_from,
+                new_balance_to=new_balance_to,
+                credit_amount=add_amount,
+            ),
+        )
+
+    changed_balances = {
+        wallet_id: balance
+        for wallet_id, balance in new_balances.items()
+        if balance != balances[wallet_id]
+    }
+    return netted_transfers, changed_balances
+
+
+async def settle_netted_transfers(
+    conn: PoolConnectionProxy,
+    *,
+    netted_transfers: Sequence[NettedTransfer],
+    balances: Mapping[int, Decimal],
+    shard_credits: Sequence[Tuple[int, int, Decimal]] = (),
+    with_logs: bool = True,
+) -> None:
+    """Write netted transfers results.
+
+    Must be called inside db transaction with locked wallets.
+    One statement per kind of update for any count of transfers:
+    - balance update of every changed wallet row
+    - credit of shards of hot wallets
+    - transactions states update with logs
+      (if with_logs, otherwise logs are written by caller)
+
+    :param balances: wallet id -> new wallet row balance
+    :param shard_credits: (wallet id, slot, amount) of hot wallets credits
+    """
+    if shard_credits:
+        wallet_ids, slots, amounts = zip(*shard_credits)
+        credits = select(
+            [
+                func.unnest(array_param(wallet_ids, Integer)).label('wallet_id'),
+                func.unnest(array_param(slots, Integer)).label('slot'),
+                func.unnest(array_param(amounts, Numeric)).label('amount'),
+            ],
+        ).alias('credits')
+        credited = await conn.fetch(
+            wallet_shard.update().where(
+                and_(
+                    wallet_shard.c.wallet_id == credits.c.wallet_id,
+                    wallet_shard.c.slot == credits.c.slot,
+                ),
+            ).values(
+                balance=wallet_shard.c.balance + credits.c.amount,
+            ).returning(wallet_shard.c.wallet_id),
+        )
+        if len(credited) != len(shard_credits):
+            raise WalletShardDoesNotExists('Shards of wallets were changed')
+
+    if balances:
+        new_balances = select(
+            [
+                func.unnest(array_param(balances.keys(), Integer)).label('id'),
+                func.unnest(
+                    array_param(balances.values(), Numeric),
+                ).label('balance'),
+            ],
+        ).alias('new_balances')
+        await conn.execute(
+            wallet.update().where(
+                wallet.c.id == new_balances.c.id,
+            ).values(balance=new_balances.c.balance),
+        )
+
+    if not netted_transfers:
+        return
+
+    def column(values, item_type, label):  # NOQA: WPS430
+        return func.unnest(array_param(values, item_type)).label(label)
+
+    is_success = [
+        netted.state == TransactionState.SUCCESED
+        for netted in netted_transfers
+    ]
+    results = select(
+        [
+            column(
+                [netted.transaction_id for netted in netted_transfers],
+                Integer,
+                'id',
+            ),
+            column(
+                [netted.state.name for netted in netted_transfers],
+                String,
+                'state',
+            ),
+            column(
+                [
+                    None if success else FailedReason.NEM_FROM_WALLET.name
+                    for success in is_success
+                ],
+                String,
+                'failed_reason',
+            ),
+            column(
+                [
+                    netted.exchange_rates.from_rate if success else None
+                    for netted, success in zip(netted_transfers, is_success)
+                ],
+                Numeric,
+                'exchange_from_rate',
+            ),
+            column(
+                [
+                    netted.exchange_rates.to_rate if success else None
+                    for netted, success in zip(netted_transfers, is_success)
+                ],
+                Numeric,
+                'exchange_to_rate',
+            ),
+            column(
+                [
+                    netted.exchange_rates.snapshot_id if success else None
+                    for netted, success in zip(netted_transfers, is_success)
+                ],
+                BigInteger,
+                'exchange_rates_snapshot_id',
+            ),
+            column(
+                [netted.new_balance_from for netted in netted_transfers],
+                Numeric,
+                'new_balance_from',
+            ),
+            column(
+                [netted.new_balance_to for netted in netted_transfers],
+                Numeric,
+                'new_balance_to',
+            ),
+            column(
+                [netted.credit_amount for netted in netted_transfers],
+                Numeric,
+                'credit_amount',
+            ),
+        ],
+    ).alias('results')
+
+    done = transaction.update().where(
+        transaction.c.id == results.c.id,
+    ).values(
+        state=cast(results.c.state, transaction.c.state.type),
+        failed_reason=cast(
+            results.c.failed_reason,
+            transaction.c.failed_reason.type,
+        ),
+        exchange_from_rate=results.c.exchange_from_rate,
+        exchange_to_rate=results.c.exchange_to_rate,
+        exchange_rates_snapshot_id=results.c.exchange_rates_snapshot_id,
+        new_balance_from=results.c.new_balance_from,
+        new_balance_to=results.c.new_balance_to,
+        credit_amount=results.c.credit_amount,
+    )
+    if not with_logs:
+        await conn.execute(done)
+        return
+
+    done = done.returning(transaction.c.id, transaction.c.state).cte('done')
+    await conn.execute(
+        transaction_log.insert().from_select(
+            ['transaction_id', 'state', 'comment'],
+            select(
+                [
+                    done.c.id,
+                    done.c.state,
+                    execution_comment_column(done.c.state),
+                ],
+            ),
+        ),
+    )
@@ -0,0 +1,68 @@
+"""Creation of future partitions of transactions tables.
+
+Partitions of current month and settings.PARTITIONS.months_ahead
+next months are created in background, so rows rarely get
+to default partition.
+
+Run once: python -m billing.jobs.partitions
+"""
+
+import asyncio
+import logging
+from typing import List
+
+from asyncpg.pool import Pool
+from dynaconf import settings
+
+from billing.db.partitions import create_partitions
+from billing.db.setup import create_pool
+
+logger = logging.getLogger(__name__)
+
+
+async def maintain_partitions(
+    pool: Pool,
+    *,
+    months_ahead: int,
+) -> List[str]:
+    """Create missing partitions.
+
+    :return: names of created partitions
+    """
+    async with pool.acquire() as conn:
+        created = await create_partitions(conn, months_ahead=months_ahead)
+    for name in created:
+        logger.info('Partition %s is created', name)
+    return created
+
+
+async def run_partitions_maintenance(
+    pool: Pool,
+    *,
+    interval: float,
+    months_ahead: int,
+) -> None:
+    """Create missing partitions forever."""
+    while True:  # NOQA: WPS457
+        try:
+            await maintain_partitions(pool, months_ahead=months_ahead)
+        except Exception:
+            logger.exception('Partitions maintenance failed')
+        await asyncio.sleep(interval)
+
+
+async def main() -> None:
+    """Create missing partitions once."""
+    pool = await create_pool(min_size=1, max_size=1)
+    try:  # NOQA: WPS501
+        await maintain_partitions(
+            pool,
+            months_ahead=settings.PARTITIONS.months_ahead,
+        )
+    finally:
+        await pool.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""Setup transfer workers subsystem."""
+
+from aiohttp.web_app import Application
+from aiojobs.aiohttp import (
+    get_scheduler_from_app,
+    setup,
+)
+from dynaconf import settings
+
+from billing.db.setup import create_pool
+from billing.jobs.archive import run_archivation
+from billing.jobs.balance_snapshots import run_balance_snapshots
+from billing.jobs.consolidation import run_consolidation
+from billing.jobs.idempotency_cleanup import run_idempotency_cleanup
+from billing.jobs.partitions import run_partitions_maintenance
+from billing.jobs.transaction_log_writer import create_log_writer
+from billing.jobs.transfer_worker import run_worker
+
+
+def setup_jobs(app: Application) -> None:
+    """Add transfer workers subsystem to app.
+
+    Workers run on long-lived connections of app['jobs_db'] pool.
+    If settings.JOBS.in_process is off, workers should be run
+    by python -m billing.worker.
+    """
+    setup(app)
+    app.on_startup.append(init_jobs_pg)
+    app.on_startup.append(start_workers)
+    app.on_cleanup.append(close_jobs_pg)
+
+
+async def init_jobs_pg(app: Application) -> None:
+    """Init pg pool for transfer workers.
+
+    By default workers share app db pool.
+    """
+    pool_size = settings.JOBS.pool_size
+    if pool_size:
+        app['jobs_db'] = await create_pool(
+            min_size=pool_size,
+            max_size=pool_size,
+        )
+    else:
+        app['jobs_db'] = app['db']
+
+
+async def start_workers(app: Application) -> None:
+    """Start in-process transfer workers and maintenance jobs.
+
+    Workers are stopped by jobs scheduler on app cleanup.
+    """
+    if not settings.JOBS.in_process:
+        return
+    scheduler = get_scheduler_from_app(app)
+    log_writer = create_log_writer(app['jobs_db'])
+    if log_writer is not None:
+        await scheduler.spawn(log_writer.run())
+    for _ in range(settings.JOBS.workers):
+        await scheduler.spawn(
+            run_worker(
+                app['jobs_db'],
+                batch_size=settings.JOBS.batch_size,
+                idle_interval=settings.JOBS.idle_interval,
+                netting_window=settings.JOBS.netting_window,
+                log_writer=log_writer,
+            ),
+        )
+    await scheduler.spawn(
+        run_consolidation(
+            app['jobs_db'],
+            interval=settings.JOBS.consolidation_interval,
+        ),
+    )
+    await scheduler.spawn(
+        run_idempotency_cleanup(
+            app['jobs_db'],
+            interval=settings.IDEMPOTENCY.cleanup_interval,
+            retention=settings.IDEMPOTENCY.retention,
+            batch_size=settings.IDEMPOTENCY.cleanup_batch_size,
+        ),
+    )
+    await scheduler.spawn(
+        run_partitions_maintenance(
+            app['jobs_db'],
+            interval=settings.PARTITIONS.maintenance_interval,
+            months_ahead=settings.PARTITIONS.months_ahead,
+        ),
+    )
+    await scheduler.spawn(
+        run_balance_snapshots(
+            app['jobs_db'],
+            interval=settings.BALANCE_SNAPSHOT.interval,
+            delay=settings.BALANCE_SNAPSHOT.delay,
+        ),
+    )
+    if settings.ARCHIVE.enabled:
+        await scheduler.spawn(
+            run_archivation(
+                app['jobs_db'],
+                app['archive'],
+                interval=settings.ARCHIVE.interval,
+                age=settings.ARCHIVE.age,
+                batch_size=settings.ARCHIVE.batch_size,
+            ),
+        )
+
+
+async def close_jobs_pg(app: Application) -> None:
+    """Close pg pool for transfer workers."""
+    if app['jobs_db'] is not app['db']:
+        await app['jobs_db'].close()
@@ -0,0 +1,158 @@
+"""Group commit of concurrent top ups.
+
+Top ups of one wallet which come within short window
+(settings.TOP_UP.coalesce_window) are applied by one db transaction
+with one wallet update: concurrent top ups do not queue
+for wallet row lock one by one.
+Every caller gets balance after its own top up
+(as if top ups were applied one by one in order of arrival).
+"""
+
+import asyncio
+from decimal import (
+    MAX_PREC,
+    Decimal,
+    localcontext,
+)
+from typing import (
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+from aiohttp.web_app import Application
+from asyncpg.pool import Pool
+from dynaconf import settings
+
+from billing.db.wallet import add_to_wallet
+
+
+class PendingTopUp(NamedTuple):
+    """Top up waiting for group commit."""
+
+    amount: Decimal
+    future: 'asyncio.Future[Decimal]'
+
+
+class TopUpCoalescer:
+    """Collector of concurrent top ups by wallets."""
+
+    def __init__(
+        self,
+        pool: Pool,
+        *,
+        window: float,
+        max_size: int,
+    ) -> None:
+        """Init coalescer.
+
+        :param window: seconds to collect top ups of wallet
+        :param max_size: count of top ups which are applied
+            without waiting window end
+        """
+        self.pool = pool
+        self.window = window
+        self.max_size = max_size
+        self._pending: Dict[int, List[PendingTopUp]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._commits: Set['asyncio.Future[None]'] = set()
+
+    async def top_up(
+        self,
+        *,
+        wallet_id: int,
+        amount: Decimal,
+    ) -> Decimal:
+        """Wallet top up.
+
+        Top up is applied even if caller is cancelled.
+
+        :raises WalletDoesNotExists: wallet does not exists
+        :return: new wallet balance after this top up
+        """
+        if amount < 0:
+            raise ValueError('Amount must be positive')
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(wallet_id, [])
+        pending.append(PendingTopUp(amount=amount, future=future))
+        if len(pending) >= self.max_size:
+            self._commit(wallet_id)
+        elif len(pending) == 1:
+            self._timers[wallet_id] = loop.call_later(
+                self.window,
+                self._commit,
+                wallet_id,
+            )
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        """Apply pending top ups and wait all commits."""
+        for wallet_id in list(self._pending):
+            self._commit(wallet_id)
+        if self._commits:
+            await asyncio.wait(self._commits)
+
+    def _commit(self, wallet_id: int) -> None:
+        timer = self._timers.pop(wallet_id, None)
+        if timer is not None:
+            timer.cancel()
+        top_ups = self._pending.pop(wallet_id)
+        commit = asyncio.ensure_future(
+            self._apply(wallet_id=wallet_id, top_ups=top_ups),
+        )
+        self._commits.add(commit)
+        commit.add_done_callback(self._commits.discard)
+
+    async def _apply(
+        self,
+        *,
+        wallet_id: int,
+        top_ups: List[PendingTopUp],
+    ) -> None:
+        with localcontext() as ctx:
+            ctx.prec = MAX_PREC
+            total_amount = sum(top_up.amount for top_up in top_ups)
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    new_balance = await add_to_wallet(
+                        conn,
+                        wallet_id=wallet_id,
+                        amount=total_amount,
+                    )
+        except Exception as exc:
+            for failed_top_up in top_ups:
+                failed_top_up.future.set_exception(exc)
+            return
+
+        # Exact as numeric of db
+        with localcontext() as ctx:  # NOQA: WPS440
+            ctx.prec = MAX_PREC
+            balance = new_balance - total_amount
+            for top_up in top_ups:  # NOQA: WPS440
+                balance += top_up.amount
+                top_up.future.set_result(balance)
+
+
+async def init_top_up_coalescer(app: Application) -> None:
+    """Create top ups coalescer of app.
+
+    Coalescing is off if settings.TOP_UP.coalesce_window is 0.
+    """
+    top_up_coalescer: Optional[TopUpCoalescer] = None
+    if settings.TOP_UP.coalesce_window > 0:
+        top_up_coalescer = TopUpCoalescer(
+            app['db'],
+            window=settings.TOP_UP.coalesce_window,
+            max_size=settings.TOP_UP.coalesce_max_size,
+        )
+    app['top_up_coalescer'] = top_up_coalescer
+
+
+async def close_top_up_coalescer(app: Application) -> None:
+    """Apply pending top ups of app."""
+    if app['top_up_coalescer'] is not None:
+        await app['top_up_coalescer'].close()
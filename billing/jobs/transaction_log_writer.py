@@ -0,0 +1,125 @@
+"""Buffered writer of transaction logs.
+
+By default (durable mode) transfer workers write transaction logs
+in the same statement as transaction state change.
+In buffered mode (settings.TRANSACTION_LOG.buffered) logs of executed
+transfers are collected in process after commit and written by COPY
+in batches: every flush_interval seconds or flush_size logs.
+Logs which are not flushed yet are lost if process is killed
+(they are flushed on normal stop), created_at of log is time of flush.
+"""
+
+import asyncio
+import logging
+from typing import (
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+from asyncpg.pool import Pool
+from dynaconf import settings
+
+from billing.db.models import (
+    TransactionState,
+    transaction_log,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LogEntry(NamedTuple):
+    """Transaction log waiting for flush."""
+
+    transaction_id: int
+    state: TransactionState
+    comment: str
+
+
+class TransactionLogWriter:
+    """Buffer of transaction logs."""
+
+    def __init__(
+        self,
+        pool: Pool,
+        *,
+        flush_interval: float,
+        flush_size: int,
+    ) -> None:
+        """Init empty buffer."""
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._entries: List[LogEntry] = []
+        self._flush_needed = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Count of not flushed logs."""
+        return len(self._entries)
+
+    def add(self, entries: Iterable[LogEntry]) -> None:
+        """Add logs of committed transactions."""
+        self._entries.extend(entries)
+        if len(self._entries) >= self.flush_size:
+            self._flush_needed.set()
+
+    async def flush(self) -> int:
+        """Write buffered logs by one COPY.
+
+        Logs are returned to buffer if write fails.
+
+        :return: count of written logs
+        """
+        entries, self._entries = self._entries, []
+        if not entries:
+            return 0
+        written = False
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    transaction_log.name,
+                    columns=['transaction_id', 'state', 'comment'],
+                    records=[
+                        (entry.transaction_id, entry.state.name, entry.comment)
+                        for entry in entries
+                    ],
+                )
+            written = True
+        finally:
+            if not written:
+                self._entries[:0] = entries
+        return len(entries)
+
+    async def run(self) -> None:
+        """Flush logs forever.
+
+        Buffered logs are flushed on cancel.
+        """
+        try:
+            while True:  # NOQA: WPS457
+                try:
+                    await asyncio.wait_for(
+                        self._flush_needed.wait(),
+                        timeout=self.flush_interval,
+                    )
+                except asyncio.TimeoutError:
+                    pass  # NOQA: WPS420
+                self._flush_needed.clear()
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception('Transaction logs flush failed')
+        finally:
+            await self.flush()
+
+
+def create_log_writer(pool: Pool) -> Optional[TransactionLogWriter]:
+    """Writer of settings.TRANSACTION_LOG (None in durable mode)."""
+    if not settings.TRANSACTION_LOG.buffered:
+        return None
+    return TransactionLogWriter(
+        pool,
+        flush_interval=settings.TRANSACTION_LOG.flush_interval,
+        flush_size=settings.TRANSACTION_LOG.flush_size,
+    )
@@ -0,0 +1,372 @@
+"""Transfers queue worker.
+
+Transfers are queued as created transactions. Workers claim batches
+of them with FOR UPDATE SKIP LOCKED, so any count of workers
+(in-process or on other nodes) can process the queue concurrently.
+Not processed transfers survive restarts.
+Optionally transfers are netted (see billing.jobs.netting):
+worker accumulates queue for netting window and nets every batch.
+Rates are taken from one rates snapshot per batch: rates api
+is never awaited while transfers and wallets are locked.
+Logs of executed transfers are written with their state changes
+or by buffered writer (see billing.jobs.transaction_log_writer).
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from decimal import (
+    MAX_PREC,
+    Decimal,
+    localcontext,
+)
+from functools import partial
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from asyncpg import Record
+from asyncpg.exceptions import (
+    DataError,
+    IntegrityConstraintViolationError,
+)
+from asyncpg.pool import (
+    Pool,
+    PoolConnectionProxy,
+)
+from sqlalchemy import (
+    and_,
+    select,
+)
+
+from billing.currency_rate.rates_table import (
+    RatesSnapshot,
+    rates_table,
+)
+from billing.db.models import (
+    FailedReason,
+    TransactionState,
+    transaction,
+)
+from billing.db.retry import run_in_transaction
+from billing.db.transaction import (
+    claim_pending_transactions,
+    execute_transaction,
+    execution_comment,
+    fail_transaction,
+)
+from billing.db.wallet import (
+    credit_slots,
+    lock_wallets,
+)
+from billing.jobs.netting import (
+    net_transfers,
+    settle_netted_transfers,
+)
+from billing.jobs.transaction_log_writer import (
+    LogEntry,
+    TransactionLogWriter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors of broken transfer data: retry can not help.
+# Other errors (timeouts, connections, ...) leave transfers queued.
+BROKEN_TRANSFER_ERRORS = (DataError, IntegrityConstraintViolationError)
+
+
+class TransferFailed(Exception):
+    """Transfer can not be executed."""
+
+    def __init__(self, transaction_id: int) -> None:
+        """Init exception."""
+        super().__init__(
+            'Transfer {transaction_id} failed'.format(
+                transaction_id=transaction_id,
+            ),
+        )
+        self.transaction_id = transaction_id
+
+
+class NettingFailed(Exception):
+    """Netted batch can not be settled."""
+
+
+async def process_transfers_batch(
+    conn: PoolConnectionProxy,
+    *,
+    batch_size: int,
+    rates_snapshot: RatesSnapshot,
+    netting: bool = False,
+    log_entries: Optional[List[LogEntry]] = None,
+) -> int:
+    """Execute batch of queued transfers.
+
+    Must be called inside db transaction.
+    Rates snapshot must be taken before it (see process_transfers).
+    Wallets of all claimed transfers are locked in id order
+    before execution: workers can not deadlock.
+
+    :param log_entries: list to collect logs of executed transfers
+        instead of writing them (it is cleared first:
+        db transaction can be retried)
+    :return: count of executed transfers
+    """
+    if log_entries is not None:
+        log_entries.clear()
+    transfers = await claim_pending_transactions(conn, limit=batch_size)
+    if not transfers:
+        return 0
+
+    wallet_ids = set()
+    debits: Dict[int, Decimal] = defaultdict(Decimal)
+    for transfer in transfers:
+        wallet_ids.update((transfer['from_wallet_id'], transfer['to_wallet_id']))
+        debits[transfer['from_wallet_id']] += transfer['amount']
+    wallets = await lock_wallets(conn, wallet_ids=wallet_ids, debits=debits)
+    slots = credit_slots(wallets, debits=debits)
+
+    if netting:
+        await process_netted_batch(
+            conn,
+            transfers=transfers,
+            wallets=wallets,
+            slots=slots,
+            rates_snapshot=rates_snapshot,
+            log_entries=log_entries,
+        )
+        return len(transfers)
+
+    for transfer in transfers:  # NOQA: WPS440
+        from_wallet_id = transfer['from_wallet_id']
+        to_wallet_id = transfer['to_wallet_id']
+        exchange_rates = rates_snapshot.get_exchange_rates(
+            wallets[from_wallet_id]['currency'],
+            wallets[to_wallet_id]['currency'],
+        )
+        try:
+            new_state = await execute_transaction(
+                conn,
+                transaction_id=transfer['id'],
+                from_wallet_id=from_wallet_id,
+                to_wallet_id=to_wallet_id,
+                amount=transfer['amount'],
+                exchange_rates=exchange_rates,
+                to_slot=slots.get(to_wallet_id),
+                with_log=log_entries is None,
+            )
+        except BROKEN_TRANSFER_ERRORS as exc:
+            raise TransferFailed(transfer['id']) from exc
+        if log_entries is not None:
+            log_entries.append(
+                LogEntry(
+                    transaction_id=transfer['id'],
+                    state=new_state,
+                    comment=execution_comment(new_state),
+                ),
+            )
+    return len(transfers)
+
+
+async def process_netted_batch(
+    conn: PoolConnectionProxy,
+    *,
+    transfers: List[Record],
+    wallets: Dict[int, Record],
+    slots: Dict[int, int],
+    rates_snapshot: RatesSnapshot,
+    log_entries: Optional[List[LogEntry]] = None,
+) -> None:
+    """Execute claimed transfers with netting.
+
+    :param slots: wallet id -> shard slot of credited hot wallet
+    :param log_entries: list to collect logs (see process_transfers_batch)
+    """
+    exchange_rates = {
+        transfer['id']: rates_snapshot.get_exchange_rates(
+            wallets[transfer['from_wallet_id']]['currency'],
+            wallets[transfer['to_wallet_id']]['currency'],
+        )
+        for transfer in transfers
+    }
+    balances = {
+        wallet_id: wallet_info['balance']
+        for wallet_id, wallet_info in wallets.items()
+    }
+    netted_transfers, new_balances = net_transfers(
+        transfers,
+        balances=balances,
+        exchange_rates=exchange_rates,
+        shards_balances={
+            wallet_id: wallet_info['shards_balance']
+            for wallet_id, wallet_info in wallets.items()
+        },
+    )
+    # Hot wallets rows are not locked for update: credits go to shards
+    with localcontext() as ctx:
+        ctx.prec = MAX_PREC
+        shard_credits = [
+            (wallet_id, slots[wallet_id], new_balance - balances[wallet_id])
+            for wallet_id, new_balance in new_balances.items()
+            if wallet_id in slots
+        ]
+    try:
+        await settle_netted_transfers(
+            conn,
+            netted_transfers=netted_transfers,
+            balances={
+                wallet_id: new_balance
+                for wallet_id, new_balance in new_balances.items()
+                if wallet_id not in slots
+            },
+            shard_credits=shard_credits,
+            with_logs=log_entries is None,
+        )
+    except BROKEN_TRANSFER_ERRORS as exc:
+        raise NettingFailed() from exc
+    if log_entries is not None:
+        log_entries.extend(
+            LogEntry(
+                transaction_id=netted.transaction_id,
+                state=netted.state,
+                comment=execution_comment(netted.state),
+            )
+            for netted in netted_transfers
+        )
+
+
+async def fail_transfer(
+    conn: PoolConnectionProxy,
+    *,
+    transaction_id: int,
+) -> None:
+    """Set transfer which can not be executed to failed.
+
+    Broken transfer must not block its batch forever.
+    """
+    async with conn.transaction():
+        claimed_id = await conn.fetchval(
+            select([transaction.c.id]).where(
+                and_(
+                    transaction.c.id == transaction_id,
+                    transaction.c.state == TransactionState.CREATED,
+                ),
+            ).with_for_update(skip_locked=True),
+        )
+        if claimed_id is not None:
+            await fail_transaction(
+                conn,
+                transaction_id=transaction_id,
+                reason=FailedReason.UNKNOWN,
+                comment='Transfer failed',
+            )
+
+
+async def process_transfers(
+    pool: Pool,
+    *,
+    batch_size: int,
+    netting: bool = False,
+    log_writer: Optional[TransactionLogWriter] = None,
+) -> int:
+    """Execute batch of queued transfers in db transaction.
+
+    Without fresh rates snapshot transfers stay queued.
+
+    :param log_writer: writer of logs of executed transfers
+        (None - logs are written in batch db transaction)
+    :return: count of processed transfers
+    """
+    rates_snapshot = rates_table.fresh_snapshot()
+    if rates_snapshot is None:
+        logger.warning('There are no fresh currency rates for transfers')
+        return 0
+    log_entries: Optional[List[LogEntry]] = None
+    if log_writer is not None:
+        log_entries = []
+    async with pool.acquire() as conn:
+        if netting:
+            try:
+                processed = await run_in_transaction(
+                    conn,
+                    partial(
+                        process_transfers_batch,
+                        conn,
+                        batch_size=batch_size,
+                        rates_snapshot=rates_snapshot,
+                        netting=True,
+                        log_entries=log_entries,
+                    ),
+                )
+            except NettingFailed:
+                logger.exception('Transfers netting failed')
+                # Batch is executed transfer by transfer to find broken one
+            else:
+                return add_logs(log_writer, log_entries, processed)
+
+        try:
+            processed = await run_in_transaction(
+                conn,
+                partial(
+                    process_transfers_batch,
+                    conn,
+                    batch_size=batch_size,
+                    rates_snapshot=rates_snapshot,
+                    log_entries=log_entries,
+                ),
+            )
+        except TransferFailed as exc:
+            logger.exception('Transfer execution failed')
+            # Other transfers of batch are returned to queue
+            await fail_transfer(conn, transaction_id=exc.transaction_id)
+            return 1
+    return add_logs(log_writer, log_entries, processed)
+
+
+def add_logs(
+    log_writer: Optional[TransactionLogWriter],
+    log_entries: Optional[List[LogEntry]],
+    processed: int,
+) -> int:
+    """Pass logs of committed batch to writer.
+
+    :return: count of processed transfers
+    """
+    if log_writer is not None and log_entries:
+        log_writer.add(log_entries)
+    return processed
+
+
+async def run_worker(
+    pool: Pool,
+    *,
+    batch_size: int,
+    idle_interval: float,
+    netting_window: float = 0,
+    log_writer: Optional[TransactionLogWriter] = None,
+) -> None:
+    """Process transfers queue forever.
+
+    :param netting_window: seconds to accumulate transfers for netting
+        (0 - netting is off)
+    :param log_writer: buffered writer of transaction logs
+        (None - durable mode)
+    """
+    netting = netting_window > 0
+    while True:  # NOQA: WPS457
+        try:
+            processed = await process_transfers(
+                pool,
+                batch_size=batch_size,
+                netting=netting,
+                log_writer=log_writer,
+            )
+        except Exception:
+            logger.exception('Transfers processing failed')
+            processed = 0
+        if not processed:
+            await asyncio.sleep(idle_interval)
+        elif netting and processed < batch_size:
+            await asyncio.sleep(netting_window)
@@ -4,9 +4,15 @@ from aiohttp_apispec import setup_aiohttp_apispec
 from billing.views import (
     transaction_between_wallets,
     transaction_logs,
+    transactions_batch,
     transactions_history,
     user_info,
     user_register,
+    user_register_batch,
+    wallet_balance_at,
+    wallet_events,
+    wallet_statement,
+    wallet_shards,
     wallet_top_up,
 )
 
@@ -14,24 +20,48 @@ from billing.views import (
 def setup_routes(app: Application) -> None:
     """Add routes to app."""
     app.router.add_post('/v1/user_register', user_register.user_register)
+    app.router.add_post(
+        '/v1/user_register_batch',
+        user_register_batch.user_register_batch,
+    )
     app.router.add_post('/v1/user_info', user_info.user_info)
     app.router.add_post('/v1/wallet_top_up', wallet_top_up.wallet_top_up)
+    app.router.add_post('/v1/wallet_shards', wallet_shards.wallet_shards)
+    app.router.add_post(
+        '/v1/wallet_balance_at',
+        wallet_balance_at.wallet_balance_at,
+    )
     app.router.add_post(
         '/v1/transaction_between_wallets',
         transaction_between_wallets.transaction_between_wallets,
     )
+    app.router.add_post(
+        '/v1/transactions_batch',
+        transactions_batch.transactions_batch,
+    )
 
     app.router.add_post(
         '/v1/transactions_history',
         transactions_history.transactions_history,
     )
 
+    app.router.add_post(
+        '/v1/wallet_statement',
+        wallet_statement.wallet_statement,
+    )
+
     app.router.add_get(
         r'/v1/transaction_logs/{transaction_id:\d+}',
         transaction_logs.transaction_logs,
         allow_head=False,
     )
 
+    app.router.add_get(
+        r'/v1/wallets/{wallet_id:\d+}/events',
+        wallet_events.wallet_events,
+        allow_head=False,
+    )
+
     setup_aiohttp_apispec(
         app=app,
         title='My Documentation',
@@ -0,0 +1,45 @@
+"""Routing of views queries to replicas.
+
+Read-only views read from replicas (see DbRouter.read_pool).
+Client which made write reads from primary for a while
+(settings.REPLICAS.pin_primary seconds): write views set cookie,
+so next reads of client see its writes (read your writes).
+"""
+
+from functools import wraps
+from typing import (
+    Awaitable,
+    Callable,
+)
+
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from asyncpg.pool import Pool
+from dynaconf import settings
+
+PRIMARY_PIN_COOKIE = 'billing_db_primary'
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def read_pool(request: Request) -> Pool:
+    """Pool for read-only queries of request."""
+    return request.app['db_router'].read_pool(
+        pinned=PRIMARY_PIN_COOKIE in request.cookies,
+    )
+
+
+def pin_primary(handler: Handler) -> Handler:
+    """Pin reads of client to primary after successful write."""
+    @wraps(handler)
+    async def wrapper(request: Request) -> Response:
+        response = await handler(request)
+        if response.status < 400 and settings.REPLICAS.pin_primary > 0:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICAS.pin_primary,
+                httponly=True,
+            )
+        return response
+    return wrapper
@@ -0,0 +1,225 @@
+"""Idempotency keys of requests.
+
+Client can retry request with the same Idempotency-Key header:
+response of first request is returned without repeating its changes.
+Key can not be reused for request with other parameters (422).
+Responses are stored in db in request db transaction,
+recent ones are cached in process.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from functools import wraps
+from typing import (
+    Awaitable,
+    Callable,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from aiohttp import web
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from asyncpg.pool import PoolConnectionProxy
+
+from billing.db.exceptions import IdempotencyKeyReused
+from billing.db.idempotency import (
+    claim_idempotency_key,
+    save_idempotent_response,
+)
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+# Swagger description of header
+IDEMPOTENCY_KEY_PARAMETER = {
+    'in': 'header',
+    'name': IDEMPOTENCY_KEY_HEADER,
+    'type': 'string',
+    'required': False,
+    'description': 'Retries with the same key get response of first request',
+}
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class StoredResponse(NamedTuple):
+    """Stored response of request with idempotency key."""
+
+    status: int
+    content_type: str
+    body: str
+    request_hash: str
+
+    def to_response(self) -> Response:
+        """Replay response."""
+        return web.Response(
+            status=self.status,
+            content_type=self.content_type,
+            text=self.body,
+        )
+
+
+class IdempotentResponses:
+    """LRU cache of recent stored responses."""
+
+    def __init__(self, maxsize: int) -> None:
+        """Init cache."""
+        self.maxsize = maxsize
+        self._responses: 'OrderedDict[Tuple[str, str], StoredResponse]' = (
+            OrderedDict()
+        )
+
+    def get(
+        self,
+        endpoint: str,
+        idempotency_key: str,
+    ) -> Optional[StoredResponse]:
+        """Get stored response."""
+        cache_key = (endpoint, idempotency_key)
+        stored_response = self._responses.get(cache_key)
+        if stored_response is not None:
+            self._responses.move_to_end(cache_key)
+        return stored_response
+
+    def put(
+        self,
+        endpoint: str,
+        idempotency_key: str,
+        stored_response: StoredResponse,
+    ) -> None:
+        """Put stored response."""
+        self._responses[(endpoint, idempotency_key)] = stored_response
+        self._responses.move_to_end((endpoint, idempotency_key))
+        while len(self._responses) > self.maxsize:
+            self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        """Clear cache."""
+        self._responses.clear()
+
+
+def error_response(status: int, reason: str) -> Response:
+    """Error response which can be saved (see save_response).
+
+    Body is the same as body of HTTP exception.
+    """
+    return web.Response(
+        status=status,
+        reason=reason,
+        text='{0}: {1}'.format(status, reason),
+    )
+
+
+async def get_request_hash(request: Request) -> str:
+    """Hash of request parameters.
+
+    Validated request data is hashed if there are,
+    so formatting of request body does not matter.
+    """
+    request_data = request.get('data')
+    if request_data is None:
+        request_body = await request.read()
+    else:
+        request_body = json.dumps(
+            request_data,
+            sort_keys=True,
+            default=str,
+        ).encode()
+    return hashlib.sha256(request_body).hexdigest()
+
+
+def reused_key_error() -> web.HTTPUnprocessableEntity:
+    """Error of idempotency key reused for other request."""
+    return web.HTTPUnprocessableEntity(
+        reason='Idempotency key is used by other request',
+    )
+
+
+def idempotent(handler: Handler) -> Handler:
+    """Replay cached responses of requests with idempotency keys.
+
+    Handler must claim request (see claim_request)
+    and save its response (see save_response).
+    """
+    @wraps(handler)
+    async def wrapper(request: Request) -> Response:
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if idempotency_key is None:
+            return await handler(request)
+        request['request_hash'] = await get_request_hash(request)
+        responses = request.app['idempotent_responses']
+        stored_response = responses.get(request.path, idempotency_key)
+        if stored_response is not None:
+            if stored_response.request_hash != request['request_hash']:
+                raise reused_key_error()
+            return stored_response.to_response()
+
+        response = await handler(request)
+        stored_response = request.get('idempotent_response')
+        if stored_response is not None:
+            responses.put(request.path, idempotency_key, stored_response)
+        return response
+    return wrapper
+
+
+async def claim_request(
+    conn: PoolConnectionProxy,
+    request: Request,
+) -> Optional[Response]:
+    """Claim idempotency key of request.
+
+    Must be called inside request db transaction before any changes.
+
+    :raises HTTPUnprocessableEntity: key is used by other request
+    :return: None if request must be handled,
+        else response of previous request with the same key
+    """
+    idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    if idempotency_key is None:
+        return None
+    try:
+        stored_response_record = await claim_idempotency_key(
+            conn,
+            endpoint=request.path,
+            idempotency_key=idempotency_key,
+            request_hash=request['request_hash'],
+        )
+    except IdempotencyKeyReused:
+        raise reused_key_error()
+    if stored_response_record is None:
+        return None
+    stored_response = StoredResponse(**stored_response_record)
+    request['idempotent_response'] = stored_response
+    return stored_response.to_response()
+
+
+async def save_response(
+    conn: PoolConnectionProxy,
+    request: Request,
+    response: Response,
+) -> Response:
+    """Save response of claimed request.
+
+    Must be called inside request db transaction.
+    """
+    idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    if idempotency_key is None:
+        return response
+    stored_response = StoredResponse(
+        status=response.status,
+        content_type=response.content_type,
+        body=response.text,
+        request_hash=request['request_hash'],
+    )
+    await save_idempotent_response(
+        conn,
+        endpoint=request.path,
+        idempotency_key=idempotency_key,
+        status=stored_response.status,
+        content_type=stored_response.content_type,
+        body=stored_response.body,
+    )
+    request['idempotent_response'] = stored_response
+    return response
@@ -0,0 +1,186 @@
+"""Connection of request.
+
+View decorated by request_db gets connection by request_connection:
+it is acquired on first call only (views which do not query db
+do not wait for pool), released after view.
+Modes (DbMode):
+    WRITE - primary, view is one transaction (committed if view returns);
+    READ_ONLY - read pool (see read_pool), read only repeatable read
+        transaction: all reads see one snapshot;
+    NO_TRANSACTION - read pool, every statement is own transaction
+        (no BEGIN/COMMIT round trips, for views with one statement).
+Timeouts of endpoint (seconds) are settings.REQUEST_DB
+with overrides of settings.REQUEST_DB.endpoints[<view name>]:
+    acquire_timeout - wait for pool connection (503 if exceeded);
+    statement_timeout - statements of view transaction (SET LOCAL
+        is sent with BEGIN, no extra round trip), in NO_TRANSACTION
+        mode - whole view (its statement is cancelled), 503 if exceeded.
+"""
+
+import asyncio
+import enum
+from functools import wraps
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from aiohttp import web
+from aiohttp.web import StreamResponse
+from aiohttp.web_request import Request
+from asyncpg.exceptions import QueryCanceledError
+from asyncpg.pool import (
+    Pool,
+    PoolConnectionProxy,
+)
+from dynaconf import settings
+
+from billing.views.db_routing import read_pool
+
+Handler = Callable[[Request], Awaitable[StreamResponse]]
+
+
+@enum.unique
+class DbMode(enum.Enum):
+    """Mode of request connection."""
+
+    WRITE = enum.auto()
+    READ_ONLY = enum.auto()
+    NO_TRANSACTION = enum.auto()
+
+
+BEGIN_QUERIES = {
+    DbMode.WRITE: 'BEGIN',
+    DbMode.READ_ONLY: 'BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY',
+}
+
+
+def endpoint_timeout(endpoint: str, name: str) -> Optional[float]:
+    """Timeout of endpoint (None - no limit)."""
+    timeout = settings.REQUEST_DB.endpoints.get(endpoint, {}).get(
+        name,
+        settings.REQUEST_DB[name],
+    )
+    return timeout or None
+
+
+def query_timeout_error() -> web.HTTPServiceUnavailable:
+    """Error of statement timeout."""
+    return web.HTTPServiceUnavailable(reason='Query timeout')
+
+
+class RequestConnection:
+    """Connection of request acquired on first use."""
+
+    def __init__(
+        self,
+        request: Request,
+        *,
+        mode: DbMode,
+        acquire_timeout: Optional[float],
+        statement_timeout: Optional[float],
+    ) -> None:
+        """Init without connection."""
+        self.request = request
+        self.mode = mode
+        self.acquire_timeout = acquire_timeout
+        self.statement_timeout = statement_timeout
+        self._pool: Optional[Pool] = None
+        self._conn: Optional[PoolConnectionProxy] = None
+
+    async def get(self, *, primary: bool = False) -> PoolConnectionProxy:
+        """Connection (acquired and begun on first call).
+
+        :param primary: read from primary (first call decides)
+        :raises HTTPServiceUnavailable: pool connection is not acquired
+            within acquire timeout
+        """
+        if self._conn is not None:
+            return self._conn
+        if primary or self.mode is DbMode.WRITE:
+            pool = self.request.app['db']
+        else:
+            pool = read_pool(self.request)
+        try:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise web.HTTPServiceUnavailable(reason='Database is busy')
+        self._pool, self._conn = pool, conn
+        begin_query = BEGIN_QUERIES.get(self.mode)
+        if begin_query is not None:
+            if self.statement_timeout is not None:
+                begin_query = '{0}; SET LOCAL statement_timeout = {1:d}'.format(
+                    begin_query,
+                    int(self.statement_timeout * 1000),
+                )
+            await conn.execute(begin_query)
+        return conn
+
+    async def close(self, *, commit: bool) -> None:
+        """End transaction and release connection."""
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            if self.mode in BEGIN_QUERIES and conn.is_in_transaction():
+                await conn.execute('COMMIT' if commit else 'ROLLBACK')
+        finally:
+            await self._pool.release(conn)
+
+
+async def request_connection(
+    request: Request,
+    *,
+    primary: bool = False,
+) -> PoolConnectionProxy:
+    """Connection of request (see request_db)."""
+    connection: RequestConnection = request['db_connection']
+    return await connection.get(primary=primary)
+
+
+async def _run_handler(
+    handler: Handler,
+    request: Request,
+    connection: RequestConnection,
+) -> StreamResponse:
+    if connection.mode is not DbMode.NO_TRANSACTION:
+        return await handler(request)
+    try:
+        return await asyncio.wait_for(
+            handler(request),
+            timeout=connection.statement_timeout,
+        )
+    except asyncio.TimeoutError:
+        raise query_timeout_error()
+
+
+def request_db(mode: DbMode) -> Callable[[Handler], Handler]:
+    """Provide connection of request to view (see request_connection)."""
+    def decorator(handler: Handler) -> Handler:  # NOQA: WPS430
+        endpoint = handler.__name__
+
+        @wraps(handler)
+        async def wrapper(request: Request) -> StreamResponse:
+            connection = RequestConnection(
+                request,
+                mode=mode,
+                acquire_timeout=endpoint_timeout(endpoint, 'acquire_timeout'),
+                statement_timeout=endpoint_timeout(
+                    endpoint,
+                    'statement_timeout',
+                ),
+            )
+            request['db_connection'] = connection
+            try:
+                response = await _run_handler(handler, request, connection)
+            except QueryCanceledError:
+                await connection.close(commit=False)
+                raise query_timeout_error()
+            except BaseException:
+                await connection.close(commit=False)
+                raise
+            await connection.close(commit=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,3 @@
-from contextlib import AsyncExitStack
-
 from aiohttp import web
 from aiohttp.web import Response
 from aiohttp.web_request import Request
@@ -7,15 +5,30 @@ from aiohttp_apispec import (
     docs,
     request_schema,
 )
-from aiojobs.aiohttp import spawn
 from marshmallow import (
     Schema,
     fields,
 )
 from marshmallow.validate import Range
 
-from billing.db.wallet import is_wallet_exists
-from billing.jobs.transfer_between_wallets import transfer_between_wallets_job
+from billing.db.exceptions import WalletDoesNotExists
+from billing.db.transaction import (
+    create_transaction,
+    get_transfer_currencies,
+)
+from billing.views.db_routing import pin_primary
+from billing.views.idempotency import (
+    IDEMPOTENCY_KEY_PARAMETER,
+    claim_request,
+    error_response,
+    idempotent,
+    save_response,
+)
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
 
 
 class TransactionBetweenWalletsRequestSchema(Schema):
@@ -38,12 +51,14 @@ class TransactionBetweenWalletsResponseSchema(Schema):
     # Decimal is not json serializable.
     # Dont whant to deal with its.
     msg = fields.Str()
+    transaction_id = fields.Int()
 
 
 @docs(
     tags=['Transaction'],
     summary='Transaction between wallets',
     description='Transaction between wallets',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     responses={
         200: {
             'schema': TransactionBetweenWalletsResponseSchema,
@@ -58,8 +73,15 @@ class TransactionBetweenWalletsResponseSchema(Schema):
     },
 )
 @request_schema(TransactionBetweenWalletsRequestSchema())
+@pin_primary
+@idempotent
+@request_db(DbMode.WRITE)
 async def transaction_between_wallets(request: Request) -> Response:
-    """Wallet top up."""
+    """Transaction between wallets.
+
+    Request with already used Idempotency-Key header
+    gets response of first request.
+    """
     request_data = request['data']
     from_wallet_id = request_data['from_wallet_id']
     to_wallet_id = request_data['to_wallet_id']
@@ -68,28 +90,40 @@ async def transaction_between_wallets(request: Request) -> Response:
     if from_wallet_id == to_wallet_id:
         raise web.HTTPUnprocessableEntity(reason='Transfer yourself')
 
-    # First check wallet exists.
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
+    # Transaction is queued: it is executed by transfer workers.
+    conn = await request_connection(request)
+    replayed_response = await claim_request(conn, request)
+    if replayed_response is not None:
+        return replayed_response
 
-        for wallet_id in (from_wallet_id, to_wallet_id):
-            if await is_wallet_exists(conn, wallet_id=wallet_id) is False:
-                return web.HTTPNotFound(
-                    reason='Wallet {wallet_id} does not exist'.format(
-                        wallet_id=wallet_id,
-                    ),
-                )
+    # First check wallets exists.
+    try:
+        await get_transfer_currencies(
+            conn,
+            from_wallet_id=from_wallet_id,
+            to_wallet_id=to_wallet_id,
+        )
+    except WalletDoesNotExists as exc:
+        return await save_response(
+            conn,
+            request,
+            error_response(404, str(exc)),
+        )
 
     # Then create trasaction.
-    await spawn(
+    transaction_id = await create_transaction(
+        conn,
+        from_wallet_id=from_wallet_id,
+        to_wallet_id=to_wallet_id,
+        amount=amount,
+    )
+    return await save_response(
+        conn,
         request,
-        transfer_between_wallets_job(
-            from_wallet_id=from_wallet_id,
-            to_wallet_id=to_wallet_id,
-            amount=amount,
+        web.json_response(
+            {
+                'msg': 'Transaction created',
+                'transaction_id': transaction_id,
+            },
         ),
     )
-    return web.json_response({'msg': 'Transaction created'})
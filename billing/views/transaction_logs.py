@@ -1,5 +1,3 @@
-from contextlib import AsyncExitStack
-
 from aiohttp import web
 from aiohttp.web import Response
 from aiohttp.web_request import Request
@@ -10,6 +8,11 @@ from marshmallow import (
 )
 
 from billing.db.transaction import get_transaction_logs
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
 
 
 class TransactionsLogRecord(Schema):
@@ -40,17 +43,14 @@ class TransactionLogsResponseSchema(Schema):
         },
     },
 )
+@request_db(DbMode.NO_TRANSACTION)
 async def transaction_logs(request: Request) -> Response:
     """Transactions logs."""
     transaction_id = request.match_info['transaction_id']
     transaction_id = int(transaction_id)
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
-        logs = await get_transaction_logs(
-            conn,
-            transaction_id=transaction_id,
-        )
+    conn = await request_connection(request)
+    logs = await get_transaction_logs(
+        conn,
+        transaction_id=transaction_id,
+    )
     return web.json_response({'logs': logs})
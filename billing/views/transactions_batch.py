@@ -0,0 +1,111 @@
+from aiohttp import web
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from aiohttp_apispec import (
+    docs,
+    request_schema,
+)
+from marshmallow import (
+    Schema,
+    fields,
+)
+from marshmallow.validate import Length
+
+from billing.db.transaction import create_transactions
+from billing.db.wallet import get_existing_wallets
+from billing.views.transaction_between_wallets import (
+    TransactionBetweenWalletsRequestSchema,
+)
+from billing.views.db_routing import pin_primary
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+MAX_BATCH_SIZE = 10000
+
+
+class TransactionsBatchRequestSchema(Schema):
+    """Request schema."""
+
+    transactions = fields.Nested(
+        TransactionBetweenWalletsRequestSchema,
+        many=True,
+        required=True,
+        validate=[
+            Length(min=1, max=MAX_BATCH_SIZE),
+        ],
+    )
+
+
+class TransactionsBatchResponseSchema(Schema):
+    """Response schema."""
+
+    transaction_ids = fields.List(fields.Int())
+
+
+@docs(
+    tags=['Transaction'],
+    summary='Batch of transactions between wallets',
+    description=(
+        'Create many transactions between wallets at once. '
+        'Batch is created entirely or not created at all.'
+    ),
+    responses={
+        200: {
+            'schema': TransactionsBatchResponseSchema,
+            'description': 'Success response',
+        },
+        404: {
+            'description': 'Wallet does not exists',
+        },
+        422: {
+            'description': 'Validation error',
+        },
+    },
+)
+@request_schema(TransactionsBatchRequestSchema())
+@pin_primary
+@request_db(DbMode.WRITE)
+async def transactions_batch(request: Request) -> Response:
+    """Batch of transactions between wallets."""
+    transfers = [
+        (item['from_wallet_id'], item['to_wallet_id'], item['amount'])
+        for item in request['data']['transactions']
+    ]
+
+    for transfer_number, (from_wallet_id, to_wallet_id, _) in enumerate(
+        transfers,
+    ):
+        if from_wallet_id == to_wallet_id:
+            raise web.HTTPUnprocessableEntity(
+                reason='Transfer yourself (transaction {0})'.format(
+                    transfer_number,
+                ),
+            )
+
+    wallet_ids = {
+        wallet_id
+        for from_wallet_id, to_wallet_id, _ in transfers
+        for wallet_id in (from_wallet_id, to_wallet_id)
+    }
+
+    # Transactions are queued: they are executed by transfer workers.
+    conn = await request_connection(request)
+
+    # First check wallets exists.
+    missing_wallet_ids = wallet_ids - await get_existing_wallets(
+        conn,
+        wallet_ids=wallet_ids,
+    )
+    if missing_wallet_ids:
+        return web.HTTPNotFound(
+            reason='Wallets {0} do not exist'.format(
+                ', '.join(map(str, sorted(missing_wallet_ids))),
+            ),
+        )
+
+    # Then create trasactions.
+    transaction_ids = await create_transactions(conn, transfers=transfers)
+    return web.json_response({'transaction_ids': transaction_ids})
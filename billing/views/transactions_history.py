@@ -1,4 +1,11 @@
-from contextlib import AsyncExitStack
+import base64
+import binascii
+import json
+from typing import (
+    Any,
+    Dict,
+    Optional,
+)
 
 from aiohttp import web
 from aiohttp.web import Response
@@ -11,9 +18,22 @@ from marshmallow import (
     Schema,
     fields,
 )
+from marshmallow.validate import Range
 
-from billing.db.transaction import transfers_history
+from billing.db.transaction import (
+    HistoryPosition,
+    history_position,
+    transfers_history,
+)
 from billing.db.wallet import is_wallet_exists
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 
 class TransactionsHistoryRequestSchema(Schema):
@@ -22,6 +42,14 @@ class TransactionsHistoryRequestSchema(Schema):
     wallet_id = fields.Int(description='wallet_id', required=True)
     start = fields.DateTime(description='start')
     end = fields.DateTime(description='end')
+    limit = fields.Int(
+        description='page size',
+        missing=DEFAULT_PAGE_SIZE,
+        validate=[
+            Range(min=1, max=MAX_PAGE_SIZE),
+        ],
+    )
+    cursor = fields.Str(description='next_cursor of previous page')
 
 
 class TransactionsHistoryRecord(Schema):
@@ -40,6 +68,34 @@ class TransactionsHistoryResponseSchema(Schema):
     """Response transactions history schema."""
 
     history = fields.Nested(TransactionsHistoryRecord)
+    # None if page is last
+    next_cursor = fields.Str(description='cursor of next page')
+
+
+def encode_cursor(history_record: Dict[str, Any]) -> str:
+    """Opaque cursor of page after history record."""
+    position = [history_record['created_at'], history_record['transaction_id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> HistoryPosition:
+    """Position of history record from cursor.
+
+    :raises HTTPUnprocessableEntity: bad cursor
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return history_position(
+            {'created_at': position[0], 'transaction_id': int(position[1])},
+        )
+    except (
+        binascii.Error,
+        IndexError,
+        KeyError,
+        TypeError,
+        ValueError,
+    ):
+        raise web.HTTPUnprocessableEntity(reason='Bad cursor')
 
 
 @docs(
@@ -60,24 +116,37 @@ class TransactionsHistoryResponseSchema(Schema):
     },
 )
 @request_schema(TransactionsHistoryRequestSchema())
+@request_db(DbMode.READ_ONLY)
 async def transactions_history(request: Request) -> Response:
-    """Transactions history."""
+    """Transactions history.
+
+    History is returned by pages: request with next_cursor
+    of response gets next page.
+    """
     request_data = request['data']
     wallet_id = request_data['wallet_id']
     start = request_data.get('start')
     end = request_data.get('end')
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
-        wallet_exist = await is_wallet_exists(conn, wallet_id=wallet_id)
-        if wallet_exist is False:
-            return web.HTTPNotFound(reason='Wallet does not exists')
-        history = await transfers_history(
-            conn,
-            wallet_id=wallet_id,
-            start=start,
-            end=end,
-        )
-    return web.json_response({'history': history})
+    limit = request_data['limit']
+    after: Optional[HistoryPosition] = None
+    if 'cursor' in request_data:
+        after = decode_cursor(request_data['cursor'])
+    conn = await request_connection(request)
+    wallet_exist = await is_wallet_exists(conn, wallet_id=wallet_id)
+    if wallet_exist is False:
+        return web.HTTPNotFound(reason='Wallet does not exists')
+    # One more record: is there next page
+    history = await transfers_history(
+        conn,
+        wallet_id=wallet_id,
+        start=start,
+        end=end,
+        after=after,
+        limit=limit + 1,
+        archive=request.app['archive'],
+    )
+    next_cursor = None
+    if len(history) > limit:
+        history = history[:limit]
+        next_cursor = encode_cursor(history[-1])
+    return web.json_response({'history': history, 'next_cursor': next_cursor})
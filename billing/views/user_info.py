@@ -1,4 +1,4 @@
-from contextlib import AsyncExitStack
+from typing import Mapping
 
 from aiohttp import web
 from aiohttp.web import Response
@@ -13,6 +13,11 @@ from marshmallow import (
 )
 
 from billing.db.user import get_user_info
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
 
 
 class UserInfoRequestSchema(Schema):
@@ -31,6 +36,13 @@ class UserInfoResponseSchema(Schema):
     currency = fields.Str()
 
 
+def user_info_response(user_data: Mapping) -> Response:
+    """User info response (user_data is not changed: it can be cached)."""
+    return web.json_response(
+        dict(user_data, balance=str(user_data['balance'])),
+    )
+
+
 @docs(
     tags=['User'],
     summary='User info',
@@ -49,19 +61,27 @@ class UserInfoResponseSchema(Schema):
     },
 )
 @request_schema(UserInfoRequestSchema())
+@request_db(DbMode.NO_TRANSACTION)
 async def user_info(request: Request) -> Response:
-    """User info."""
+    """User info.
+
+    Info is served from users info cache if there are
+    (see billing.db.user_info_cache). Info which is cached is read
+    from primary: info of replica can be older than invalidation.
+    Replicas are used if cache is off.
+    """
     request_data = request['data']
     user_id = request_data['user_id']
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
+    cache = request.app['user_info_cache']
+    user_data = cache.get(user_id)
+    if user_data is not None:
+        return user_info_response(user_data)
 
-        try:
-            user_data = await get_user_info(conn, user_id=user_id)
-        except ValueError:
-            raise web.HTTPNotFound(reason='User does not exists')
-    user_data['balance'] = str(user_data['balance'])
-    return web.json_response(user_data)
+    token = cache.token()
+    conn = await request_connection(request, primary=cache.enabled)
+    try:
+        user_data = await get_user_info(conn, user_id=user_id)
+    except ValueError:
+        raise web.HTTPNotFound(reason='User does not exists')
+    cache.put(user_id, user_data, token=token)
+    return user_info_response(user_data)
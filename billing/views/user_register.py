@@ -1,4 +1,3 @@
-from contextlib import AsyncExitStack
 from decimal import Decimal
 
 from aiohttp import web
@@ -18,6 +17,12 @@ from marshmallow_enum import EnumField
 
 from billing.db.models import Currency
 from billing.db.user import create_new_user
+from billing.views.db_routing import pin_primary
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
 
 
 class UserRegisterRequestSchema(Schema):
@@ -50,6 +55,8 @@ class UserRegisterResponseSchema(Schema):
 )
 @request_schema(UserRegisterRequestSchema())
 @response_schema(UserRegisterResponseSchema())
+@pin_primary
+@request_db(DbMode.WRITE)
 async def user_register(request: Request) -> Response:
     """Register new user."""
     request_data = request['data']
@@ -57,19 +64,15 @@ async def user_register(request: Request) -> Response:
     if balance is None:
         balance = Decimal(0.0)
 
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
-        new_user_id, new_wallet_id = await create_new_user(
-            conn,
-            name=request_data['name'],
-            country=request_data['country'],
-            city=request_data['city'],
-            currency=request_data['currency'],
-            balance=balance,
-        )
+    conn = await request_connection(request)
+    new_user_id, new_wallet_id = await create_new_user(
+        conn,
+        name=request_data['name'],
+        country=request_data['country'],
+        city=request_data['city'],
+        currency=request_data['currency'],
+        balance=balance,
+    )
     return web.json_response(
         {
             'new_user_id': new_user_id,
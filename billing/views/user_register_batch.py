@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from aiohttp import web
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from aiohttp_apispec import (
+    docs,
+    request_schema,
+)
+from marshmallow import (
+    Schema,
+    fields,
+)
+from marshmallow.validate import Length
+
+from billing.db.user import create_new_users
+from billing.views.user_register import (
+    UserRegisterRequestSchema,
+    UserRegisterResponseSchema,
+)
+from billing.views.db_routing import pin_primary
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+MAX_BATCH_SIZE = 100000
+
+
+class UserRegisterBatchRequestSchema(Schema):
+    """Request schema."""
+
+    users = fields.Nested(
+        UserRegisterRequestSchema,
+        many=True,
+        required=True,
+        validate=[
+            Length(min=1, max=MAX_BATCH_SIZE),
+        ],
+    )
+
+
+class UserRegisterBatchResponseSchema(Schema):
+    """Response schema."""
+
+    users = fields.Nested(UserRegisterResponseSchema, many=True)
+
+
+@docs(
+    tags=['User'],
+    summary='Create many new users',
+    description=(
+        'Register many users with wallets at once. '
+        'Batch is created entirely or not created at all.'
+    ),
+    responses={
+        200: {
+            'schema': UserRegisterBatchResponseSchema,
+            'description': 'Success response (users in order of request)',
+        },
+        422: {
+            'description': 'Validation error',
+        },
+    },
+)
+@request_schema(UserRegisterBatchRequestSchema())
+@pin_primary
+@request_db(DbMode.WRITE)
+async def user_register_batch(request: Request) -> Response:
+    """Register many new users."""
+    users = [
+        {
+            'name': user_data['name'],
+            'country': user_data['country'],
+            'city': user_data['city'],
+            'currency': user_data['currency'],
+            'balance': user_data.get('balance', Decimal(0)),
+        }
+        for user_data in request['data']['users']
+    ]
+
+    conn = await request_connection(request)
+    new_ids = await create_new_users(conn, users=users)
+    return web.json_response(
+        {
+            'users': [
+                {
+                    'new_user_id': new_user_id,
+                    'new_wallet_id': new_wallet_id,
+                }
+                for new_user_id, new_wallet_id in new_ids
+            ],
+        },
+    )
@@ -0,0 +1,72 @@
+from aiohttp import web
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from aiohttp_apispec import (
+    docs,
+    request_schema,
+)
+from marshmallow import (
+    Schema,
+    fields,
+)
+
+from billing.db.balance import balance_at
+from billing.db.wallet import is_wallet_exists
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+
+class WalletBalanceAtRequestSchema(Schema):
+    """Request wallet balance at time schema."""
+
+    wallet_id = fields.Int(description='wallet_id', required=True)
+    at = fields.DateTime(description='time of balance', required=True)
+
+
+class WalletBalanceAtResponseSchema(Schema):
+    """Response wallet balance at time schema."""
+
+    balance = fields.Str(description='balance')
+
+
+@docs(
+    tags=['Wallet'],
+    summary='Wallet balance at time',
+    description=(
+        'Balance of wallet at time: balance of nearest daily snapshot '
+        'with top ups and transfers after it'
+    ),
+    responses={
+        200: {
+            'schema': WalletBalanceAtResponseSchema,
+            'description': 'Success response',
+        },
+        404: {
+            'description': 'Wallet does not exists',
+        },
+        422: {
+            'description': 'Validation error',
+        },
+    },
+)
+@request_schema(WalletBalanceAtRequestSchema())
+@request_db(DbMode.READ_ONLY)
+async def wallet_balance_at(request: Request) -> Response:
+    """Wallet balance at time."""
+    request_data = request['data']
+    wallet_id = request_data['wallet_id']
+    # Snapshot and changes after it are read from one db snapshot
+    # (repeatable read transaction of READ_ONLY mode)
+    conn = await request_connection(request)
+    wallet_exist = await is_wallet_exists(conn, wallet_id=wallet_id)
+    if wallet_exist is False:
+        raise web.HTTPNotFound(reason='Wallet does not exists')
+    balance = await balance_at(
+        conn,
+        wallet_id=wallet_id,
+        at=request_data['at'],
+    )
+    return web.json_response({'balance': str(balance)})
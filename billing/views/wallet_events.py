@@ -0,0 +1,92 @@
+import asyncio
+import json
+from contextlib import AsyncExitStack
+
+from aiohttp import web
+from aiohttp.web import StreamResponse
+from aiohttp.web_request import Request
+from aiohttp_apispec import docs
+from dynaconf import settings
+
+from billing.db.wallet import is_wallet_exists
+from billing.db.wallet_events import WalletEvent
+from billing.views.db_routing import read_pool
+
+
+def format_event(event: WalletEvent) -> bytes:
+    """Server-sent event of transaction log."""
+    return 'id: {0}\nevent: transaction\ndata: {1}\n\n'.format(
+        event['id'],
+        json.dumps(event),
+    ).encode()
+
+
+@docs(
+    tags=['Transaction'],
+    summary='Wallet events',
+    description=(
+        'Server-sent events (text/event-stream) of wallet transactions: '
+        'event "transaction" with log of transaction (state change) '
+        'for every new log of transaction from or to wallet. '
+        'Events before subscription are not sent: state of transactions '
+        'should be checked by history after (re)connect.'
+    ),
+    responses={
+        200: {
+            'description': 'Success response',
+        },
+        404: {
+            'description': 'Wallet does not exists',
+        },
+        503: {
+            'description': 'Events are not available',
+        },
+    },
+)
+async def wallet_events(request: Request) -> StreamResponse:
+    """Wallet events stream.
+
+    Stream ends if client does not read events in time
+    (its queue is full) or events are not available:
+    client should reconnect.
+    """
+    wallet_id = int(request.match_info['wallet_id'])
+    async with AsyncExitStack() as with_stack:
+        conn = await with_stack.enter_async_context(
+            read_pool(request).acquire(),
+        )
+        wallet_exist = await is_wallet_exists(conn, wallet_id=wallet_id)
+    if wallet_exist is False:
+        raise web.HTTPNotFound(reason='Wallet does not exists')
+
+    events = request.app['wallet_events']
+    subscription = events.subscribe(wallet_id)
+    try:
+        if subscription.closed:
+            raise web.HTTPServiceUnavailable(
+                reason='Events are not available',
+            )
+        response = StreamResponse(
+            headers={
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+            },
+        )
+        await response.prepare(request)
+        while True:  # NOQA: WPS457
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(),
+                    timeout=settings.WALLET_EVENTS.heartbeat_interval,
+                )
+            except asyncio.TimeoutError:
+                # Keeps connection alive, detects gone clients
+                await response.write(b': heartbeat\n\n')
+                continue
+            if event is None:
+                break
+            await response.write(format_event(event))
+    finally:
+        events.unsubscribe(subscription)
+    await response.write_eof()
+    return response
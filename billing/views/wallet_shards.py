@@ -0,0 +1,87 @@
+from aiohttp import web
+from aiohttp.web import Response
+from aiohttp.web_request import Request
+from aiohttp_apispec import (
+    docs,
+    request_schema,
+)
+from marshmallow import (
+    Schema,
+    fields,
+)
+from marshmallow.validate import Range
+
+from billing.db.exceptions import WalletDoesNotExists
+from billing.db.wallet import set_wallet_shards
+from billing.views.db_routing import pin_primary
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+# Max count of hot wallet sub-balances
+MAX_SHARDS = 256
+
+
+class WalletShardsRequestSchema(Schema):
+    """Request set wallet shards schema."""
+
+    wallet_id = fields.Int(description='wallet_id', required=True)
+    shards = fields.Int(
+        description='count of sub-balances (0 - wallet is not hot)',
+        required=True,
+        validate=[
+            Range(min=0, max=MAX_SHARDS, error='Bad shards count.'),
+        ],
+    )
+
+
+class WalletShardsResponseSchema(Schema):
+    """Response set wallet shards schema."""
+
+    wallet_id = fields.Int()
+    shards = fields.Int()
+
+
+@docs(
+    tags=['Wallet'],
+    summary='Set wallet shards',
+    description=(
+        'Make wallet hot: credits of wallet go to its sub-balances, '
+        'its credits throughput scales with count of shards'
+    ),
+    responses={
+        200: {
+            'schema': WalletShardsResponseSchema,
+            'description': 'Success response',
+        },
+        404: {
+            'description': 'Wallet does not exists',
+        },
+        422: {
+            'description': 'Validation error',
+        },
+    },
+)
+@request_schema(WalletShardsRequestSchema())
+@pin_primary
+@request_db(DbMode.WRITE)
+async def wallet_shards(request: Request) -> Response:
+    """Set count of wallet shards."""
+    request_data = request['data']
+    conn = await request_connection(request)
+    try:
+        await set_wallet_shards(
+            conn,
+            wallet_id=request_data['wallet_id'],
+            shards=request_data['shards'],
+        )
+    except WalletDoesNotExists:
+        raise web.HTTPNotFound(reason='Wallet does not exists')
+    return web.json_response(
+        {
+            'wallet_id': request_data['wallet_id'],
+            'shards': request_data['shards'],
+        },
+    )
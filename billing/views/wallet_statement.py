@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+)
+
+from aiohttp import web
+from aiohttp.web import StreamResponse
+from aiohttp.web_request import Request
+from aiohttp_apispec import (
+    docs,
+    request_schema,
+)
+from marshmallow import (
+    Schema,
+    fields,
+)
+from marshmallow.validate import OneOf
+
+from billing.db.transaction import iter_transfers_history
+from billing.db.wallet import is_wallet_exists
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+
+# Records read from db and written to client at once
+CHUNK_SIZE = 1000
+
+STATEMENT_COLUMNS = (
+    'transaction_id',
+    'from_wallet_id',
+    'to_wallet_id',
+    'amount',
+    'state',
+    'new_balance',
+    'created_at',
+)
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class WalletStatementRequestSchema(Schema):
+    """Request wallet statement schema."""
+
+    wallet_id = fields.Int(description='wallet_id', required=True)
+    start = fields.DateTime(description='start')
+    end = fields.DateTime(description='end')
+    format = fields.Str(  # NOQA: WPS125
+        description='ndjson (json record per line) or csv',
+        missing='ndjson',
+        validate=[
+            OneOf(list(CONTENT_TYPES)),
+        ],
+    )
+
+
+def ndjson_chunk(records: List[Dict[str, Any]]) -> str:
+    """Records as json lines."""
+    return ''.join(
+        '{0}\n'.format(
+            json.dumps({column: record[column] for column in STATEMENT_COLUMNS}),
+        )
+        for record in records
+    )
+
+
+def csv_text(rows: Iterable[Iterable[Any]]) -> str:
+    """Rows as csv."""
+    chunk = io.StringIO()
+    csv.writer(chunk).writerows(rows)
+    return chunk.getvalue()
+
+
+def csv_chunk(records: List[Dict[str, Any]]) -> str:
+    """Records as csv rows."""
+    return csv_text(
+        [record[column] for column in STATEMENT_COLUMNS]
+        for record in records
+    )
+
+
+CHUNK_FORMATTERS: Dict[str, Callable[[List[Dict[str, Any]]], str]] = {
+    'ndjson': ndjson_chunk,
+    'csv': csv_chunk,
+}
+
+
+@docs(
+    tags=['Transaction'],
+    summary='Wallet statement',
+    description=(
+        'Whole transfers history of wallet (ordered by creation), '
+        'streamed as NDJSON or CSV (with header row).'
+    ),
+    responses={
+        200: {
+            'description': 'Success response',
+        },
+        404: {
+            'description': 'Wallet does not exists',
+        },
+        422: {
+            'description': 'Validation error',
+        },
+    },
+)
+@request_schema(WalletStatementRequestSchema())
+@request_db(DbMode.READ_ONLY)
+async def wallet_statement(request: Request) -> StreamResponse:
+    """Wallet statement.
+
+    Records are read by server-side cursor chunk by chunk
+    and every chunk is written before next one is read:
+    memory does not depend on statement size, slow client
+    slows down reading.
+    """
+    request_data = request['data']
+    wallet_id = request_data['wallet_id']
+    statement_format = request_data['format']
+    format_chunk = CHUNK_FORMATTERS[statement_format]
+    # One snapshot for whole statement (repeatable read transaction
+    # of READ_ONLY mode)
+    conn = await request_connection(request)
+    wallet_exist = await is_wallet_exists(conn, wallet_id=wallet_id)
+    if wallet_exist is False:
+        raise web.HTTPNotFound(reason='Wallet does not exists')
+
+    response = StreamResponse(
+        headers={'Content-Type': CONTENT_TYPES[statement_format]},
+    )
+    await response.prepare(request)
+    if statement_format == 'csv':
+        await response.write(csv_text([STATEMENT_COLUMNS]).encode())
+
+    chunk: List[Dict[str, Any]] = []
+    async for record in iter_transfers_history(
+        conn,
+        wallet_id=wallet_id,
+        start=request_data.get('start'),
+        end=request_data.get('end'),
+        prefetch=CHUNK_SIZE,
+        archive=request.app['archive'],
+    ):
+        chunk.append(record)
+        if len(chunk) >= CHUNK_SIZE:
+            await response.write(format_chunk(chunk).encode())
+            chunk = []
+    if chunk:
+        await response.write(format_chunk(chunk).encode())
+    await response.write_eof()
+    return response
@@ -1,5 +1,3 @@
-from contextlib import AsyncExitStack
-
 from aiohttp import web
 from aiohttp.web import Response
 from aiohttp.web_request import Request
@@ -15,6 +13,20 @@ from marshmallow.validate import Range
 
 from billing.db.exceptions import WalletDoesNotExists
 from billing.db.wallet import add_to_wallet
+from billing.views.db_routing import pin_primary
+from billing.views.idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENCY_KEY_PARAMETER,
+    claim_request,
+    error_response,
+    idempotent,
+    save_response,
+)
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
 
 
 class WalletTopUpRequestSchema(Schema):
@@ -42,6 +54,7 @@ class WalletTopUpResponseSchema(Schema):
     tags=['Wallet'],
     summary='Wallet top up',
     description='Add to wallet',
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     responses={
         200: {
             'schema': WalletTopUpResponseSchema,
@@ -56,20 +69,50 @@ class WalletTopUpResponseSchema(Schema):
     },
 )
 @request_schema(WalletTopUpRequestSchema())
+@pin_primary
+@idempotent
+@request_db(DbMode.WRITE)
 async def wallet_top_up(request: Request) -> Response:
-    """Wallet top up."""
+    """Wallet top up.
+
+    Request with already used Idempotency-Key header
+    gets response of first request.
+    Requests without idempotency key are coalesced
+    with concurrent top ups of wallet (see TopUpCoalescer).
+    """
     request_data = request['data']
-    async with AsyncExitStack() as with_stack:
-        conn = await with_stack.enter_async_context(
-            request.app['db'].acquire(),
-        )
-        await with_stack.enter_async_context(conn.transaction())
+    top_up_coalescer = request.app['top_up_coalescer']
+    if (
+        top_up_coalescer is not None
+        and IDEMPOTENCY_KEY_HEADER not in request.headers
+    ):
         try:
-            new_user_balance = await add_to_wallet(
-                conn,
+            new_user_balance = await top_up_coalescer.top_up(
                 wallet_id=request_data['wallet_id'],
                 amount=request_data['amount'],
             )
         except WalletDoesNotExists:
-            return web.HTTPNotFound(reason='Wallet does not exists')
-    return web.json_response({'new_balance': str(new_user_balance)})
+            return error_response(404, 'Wallet does not exists')
+        return web.json_response({'new_balance': str(new_user_balance)})
+
+    conn = await request_connection(request)
+    replayed_response = await claim_request(conn, request)
+    if replayed_response is not None:
+        return replayed_response
+    try:
+        new_user_balance = await add_to_wallet(
+            conn,
+            wallet_id=request_data['wallet_id'],
+            amount=request_data['amount'],
+        )
+    except WalletDoesNotExists:
+        return await save_response(
+            conn,
+            request,
+            error_response(404, 'Wallet does not exists'),
+        )
+    return await save_response(
+        conn,
+        request,
+        web.json_response({'new_balance': str(new_user_balance)}),
+    )
@@ -0,0 +1,96 @@
+"""Standalone transfers queue worker.
+
+Run: python -m billing.worker
+"""
+
+import asyncio
+import logging
+
+from dynaconf import settings
+
+from billing.archive.storage import ArchiveStorage
+from billing.currency_rate.rates_table import (
+    start_rates_refresher,
+    stop_rates_refresher,
+)
+from billing.db.setup import create_pool
+from billing.jobs.archive import run_archivation
+from billing.jobs.balance_snapshots import run_balance_snapshots
+from billing.jobs.consolidation import run_consolidation
+from billing.jobs.idempotency_cleanup import run_idempotency_cleanup
+from billing.jobs.partitions import run_partitions_maintenance
+from billing.jobs.transaction_log_writer import create_log_writer
+from billing.jobs.transfer_worker import run_worker
+
+
+async def run_workers() -> None:
+    """Run settings.JOBS.workers transfer workers and maintenance jobs.
+
+    Buffered transaction logs are flushed on stop.
+    """
+    workers = settings.JOBS.workers
+    # Workers, maintenance jobs and logs writer connections
+    pool_size = settings.JOBS.pool_size or workers + 6
+    pool = await create_pool(min_size=pool_size, max_size=pool_size)
+    refresher = await start_rates_refresher()
+    log_writer = create_log_writer(pool)
+    jobs = [
+        run_worker(
+            pool,
+            batch_size=settings.JOBS.batch_size,
+            idle_interval=settings.JOBS.idle_interval,
+            netting_window=settings.JOBS.netting_window,
+            log_writer=log_writer,
+        )
+        for _ in range(workers)
+    ]
+    jobs.append(
+        run_consolidation(
+            pool,
+            interval=settings.JOBS.consolidation_interval,
+        ),
+    )
+    jobs.append(
+        run_idempotency_cleanup(
+            pool,
+            interval=settings.IDEMPOTENCY.cleanup_interval,
+            retention=settings.IDEMPOTENCY.retention,
+            batch_size=settings.IDEMPOTENCY.cleanup_batch_size,
+        ),
+    )
+    jobs.append(
+        run_partitions_maintenance(
+            pool,
+            interval=settings.PARTITIONS.maintenance_interval,
+            months_ahead=settings.PARTITIONS.months_ahead,
+        ),
+    )
+    jobs.append(
+        run_balance_snapshots(
+            pool,
+            interval=settings.BALANCE_SNAPSHOT.interval,
+            delay=settings.BALANCE_SNAPSHOT.delay,
+        ),
+    )
+    if settings.ARCHIVE.enabled:
+        jobs.append(
+            run_archivation(
+                pool,
+                ArchiveStorage(settings.ARCHIVE.path),
+                interval=settings.ARCHIVE.interval,
+                age=settings.ARCHIVE.age,
+                batch_size=settings.ARCHIVE.batch_size,
+            ),
+        )
+    if log_writer is not None:
+        jobs.append(log_writer.run())
+    try:  # NOQA: WPS501
+        await asyncio.gather(*jobs)
+    finally:
+        await stop_rates_refresher(refresher)
+        await pool.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_workers())
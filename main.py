@@ -1,28 +1,64 @@
 from aiohttp import web
 from aiohttp.web_app import Application
 from aiohttp_apispec import validation_middleware
-from aiojobs.aiohttp import setup
 from dynaconf import settings
 
+from billing.archive.storage import init_archive
+from billing.currency_rate.rates_table import (
+    close_currency_rates,
+    init_currency_rates,
+)
 from billing.db.setup import (
     close_pg,
     init_pg,
 )
+from billing.db.notifications import (
+    close_notifications,
+    init_notifications,
+    start_notifications,
+)
+from billing.db.user_info_cache import init_user_info_cache
+from billing.db.wallet_events import init_wallet_events
+from billing.jobs.setup import setup_jobs
+from billing.jobs.top_up_coalescer import (
+    close_top_up_coalescer,
+    init_top_up_coalescer,
+)
 from billing.routes import setup_routes
+from billing.views.idempotency import IdempotentResponses
 
 
 def init_app() -> Application:
     """Init app."""
     app = web.Application()
     app.on_startup.append(init_pg)
+    app.on_startup.append(init_top_up_coalescer)
+    app.on_startup.append(init_archive)
+    # setup db notifications listener and its subscribers
+    app.on_startup.append(init_notifications)
+    app.on_startup.append(init_user_info_cache)
+    app.on_startup.append(init_wallet_events)
+    app.on_startup.append(start_notifications)
+
+    # setup currency rates refresher (before workers: they use rates)
+    app.on_startup.append(init_currency_rates)
+
+    # setup transfer workers (before pg cleanup: workers use pg pool)
+    setup_jobs(app)
+    app.on_cleanup.append(close_currency_rates)
+    # pending top ups are applied before pg cleanup
+    app.on_cleanup.append(close_top_up_coalescer)
+    app.on_cleanup.append(close_notifications)
     app.on_cleanup.append(close_pg)
 
+    # recent responses of requests with idempotency keys
+    app['idempotent_responses'] = IdempotentResponses(
+        maxsize=settings.IDEMPOTENCY.cache_size,
+    )
+
     # setup views and routes
     setup_routes(app)
     app.middlewares.append(validation_middleware)
-
-    # setup aiojobs
-    setup(app)
     return app
 
 
@@ -1,9 +1,12 @@
+import asyncio
 from decimal import Decimal
 
 import pytest
 from dynaconf import settings
 from sqlalchemy import create_engine
 
+from billing.archive.storage import ArchiveStorage
+from billing.currency_rate.rates_table import rates_table
 from billing.db.models import (
     Currency,
     metadata,
@@ -116,3 +119,35 @@ async def wallet_transaction(
         amount=Decimal('0.1'),
     )
     yield new_transaction_id
+
+
+@pytest.fixture
+def rates_snapshot():
+    """Published currency rates snapshot."""
+    yield rates_table.publish(
+        {
+            'USD': Decimal('1'),
+            'EUR': Decimal('1.1'),
+            'CAD': Decimal('0.75'),
+            'CNY': Decimal('0.14'),
+        },
+    )
+    rates_table.clear()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Transactions archive in temporary directory."""
+    return ArchiveStorage(str(tmp_path / 'archive'))
+
+
+@pytest.fixture
+def wait_until():
+    """Wait until condition is true (notifications are async)."""
+    async def waiter(condition, timeout=2):  # NOQA: WPS430
+        for _ in range(int(timeout / 0.01)):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError('Condition is not reached')
+    return waiter
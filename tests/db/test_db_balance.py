@@ -0,0 +1,167 @@
+from datetime import (
+    date,
+    datetime,
+    timedelta,
+)
+from decimal import Decimal
+
+import pytest
+
+from billing.currency_rate.rates_table import ExchangeRates
+from billing.db.balance import (
+    balance_at,
+    days_to_snapshot,
+    snapshot_day,
+)
+from billing.db.models import (
+    transaction,
+    wallet_balance_snapshot,
+    wallet_top_up,
+)
+from billing.db.transaction import execute_transaction
+from billing.db.wallet import add_to_wallet
+
+
+@pytest.fixture
+async def wallets_changes(conn, wallet_transaction):
+    """Changes of wallets 1 and 2 within three days of 2020.
+
+    2020-01-01 10:00: initial balances 0.3 and 0.4
+    2020-01-02 10:00: transfer of 0.1 from 1 to 2 (credit 0.2)
+    2020-01-03 10:00: top up of wallet 1 by 1
+    """
+    await execute_transaction(
+        conn,
+        transaction_id=wallet_transaction,
+        from_wallet_id=1,
+        to_wallet_id=2,
+        amount=Decimal('0.1'),
+        exchange_rates=ExchangeRates(
+            from_rate=Decimal('2'),
+            to_rate=Decimal('1'),
+        ),
+    )
+    await add_to_wallet(conn, wallet_id=1, amount=Decimal('1'))
+    await conn.execute(
+        wallet_top_up.update().values(created_at=datetime(2020, 1, 1, 10)),
+    )
+    await conn.execute(
+        wallet_top_up.update().where(
+            wallet_top_up.c.amount == 1,
+        ).values(created_at=datetime(2020, 1, 3, 10)),
+    )
+    await conn.execute(
+        transaction.update().values(created_at=datetime(2020, 1, 2, 10)),
+    )
+
+
+class TestAddToWallet:
+    """Test top ups are recorded."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        user_with_wallet,
+    ):
+        """Test initial balance and top up are recorded."""
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+        top_ups = await conn.fetch(
+            wallet_top_up.select().order_by(wallet_top_up.c.id),
+        )
+        assert [
+            (top_up['wallet_id'], top_up['amount']) for top_up in top_ups
+        ] == [(1, Decimal('0.3')), (1, Decimal('0.5'))]
+
+
+class TestSnapshotDay:
+    """Test snapshot day."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallets_changes,
+    ):
+        """Test snapshots of changed wallets."""
+        for day in range(1, 4):
+            await snapshot_day(conn, day=date(2020, 1, day))
+        # Second run does not change snapshots
+        await snapshot_day(conn, day=date(2020, 1, 2))
+        snapshots = await conn.fetch(
+            wallet_balance_snapshot.select().order_by(
+                wallet_balance_snapshot.c.day,
+                wallet_balance_snapshot.c.wallet_id,
+            ),
+        )
+        assert [tuple(snapshot) for snapshot in snapshots] == [
+            (1, date(2020, 1, 1), Decimal('0.3'), Decimal('0.3'), 0),
+            (2, date(2020, 1, 1), Decimal('0.4'), Decimal('0.4'), 0),
+            (1, date(2020, 1, 2), Decimal('0.2'), 0, Decimal('0.1')),
+            (2, date(2020, 1, 2), Decimal('0.6'), Decimal('0.2'), 0),
+            (1, date(2020, 1, 3), Decimal('1.2'), Decimal('1'), 0),
+        ]
+
+
+class TestDaysToSnapshot:
+    """Test days to snapshot."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallets_changes,
+    ):
+        """Test days from first change or last snapshot to yesterday."""
+        today = await conn.fetchval('SELECT current_date')
+        days = await days_to_snapshot(conn, delay=timedelta(0))
+        assert days[0] == date(2020, 1, 1)
+        assert days[-1] == today - timedelta(days=1)
+
+        await snapshot_day(conn, day=date(2020, 1, 2))
+        days = await days_to_snapshot(conn, delay=timedelta(0))
+        assert days[0] == date(2020, 1, 3)
+
+    @pytest.mark.asyncio
+    async def test_pending(
+        self,
+        conn,
+        wallet_transaction,
+    ):
+        """Test days are not snapshotted before pending transfer."""
+        await conn.execute(
+            wallet_top_up.update().values(created_at=datetime(2020, 1, 1)),
+        )
+        await conn.execute(
+            transaction.update().values(created_at=datetime(2020, 1, 3, 10)),
+        )
+        days = await days_to_snapshot(conn, delay=timedelta(0))
+        assert days == [date(2020, 1, 1), date(2020, 1, 2)]
+
+
+class TestBalanceAt:
+    """Test balance at time."""
+
+    balances = (
+        (datetime(2019, 12, 31), Decimal('0'), Decimal('0')),
+        (datetime(2020, 1, 1, 10), Decimal('0.3'), Decimal('0.4')),
+        (datetime(2020, 1, 2, 9), Decimal('0.3'), Decimal('0.4')),
+        (datetime(2020, 1, 2, 10), Decimal('0.2'), Decimal('0.6')),
+        (datetime(2020, 1, 3, 11), Decimal('1.2'), Decimal('0.6')),
+        (datetime(2021, 1, 1), Decimal('1.2'), Decimal('0.6')),
+    )
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('snapshotted_days', [0, 1, 3])
+    async def test_success(
+        self,
+        conn,
+        wallets_changes,
+        snapshotted_days,
+    ):
+        """Test balance with and without snapshots."""
+        for day in range(1, snapshotted_days + 1):
+            await snapshot_day(conn, day=date(2020, 1, day))
+        for at, balance1, balance2 in self.balances:
+            assert await balance_at(conn, wallet_id=1, at=at) == balance1
+            assert await balance_at(conn, wallet_id=2, at=at) == balance2
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import (
+    bindparam,
+    select,
+)
+
+from billing.db.compiled import (
+    CompiledQuery,
+    compiled_queries,
+    prime_connection,
+)
+from billing.db.models import wallet
+from billing.db.wallet import (
+    get_wallet_info,
+    wallet_info_query,
+)
+
+
+@pytest.fixture
+def test_query():
+    """Temporary compiled query."""
+    query = CompiledQuery(
+        'test_wallet_currency',
+        select([wallet.c.currency]).where(
+            wallet.c.id == bindparam('wallet_id'),
+        ).limit(10),
+    )
+    yield query
+    compiled_queries.pop(query.name)
+
+
+class TestCompiledQuery:
+    """Test compiled query."""
+
+    def test_args(self, test_query):
+        """Test constants are compiled as parameters."""
+        assert test_query.sql.count('$') == 2
+        assert sorted(test_query.args(wallet_id=5)) == [5, 10]
+
+    def test_compiled_once(self, test_query):
+        """Test query is compiled on first use only."""
+        assert test_query.stats['compiles'] == 0
+        test_query.args(wallet_id=1)
+        test_query.args(wallet_id=2)
+        assert test_query.stats['compiles'] == 1
+
+    def test_fail_unknown_param(self, test_query):
+        """Test fail.
+
+        Case: unknown parameter.
+        """
+        with pytest.raises(TypeError):
+            test_query.args(wallet_id=1, amount=2)
+
+    def test_fail_missing_param(self, test_query):
+        """Test fail.
+
+        Case: missing parameter.
+        """
+        with pytest.raises(TypeError):
+            test_query.args()
+
+    def test_fail_same_name(self, test_query):
+        """Test fail.
+
+        Case: query name is already used.
+        """
+        with pytest.raises(ValueError):
+            CompiledQuery(test_query.name, select([wallet.c.id]))
+
+    @pytest.mark.asyncio
+    async def test_hits(self, conn, user_with_wallet):
+        """Test executions are counted."""
+        _, wallet_id = user_with_wallet
+        hits = wallet_info_query.stats['hits']
+        wallet_info = await get_wallet_info(conn, wallet_id=wallet_id)
+        assert wallet_info['id'] == wallet_id
+        assert wallet_info_query.stats['hits'] == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_columns_variant(self, conn, user_with_wallet):
+        """Test query variant is compiled once."""
+        _, wallet_id = user_with_wallet
+        for _ in range(2):
+            wallet_info = await get_wallet_info(
+                conn,
+                wallet_id=wallet_id,
+                columns=[wallet.c.currency, wallet.c.balance],
+            )
+        assert set(wallet_info) == {'currency', 'balance'}
+        variant = compiled_queries['wallet_info:currency,balance']
+        assert variant.stats['compiles'] == 1
+        assert variant.stats['hits'] >= 2
+
+
+class TestPrimeConnection:
+    """Test prime connection."""
+
+    @pytest.mark.asyncio
+    async def test_statements_prepared(self, conn):
+        """Test statements of compiled queries are prepared."""
+        prepares = wallet_info_query.stats['prepares']
+        await prime_connection(conn)
+        assert wallet_info_query.stats['prepares'] == prepares + 1
+        prepared_count = await conn.fetchval(
+            'SELECT count(*) FROM pg_prepared_statements',
+        )
+        assert prepared_count >= len(compiled_queries)
+        assert not conn.is_in_transaction()
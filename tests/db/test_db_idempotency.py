@@ -0,0 +1,121 @@
+from datetime import (
+    datetime,
+    timedelta,
+)
+
+import pytest
+from sqlalchemy import select
+
+from billing.db.exceptions import IdempotencyKeyReused
+from billing.db.idempotency import (
+    claim_idempotency_key,
+    delete_expired_requests,
+    save_idempotent_response,
+)
+from billing.db.models import idempotent_request
+
+
+class TestClaimIdempotencyKey:
+    """Test claim idempotency key."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+    ):
+        """Test key is claimed once per endpoint."""
+        assert await claim_idempotency_key(
+            conn,
+            endpoint='/v1/wallet_top_up',
+            idempotency_key='key',
+            request_hash='hash',
+        ) is None
+        assert await claim_idempotency_key(
+            conn,
+            endpoint='/v1/transaction_between_wallets',
+            idempotency_key='key',
+            request_hash='hash',
+        ) is None
+        await save_idempotent_response(
+            conn,
+            endpoint='/v1/wallet_top_up',
+            idempotency_key='key',
+            status=200,
+            content_type='application/json',
+            body='{"new_balance": "0.51"}',
+        )
+
+        stored_response = await claim_idempotency_key(
+            conn,
+            endpoint='/v1/wallet_top_up',
+            idempotency_key='key',
+            request_hash='hash',
+        )
+        assert dict(stored_response) == {
+            'status': 200,
+            'content_type': 'application/json',
+            'body': '{"new_balance": "0.51"}',
+            'request_hash': 'hash',
+        }
+
+    @pytest.mark.asyncio
+    async def test_fail_reused_key(
+        self,
+        conn,
+    ):
+        """Test fail.
+
+        Case: key is used by request with other parameters.
+        """
+        await claim_idempotency_key(
+            conn,
+            endpoint='/v1/wallet_top_up',
+            idempotency_key='key',
+            request_hash='hash',
+        )
+        with pytest.raises(IdempotencyKeyReused):
+            await claim_idempotency_key(
+                conn,
+                endpoint='/v1/wallet_top_up',
+                idempotency_key='key',
+                request_hash='other hash',
+            )
+
+
+class TestDeleteExpiredRequests:
+    """Test delete expired requests."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+    ):
+        """Test requests older than retention are deleted."""
+        for idempotency_key in ('key1', 'key2', 'key3'):
+            await claim_idempotency_key(
+                conn,
+                endpoint='/v1/wallet_top_up',
+                idempotency_key=idempotency_key,
+                request_hash='hash',
+            )
+        await conn.execute(
+            idempotent_request.update().where(
+                idempotent_request.c.idempotency_key != 'key3',
+            ).values(created_at=datetime(2020, 1, 1)),
+        )
+
+        retention = timedelta(days=1)
+        assert await delete_expired_requests(
+            conn,
+            retention=retention,
+            limit=1,
+        ) == 1
+        assert await delete_expired_requests(
+            conn,
+            retention=retention,
+            limit=10,
+        ) == 1
+        keys = await conn.fetch(
+            select([idempotent_request.c.idempotency_key]),
+        )
+        assert [record['idempotency_key'] for record in keys] == ['key3']
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from billing.db.notifications import (
+    LISTENER_APPLICATION_NAME,
+    NotificationsListener,
+)
+
+
+@pytest.fixture
+async def listener(pg_database):
+    """Notifications listener of 'test' channel with its log."""
+    notifications_listener = NotificationsListener(
+        reconnect_interval=0.01,
+        ping_interval=0.05,
+    )
+    log = []
+    notifications_listener.subscribe(
+        'test',
+        on_notification=lambda payload: log.append(payload),
+        on_listening=lambda listening: log.append(listening),
+    )
+    task = asyncio.ensure_future(notifications_listener.run())
+    yield notifications_listener, log
+    task.cancel()
+    await asyncio.wait([task])
+
+
+class TestNotificationsListener:
+    """Test notifications listener."""
+
+    @pytest.mark.asyncio
+    async def test_notify(self, conn, listener, wait_until):
+        """Test notifications are passed to subscribers."""
+        notifications_listener, log = listener
+        await wait_until(lambda: notifications_listener.listening)
+        await conn.execute("SELECT pg_notify('test', 'payload')")
+        await conn.execute("SELECT pg_notify('other', 'payload')")
+        await wait_until(lambda: log == [True, 'payload'])
+
+    @pytest.mark.asyncio
+    async def test_reconnect(self, conn, listener, wait_until):
+        """Test subscribers are told that connection is lost."""
+        notifications_listener, log = listener
+        await wait_until(lambda: notifications_listener.listening)
+        await conn.execute(
+            """
+            SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+            WHERE application_name = $1
+            """,
+            LISTENER_APPLICATION_NAME,
+        )
+        await wait_until(lambda: log == [True, False, True])
+        await conn.execute("SELECT pg_notify('test', 'payload')")
+        await wait_until(lambda: log == [True, False, True, 'payload'])
@@ -0,0 +1,101 @@
+from datetime import (
+    date,
+    datetime,
+)
+
+import pytest
+
+from billing.db.models import (
+    transaction,
+    transaction_log,
+)
+from billing.db.partitions import (
+    create_month_partition,
+    create_partitions,
+    month_start,
+    partition_name,
+)
+
+
+async def partition_of(conn, table, row_id):
+    """Partition name of table row."""
+    return await conn.fetchval(
+        'SELECT tableoid::regclass::text FROM "{0}" WHERE id = $1'.format(
+            table.name,
+        ),
+        row_id,
+    )
+
+
+def test_month_start():
+    """Test month start with months shift."""
+    assert month_start(date(2020, 1, 31)) == date(2020, 1, 1)
+    assert month_start(date(2020, 11, 15), months=2) == date(2021, 1, 1)
+    assert month_start(date(2020, 1, 15), months=-1) == date(2019, 12, 1)
+    assert partition_name('transaction', date(2020, 2, 1)) == (
+        'transaction_202002'
+    )
+
+
+class TestCreateMonthPartition:
+    """Test create month partition."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallet_transaction,
+    ):
+        """Test rows of month are moved from default partition."""
+        await conn.execute(
+            transaction.update().values(created_at=datetime(2020, 2, 10)),
+        )
+        assert await partition_of(
+            conn,
+            transaction,
+            wallet_transaction,
+        ) == 'transaction_default'
+
+        is_created = await create_month_partition(
+            conn,
+            table_name=transaction.name,
+            month=date(2020, 2, 1),
+        )
+        assert is_created is True
+        assert await partition_of(
+            conn,
+            transaction,
+            wallet_transaction,
+        ) == 'transaction_202002'
+
+        is_created = await create_month_partition(
+            conn,
+            table_name=transaction.name,
+            month=date(2020, 2, 1),
+        )
+        assert is_created is False
+
+
+class TestCreatePartitions:
+    """Test create partitions."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallet_transaction,
+    ):
+        """Test partitions of current and next months are created."""
+        today = await conn.fetchval('SELECT current_date')
+        created = await create_partitions(conn, months_ahead=1)
+        assert created == [
+            partition_name(table.name, month_start(today, months=months))
+            for months in (0, 1)
+            for table in (transaction, transaction_log)
+        ]
+        assert await partition_of(
+            conn,
+            transaction_log,
+            wallet_transaction,
+        ) == partition_name(transaction_log.name, month_start(today))
+        assert await create_partitions(conn, months_ahead=1) == []
@@ -0,0 +1,68 @@
+import pytest
+from asyncpg.exceptions import DeadlockDetectedError
+
+from billing.db.retry import (
+    retry_stats,
+    run_in_transaction,
+)
+
+
+class TestRunInTransaction:
+    """Test run in transaction."""
+
+    def failing(self, errors_count):
+        """Function which fails with deadlock errors_count times."""
+        calls = []
+
+        async def run():
+            calls.append(1)
+            if len(calls) <= errors_count:
+                raise DeadlockDetectedError('deadlock detected')
+            return 'result'
+
+        return run, calls
+
+    @pytest.mark.asyncio
+    async def test_retry(self, conn):
+        """Test transaction is retried."""
+        retry_stats.clear()
+        run, calls = self.failing(2)
+        run_result = await run_in_transaction(
+            conn,
+            run,
+            retries=3,
+            retry_delay=0,
+        )
+        assert run_result == 'result'
+        assert len(calls) == 3
+        assert retry_stats.retries == {2: 1}
+
+    @pytest.mark.asyncio
+    async def test_fail_retries_exhausted(self, conn):
+        """Test fail.
+
+        Case: all retries failed.
+        """
+        retry_stats.clear()
+        run, calls = self.failing(10)
+        with pytest.raises(DeadlockDetectedError):
+            await run_in_transaction(
+                conn,
+                run,
+                retries=3,
+                retry_delay=0,
+            )
+        assert len(calls) == 4
+        assert retry_stats.exhausted == 1
+
+    @pytest.mark.asyncio
+    async def test_fail_nested(self, conn):
+        """Test fail.
+
+        Case: called inside other transaction.
+        """
+        run, calls = self.failing(0)
+        async with conn.transaction():
+            with pytest.raises(RuntimeError):
+                await run_in_transaction(conn, run)
+        assert not calls
@@ -0,0 +1,48 @@
+import pytest
+from dynaconf import settings
+
+from billing.db.setup import (
+    DbRouter,
+    Replica,
+    create_pool,
+)
+
+
+@pytest.fixture
+async def replica(pg_database):
+    """Db itself as replica."""
+    pool = await create_pool(settings.REPLICAS.servers[0])
+    yield Replica(pool)
+    await pool.close()
+
+
+class TestDbRouter:
+    """Test routing of reads to replicas."""
+
+    @pytest.mark.asyncio
+    async def test_read_pool(self, pg_pool, replica):
+        """Test fresh replica is used for reads which are not pinned."""
+        db_router = DbRouter(pg_pool, [replica], max_lag=1)
+        assert db_router.read_pool() is pg_pool
+
+        await db_router.check_lags()
+        assert replica.lag == 0
+        assert db_router.read_pool() is replica.pool
+        assert db_router.read_pool(pinned=True) is pg_pool
+
+    @pytest.mark.asyncio
+    async def test_lagging_replica(self, pg_pool, replica):
+        """Test lagging replica is replaced by primary."""
+        db_router = DbRouter(pg_pool, [replica], max_lag=1)
+        replica.lag = 1.5
+        assert db_router.read_pool() is pg_pool
+
+    @pytest.mark.asyncio
+    async def test_unavailable_replica(self, pg_pool, replica):
+        """Test replica is not used if its lag can not be checked."""
+        db_router = DbRouter(pg_pool, [replica], max_lag=1)
+        await db_router.check_lags()
+        await replica.pool.close()
+        await db_router.check_lags()
+        assert replica.lag is None
+        assert db_router.read_pool() is pg_pool
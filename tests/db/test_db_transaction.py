@@ -1,19 +1,30 @@
+from datetime import (
+    date,
+    datetime,
+    timedelta,
+)
 from decimal import Decimal
 
 import pytest
 
+from billing.currency_rate.rates_table import ExchangeRates
 from billing.db.models import (
     FailedReason,
     TransactionState,
     transaction,
 )
+from billing.db.compiled import compiled_queries
+from billing.db.partitions import create_month_partition
 from billing.db.transaction import (
     add_transaction_log,
+    create_transactions,
+    execute_transaction,
     fail_transaction,
-    success_transaction,
     transaction_log,
-    transfer_between_wallets,
-    validate_transaction,
+    history_position,
+    iter_transfers_history,
+    transaction_logs_query,
+    transfers_history,
 )
 from billing.db.wallet import get_wallet_info
 
@@ -70,6 +81,77 @@ class TestCreateTransaction:
         assert log['comment'] == 'Transaction created'
 
 
+class TestCreateTransactions:
+    """Test create transactions."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallet_transaction,
+    ):
+        """Test success case.
+
+        Ids follow existing transactions in order of transfers.
+        """
+        transaction_ids = await create_transactions(
+            conn,
+            transfers=[
+                (2, 1, Decimal('0.2')),
+                (1, 2, Decimal('0.3')),
+            ],
+        )
+        assert transaction_ids == [2, 3]
+        transactions = await conn.fetch(
+            transaction.select().order_by(transaction.c.id),
+        )
+        assert [
+            (
+                transaction_info['id'],
+                transaction_info['from_wallet_id'],
+                transaction_info['amount'],
+                transaction_info['state'],
+            )
+            for transaction_info in transactions
+        ] == [
+            (1, 1, Decimal('0.1'), 'CREATED'),
+            (2, 2, Decimal('0.2'), 'CREATED'),
+            (3, 1, Decimal('0.3'), 'CREATED'),
+        ]
+        logs = await conn.fetch(
+            transaction_log.select().order_by(transaction_log.c.transaction_id),
+        )
+        assert [log['transaction_id'] for log in logs] == [1, 2, 3]
+        assert {log['comment'] for log in logs} == {'Transaction created'}
+
+    @pytest.mark.asyncio
+    async def test_empty(
+        self,
+        conn,
+    ):
+        """Test empty batch."""
+        assert await create_transactions(conn, transfers=[]) == []
+
+    @pytest.mark.asyncio
+    async def test_fail_transfer_yourself(
+        self,
+        conn,
+    ):
+        """Test fail.
+
+        Case: transfer yourself.
+        """
+        with pytest.raises(ValueError) as exc:
+            await create_transactions(
+                conn,
+                transfers=[
+                    (1, 2, Decimal('0.2')),
+                    (1, 1, Decimal('0.3')),
+                ],
+            )
+        assert str(exc.value) == 'Cant transfer yourself'
+
+
 class TestFailTransaction:
     """Test fail transaction."""
 
@@ -104,98 +186,119 @@ class TestFailTransaction:
         assert log['comment'] == 'Failed reason'
 
 
-class TestSuccessTransaction:
-    """Test success transaction."""
+class TestExecuteTransaction:
+    """Test execute transaction."""
+
+    exchange_rates = ExchangeRates(
+        from_rate=Decimal('2'),
+        to_rate=Decimal('0.5'),
+        snapshot_id=7,
+    )
 
     @pytest.mark.asyncio
-    async def test_success_transaction(
+    async def test_success(
         self,
         conn,
         wallet_transaction,
     ):
-        """Test success transaction."""
-        await success_transaction(
+        """Test success case."""
+        new_state = await execute_transaction(
             conn,
             transaction_id=wallet_transaction,
-            exchange_from_rate=Decimal('0.1'),
-            exchange_to_rate=Decimal('0.2'),
-            comment='Success reason',
-            new_balance_from=Decimal('0.3'),
-            new_balance_to=Decimal('0.4'),
+            from_wallet_id=1,
+            to_wallet_id=2,
+            amount=Decimal('0.1'),
+            exchange_rates=self.exchange_rates,
         )
+        assert new_state == TransactionState.SUCCESED
 
         transaction_info = await conn.fetchrow(transaction.select())
-        assert transaction_info['from_wallet_id'] == 1
-        assert transaction_info['to_wallet_id'] == 2
         assert transaction_info['state'] == 'SUCCESED'
-        assert transaction_info['amount'] == Decimal('0.1')
-        assert transaction_info['exchange_from_rate'] == Decimal('0.1')
-        assert transaction_info['exchange_to_rate'] == Decimal('0.2')
-        assert transaction_info['new_balance_from'] == Decimal('0.3')
-        assert transaction_info['new_balance_to'] == Decimal('0.4')
+        assert transaction_info['exchange_from_rate'] == Decimal('2')
+        assert transaction_info['exchange_to_rate'] == Decimal('0.5')
+        assert transaction_info['exchange_rates_snapshot_id'] == 7
+        # 0.3 - 0.1
+        assert transaction_info['new_balance_from'] == Decimal('0.2')
+        # 0.4 + 0.1 * 2 / 0.5
+        assert transaction_info['new_balance_to'] == Decimal('0.8')
         assert transaction_info['failed_reason'] is None
+
         logs = list(await conn.fetch(transaction_log.select()))
-        # First log is creation log
         assert len(logs) == 2
-        log = logs[1]
-        assert log['transaction_id'] == 1
-        assert log['state'] == 'SUCCESED'
-        assert log['comment'] == 'Success reason'
-
-
-class TestValidateTransaction:
-    """Test validate transaction."""
+        assert logs[1]['state'] == 'SUCCESED'
+        assert logs[1]['comment'] == 'Success'
 
     @pytest.mark.asyncio
-    async def test_success(
+    async def test_not_enough_money(
         self,
         conn,
         wallet_transaction,
     ):
-        """Test success validate transaction."""
-        is_valid = await validate_transaction(
+        """Test not enough money.
+
+        Balances are not changed.
+        """
+        new_state = await execute_transaction(
             conn,
             transaction_id=wallet_transaction,
+            from_wallet_id=1,
+            to_wallet_id=2,
+            amount=Decimal('0.31'),
+            exchange_rates=self.exchange_rates,
         )
-        assert is_valid is True
+        assert new_state == TransactionState.FAILED
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'FAILED'
+        assert transaction_info['failed_reason'] == 'NEM_FROM_WALLET'
+        assert transaction_info['exchange_from_rate'] is None
+        assert transaction_info['new_balance_from'] is None
+
+        wallet_from_info = await get_wallet_info(conn, wallet_id=1)
+        assert wallet_from_info['balance'] == Decimal('0.3')
+        wallet_to_info = await get_wallet_info(conn, wallet_id=2)
+        assert wallet_to_info['balance'] == Decimal('0.4')
 
     @pytest.mark.asyncio
-    async def test_failed(
+    async def test_fail_not_pending(
         self,
         conn,
         wallet_transaction,
     ):
-        """Test fail validate transaction.
+        """Test fail.
 
-        Case: not enough moeny.
+        Case: transaction is already executed.
         """
-        await conn.execute(
-            transaction
-            .update()
-            .where(
-                transaction.c.id == wallet_transaction,
-            )
-            .values(
-                amount=Decimal('1000'),
-            ),
-        )
-        is_valid = await validate_transaction(
-            conn,
-            transaction_id=wallet_transaction,
-        )
-        assert is_valid is False
+        execute_kwargs = {
+            'transaction_id': wallet_transaction,
+            'from_wallet_id': 1,
+            'to_wallet_id': 2,
+            'amount': Decimal('0.1'),
+            'exchange_rates': self.exchange_rates,
+        }
+        await execute_transaction(conn, **execute_kwargs)
+        with pytest.raises(ValueError) as exc:
+            await execute_transaction(conn, **execute_kwargs)
+        assert str(exc.value) == 'Transaction 1 is not pending'
+
+        # Money is transfered only once
+        wallet_from_info = await get_wallet_info(conn, wallet_id=1)
+        assert wallet_from_info['balance'] == Decimal('0.2')
 
-        logs = list(await conn.fetch(transaction_log.select()))
-        # First log is creation log
-        assert len(logs) == 2
-        log = logs[1]
-        assert log['transaction_id'] == 1
-        assert log['state'] == 'FAILED'
-        assert log['comment'] == 'Not enough balance'
+
+async def query_plan(conn, query, **params):
+    """Plan of compiled query (sequential scans are disabled)."""
+    async with conn.transaction():
+        await conn.execute('SET LOCAL enable_seqscan = off')
+        plan_records = await conn.fetch(
+            'EXPLAIN {0}'.format(query.sql),
+            *query.args(**params),
+        )
+    return '\n'.join(record[0] for record in plan_records)
 
 
-class TestTransferBetweenWallets:
-    """Test transfer between wallets."""
+class TestTransfersHistory:
+    """Test transfers history."""
 
     @pytest.mark.asyncio
     async def test_success(
@@ -204,143 +307,155 @@ class TestTransferBetweenWallets:
         user_with_wallet,
         user2_with_wallet,
     ):
-        """Test succes case."""
-        wallet_from_info = await get_wallet_info(
+        """Test transfers from and to wallet in order of creation."""
+        await create_transactions(
             conn,
-            wallet_id=user_with_wallet[1],
+            transfers=[
+                (1, 2, Decimal('0.1')),
+                (2, 1, Decimal('0.2')),
+                (2, 1, Decimal('0.3')),
+            ],
+        )
+        await conn.execute(
+            transaction.update().where(
+                transaction.c.id == 2,
+            ).values(created_at=datetime(2020, 1, 1)),
         )
-        assert wallet_from_info['balance'] == Decimal('0.3')
 
-        wallet_to_info = await get_wallet_info(
+        history = await transfers_history(conn, wallet_id=1)
+        assert [record['transaction_id'] for record in history] == [2, 1, 3]
+        assert history[0]['amount'] == '0.2'
+
+        history = await transfers_history(
             conn,
-            wallet_id=user2_with_wallet[1],
+            wallet_id=2,
+            start=datetime.now() - timedelta(days=1),
         )
-        assert wallet_to_info['balance'] == Decimal('0.4')
+        assert [record['transaction_id'] for record in history] == [1, 3]
 
-        await transfer_between_wallets(
+        history = await transfers_history(
             conn,
-            from_wallet_id=user_with_wallet[1],
-            to_wallet_id=user2_with_wallet[1],
-            amount=Decimal('0.1'),
+            wallet_id=2,
+            end=datetime(2020, 1, 2),
         )
+        assert [record['transaction_id'] for record in history] == [2]
 
-        # 0.3 - 0.1 = 0.2
-        wallet_from_info = await get_wallet_info(
+    @pytest.mark.asyncio
+    async def test_pages(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test pages of history after position."""
+        await create_transactions(
             conn,
-            wallet_id=user_with_wallet[1],
+            transfers=[
+                (1, 2, Decimal('0.1')),
+                (2, 1, Decimal('0.2')),
+                (1, 2, Decimal('0.3')),
+            ],
         )
-        assert wallet_from_info['balance'] == Decimal('0.2')
-
-        # 0.4 + 0.1 * 1.15 [EUR -> USD] / 0.14 [USD -> CNY]
-        wallet_to_info = await get_wallet_info(
+        # Transactions of one statement have the same created_at
+        page = await transfers_history(conn, wallet_id=1, limit=2)
+        assert [record['transaction_id'] for record in page] == [1, 2]
+        page = await transfers_history(
             conn,
-            wallet_id=user2_with_wallet[1],
+            wallet_id=1,
+            after=history_position(page[-1]),
+            limit=2,
         )
-        assert round(wallet_to_info['balance'], 3) == Decimal('1.186')
-
-        transaction_info = await conn.fetchrow(transaction.select())
-        assert transaction_info['from_wallet_id'] == 1
-        assert transaction_info['to_wallet_id'] == 2
-        assert transaction_info['state'] == 'SUCCESED'
-        assert transaction_info['amount'] == Decimal('0.1')
-        assert round(transaction_info['exchange_from_rate'], 3) == Decimal('1.153')
-        assert round(transaction_info['exchange_to_rate'], 3) == Decimal('0.147')
-        assert transaction_info['failed_reason'] is None
-        logs = list(await conn.fetch(transaction_log.select()))
-        # First log is creation log
-        assert len(logs) == 2
-        log = logs[1]
-        assert log['transaction_id'] == 1
-        assert log['state'] == 'SUCCESED'
-        assert log['comment'] == 'Success'
+        assert [record['transaction_id'] for record in page] == [3]
 
     @pytest.mark.asyncio
-    async def test_fail_wrong_type_amount(
+    async def test_iterate(
         self,
         conn,
         user_with_wallet,
         user2_with_wallet,
     ):
-        """Test fail.
-
-        Case: wrong type of amount.
-        """
-        with pytest.raises(ValueError) as exc:
-            await transfer_between_wallets(
-                conn,
-                from_wallet_id=user_with_wallet[1],
-                to_wallet_id=user2_with_wallet[1],
-                amount='bad amount',
-            )
-        assert str(exc.value) == 'Wrong type of amount'
+        """Test whole history is read by cursor."""
+        await create_transactions(
+            conn,
+            transfers=[(1, 2, Decimal('0.1')), (2, 1, Decimal('0.2'))] * 3,
+        )
+        async with conn.transaction():
+            history = [
+                record
+                async for record in iter_transfers_history(
+                    conn,
+                    wallet_id=1,
+                    prefetch=4,
+                )
+            ]
+        assert [record['transaction_id'] for record in history] == [
+            1, 2, 3, 4, 5, 6,
+        ]
+        assert history == await transfers_history(conn, wallet_id=1)
 
     @pytest.mark.asyncio
-    async def test_fail_negative_amount(
+    async def test_index_scan(
         self,
         conn,
         user_with_wallet,
-        user2_with_wallet,
     ):
-        """Test fail.
-
-        Case: negative amount.
-        """
-        with pytest.raises(ValueError) as exc:
-            await transfer_between_wallets(
-                conn,
-                from_wallet_id=user_with_wallet[1],
-                to_wallet_id=user2_with_wallet[1],
-                amount=Decimal('-3'),
-            )
-        assert str(exc.value) == 'Amount must be positive'
+        """Test history page is read by indexes."""
+        after = (datetime(2020, 1, 1), 1)
+        await transfers_history(conn, wallet_id=1, after=after, limit=10)
+        history_query = compiled_queries['transfers_history:0011']
+        plan = await query_plan(
+            conn,
+            history_query,
+            wallet_id=1,
+            after_created_at=after[0],
+            after_id=after[1],
+            limit=10,
+        )
+        assert 'Seq Scan' not in plan
+        assert 'transaction_default_from_wallet_id_created_at_idx' in plan
+        assert 'transaction_default_to_wallet_id_created_at_idx' in plan
 
     @pytest.mark.asyncio
-    async def test_fail_wallet_not_exist(
+    async def test_partition_pruning(
         self,
         conn,
         user_with_wallet,
-        user2_with_wallet,
     ):
-        """Test fail.
-
-        Case: walet_not_exist.
-        """
-        with pytest.raises(ValueError) as exc:
-            await transfer_between_wallets(
+        """Test partitions before start are not read."""
+        for month in (date(2020, 1, 1), date(2020, 2, 1)):
+            await create_month_partition(
                 conn,
-                from_wallet_id=4,
-                to_wallet_id=user2_with_wallet[1],
-                amount=Decimal('3'),
+                table_name=transaction.name,
+                month=month,
             )
-        assert str(exc.value) == 'Wallet 4 does not exist'
+        start = datetime(2020, 2, 1)
+        await transfers_history(conn, wallet_id=1, start=start, limit=10)
+        history_query = compiled_queries['transfers_history:1001']
+        plan = await query_plan(
+            conn,
+            history_query,
+            wallet_id=1,
+            start=start,
+            limit=10,
+        )
+        assert 'transaction_202002' in plan
+        assert 'transaction_202001' not in plan
+
+
+class TestGetTransactionLogs:
+    """Test get transaction logs."""
 
     @pytest.mark.asyncio
-    async def test_not_enough_money(
+    async def test_index_scan(
         self,
         conn,
-        user_with_wallet,
-        user2_with_wallet,
+        wallet_transaction,
     ):
-        """Test not enough money."""
-        await transfer_between_wallets(
+        """Test transaction logs are read by index."""
+        plan = await query_plan(
             conn,
-            from_wallet_id=user_with_wallet[1],
-            to_wallet_id=user2_with_wallet[1],
-            amount=Decimal('1000'),
+            transaction_logs_query,
+            transaction_id=wallet_transaction,
         )
-
-        transaction_info = await conn.fetchrow(transaction.select())
-        assert transaction_info['from_wallet_id'] == 1
-        assert transaction_info['to_wallet_id'] == 2
-        assert transaction_info['state'] == 'FAILED'
-        assert transaction_info['amount'] == Decimal('1000')
-        assert transaction_info['exchange_from_rate'] is None
-        assert transaction_info['exchange_to_rate'] is None
-        assert transaction_info['failed_reason'] == 'NEM_FROM_WALLET'
-        logs = list(await conn.fetch(transaction_log.select()))
-        # First log is creation log
-        assert len(logs) == 2
-        log = logs[1]
-        assert log['transaction_id'] == 1
-        assert log['state'] == 'FAILED'
-        assert log['comment'] == 'Not enough balance'
+        assert 'Seq Scan' not in plan
+        assert 'transaction_log_default_transaction_id_idx' in plan
@@ -8,6 +8,7 @@ from billing.db.models import (
 )
 from billing.db.user import (
     create_new_user,
+    create_new_users,
     get_user_info,
 )
 
@@ -57,6 +58,62 @@ class TestCreateNewUser:
             )
 
 
+class TestCreateNewUsers:
+    """Test create many new users."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        user_with_wallet_data,
+        user2_with_wallet_data,
+    ):
+        """Test users are created in order."""
+        await create_new_user(conn, **user_with_wallet_data)
+        async with conn.transaction():
+            new_ids = await create_new_users(
+                conn,
+                users=[user2_with_wallet_data, user_with_wallet_data],
+            )
+        assert new_ids == [(2, 2), (3, 3)]
+
+        new_wallets = await conn.fetch(
+            wallet.select().where(wallet.c.id > 1).order_by(wallet.c.id),
+        )
+        assert [
+            (wallet_info['user_id'], wallet_info['currency'], wallet_info['balance'])
+            for wallet_info in new_wallets
+        ] == [(2, 'CNY', Decimal('0.4')), (3, 'EUR', Decimal('0.3'))]
+        new_user = await get_user_info(conn, user_id=2)
+        assert new_user['name'] == user2_with_wallet_data['name']
+        assert new_user['city'] == user2_with_wallet_data['city']
+
+        # Sequences are moved: single registration gets next ids
+        assert await create_new_user(
+            conn,
+            **user_with_wallet_data,
+        ) == (4, 4)
+
+    @pytest.mark.asyncio
+    async def test_fail_negative_balance(
+        self,
+        conn,
+        user_with_wallet_data,
+        user2_with_wallet_data,
+    ):
+        """Testing fail.
+
+        Case: balance < 0, nothing is created.
+        """
+        user2_with_wallet_data['balance'] = Decimal('-10')
+        with pytest.raises(ValueError):
+            await create_new_users(
+                conn,
+                users=[user_with_wallet_data, user2_with_wallet_data],
+            )
+        assert not await conn.fetch(user.select())
+
+
 class TestGetUserInfo:
     """Test get user info."""
 
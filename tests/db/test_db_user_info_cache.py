@@ -0,0 +1,140 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from billing.db.models import WALLET_BALANCE_CHANNEL
+from billing.db.user_info_cache import UserInfoCache
+from billing.db.wallet import (
+    add_to_wallet,
+    get_from_wallet,
+    set_wallet_shards,
+)
+
+
+@pytest.fixture
+def cache():
+    """Enabled users info cache."""
+    users_info_cache = UserInfoCache(maxsize=2)
+    users_info_cache.enabled = True
+    return users_info_cache
+
+
+@pytest.fixture
+async def balance_notifications(pg_pool):
+    """Users ids of balance changes notifications."""
+    user_ids = []
+    async with pg_pool.acquire() as connection:
+        await connection.add_listener(
+            WALLET_BALANCE_CHANNEL,
+            lambda *args: user_ids.append(int(args[-1])),
+        )
+        yield user_ids
+        await connection.reset()
+
+
+class TestUserInfoCache:
+    """Test users info cache."""
+
+    def test_lru(self, cache):
+        """Test least recently used info is evicted."""
+        for user_id in (1, 2):
+            cache.put(user_id, {'name': str(user_id)}, token=cache.token())
+        assert cache.get(1) == {'name': '1'}
+        cache.put(3, {'name': '3'}, token=cache.token())
+        assert cache.get(1) == {'name': '1'}
+        assert cache.get(2) is None
+        assert cache.get(3) == {'name': '3'}
+
+    def test_invalidate(self, cache):
+        """Test info read before invalidation is not cached."""
+        cache.put(1, {'name': '1'}, token=cache.token())
+        token = cache.token()
+        cache.invalidate(1)
+        assert cache.get(1) is None
+
+        cache.put(1, {'name': '1'}, token=token)
+        assert cache.get(1) is None
+        cache.put(2, {'name': '2'}, token=token)
+        assert cache.get(2) == {'name': '2'}
+        cache.put(1, {'name': '1'}, token=cache.token())
+        assert cache.get(1) == {'name': '1'}
+
+    def test_forgotten_invalidations(self, cache):
+        """Test info is not cached if its invalidations are forgotten."""
+        token = cache.token()
+        for user_id in (1, 2, 3):
+            cache.invalidate(user_id)
+        cache.put(1, {'name': '1'}, token=token)
+        assert cache.get(1) is None
+        cache.put(1, {'name': '1'}, token=cache.token())
+        assert cache.get(1) == {'name': '1'}
+
+    def test_clear(self, cache):
+        """Test info read before clear is not cached."""
+        cache.put(1, {'name': '1'}, token=cache.token())
+        token = cache.token()
+        cache.clear()
+        assert cache.get(1) is None
+        cache.put(2, {'name': '2'}, token=token)
+        assert cache.get(2) is None
+
+    def test_disabled(self, cache):
+        """Test disabled cache is empty."""
+        cache.put(1, {'name': '1'}, token=cache.token())
+        cache.enabled = False
+        assert cache.get(1) is None
+        cache.put(2, {'name': '2'}, token=cache.token())
+        cache.enabled = True
+        assert cache.get(2) is None
+
+    def test_set_listening(self, cache):
+        """Test cache is cleared when listening starts."""
+        cache.put(1, {'name': '1'}, token=cache.token())
+        cache.set_listening(False)
+        assert cache.get(1) is None
+        cache.set_listening(True)
+        assert cache.enabled
+        assert cache.get(1) is None
+
+
+class TestBalanceNotifications:
+    """Test balances changes are notified on commit."""
+
+    @pytest.mark.asyncio
+    async def test_top_up(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+        balance_notifications,
+        wait_until,
+    ):
+        """Test top up and debit of wallet are notified."""
+        async with conn.transaction():
+            await add_to_wallet(conn, wallet_id=2, amount=Decimal('0.1'))
+            await asyncio.sleep(0.05)
+            assert balance_notifications == []
+        await wait_until(lambda: balance_notifications == [2])
+
+        async with conn.transaction():
+            await get_from_wallet(conn, wallet_id=1, amount=Decimal('0.1'))
+        await wait_until(lambda: balance_notifications == [2, 1])
+
+    @pytest.mark.asyncio
+    async def test_hot_wallet(
+        self,
+        conn,
+        user_with_wallet,
+        balance_notifications,
+        wait_until,
+    ):
+        """Test top up of hot wallet shard is notified."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await asyncio.sleep(0.05)
+        assert balance_notifications == []
+
+        async with conn.transaction():
+            await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.1'))
+        await wait_until(lambda: balance_notifications == [1])
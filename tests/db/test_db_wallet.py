@@ -2,13 +2,25 @@ from decimal import Decimal
 
 import pytest
 
-from billing.db.exceptions import WalletDoesNotExists
-from billing.db.models import wallet
+from billing.db.exceptions import (
+    WalletDoesNotExists,
+    WalletShardDoesNotExists,
+)
+from billing.db.models import (
+    wallet,
+    wallet_shard,
+)
 from billing.db.wallet import (
     add_to_wallet,
+    add_to_wallet_shard,
+    consolidate_hot_wallets,
+    credit_slots,
+    get_existing_wallets,
     get_from_wallet,
     get_wallet_info,
     is_wallet_exists,
+    lock_wallets,
+    set_wallet_shards,
 )
 
 
@@ -51,6 +63,7 @@ class TestGetWalletInfo:
             'user_id': 1,
             'balance': Decimal('0.3'),
             'currency': 'EUR',
+            'shards': 0,
         }
 
     @pytest.mark.asyncio
@@ -173,3 +186,189 @@ class TestGetFromWallet:
                 amount=amount,
             )
         assert str(exc.value) == 'Amount must be positive'
+
+
+class TestLockWallets:
+    """Test lock wallets."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test success case.
+
+        Unknown wallets are skipped.
+        """
+        async with conn.transaction():
+            wallets = await lock_wallets(conn, wallet_ids=[2, 5, 1, 2])
+        assert list(wallets) == [1, 2]
+        assert wallets[1]['balance'] == Decimal('0.3')
+        assert wallets[2]['currency'] == 'CNY'
+
+
+class TestGetExistingWallets:
+    """Test get existing wallets."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test success case."""
+        wallet_ids = await get_existing_wallets(conn, wallet_ids=[2, 5, 1, 2])
+        assert wallet_ids == {1, 2}
+
+
+class TestHotWallet:
+    """Test hot wallet sub-balances."""
+
+    @pytest.mark.asyncio
+    async def test_top_up(
+        self,
+        conn,
+        user_with_wallet,
+    ):
+        """Test top ups go to shards, balance is aggregated."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=4)
+        for _ in range(8):
+            new_balance = await add_to_wallet(
+                conn,
+                wallet_id=1,
+                amount=Decimal('0.1'),
+            )
+        assert new_balance == Decimal('1.1')
+
+        wallet_record = await conn.fetchrow(wallet.select())
+        assert wallet_record['balance'] == Decimal('0.3')
+        assert wallet_record['shards'] == 4
+        shards = await conn.fetch(wallet_shard.select())
+        assert len(shards) == 4
+        assert sum(shard['balance'] for shard in shards) == Decimal('0.8')
+
+        wallet_info = await get_wallet_info(conn, wallet_id=1)
+        assert wallet_info['balance'] == Decimal('1.1')
+
+    @pytest.mark.asyncio
+    async def test_consolidation(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test sub-balances are moved to wallet row."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+
+        async with conn.transaction():
+            assert await consolidate_hot_wallets(conn) == 1
+        wallet_record = await conn.fetchrow(
+            wallet.select().where(wallet.c.id == 1),
+        )
+        assert wallet_record['balance'] == Decimal('0.8')
+        shards = await conn.fetch(wallet_shard.select())
+        assert {shard['balance'] for shard in shards} == {0}
+
+    @pytest.mark.asyncio
+    async def test_debit(
+        self,
+        conn,
+        user_with_wallet,
+    ):
+        """Test debit sees sub-balances."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+
+        async with conn.transaction():
+            new_balance = await get_from_wallet(
+                conn,
+                wallet_id=1,
+                amount=Decimal('0.7'),
+            )
+        assert new_balance == Decimal('0.1')
+
+    @pytest.mark.asyncio
+    async def test_lock_wallets(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test hot wallet is consolidated only for not covered debit."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+
+        for debit, balance, shards_balance in (
+            (None, Decimal('0.3'), Decimal('0.5')),
+            (Decimal('0.3'), Decimal('0.3'), Decimal('0.5')),
+            (Decimal('0.5'), Decimal('0.8'), Decimal('0')),
+        ):
+            async with conn.transaction():
+                wallets = await lock_wallets(
+                    conn,
+                    wallet_ids=[1, 2],
+                    debits=None if debit is None else {1: debit},
+                )
+            assert wallets[1]['balance'] == balance
+            assert wallets[1]['shards_balance'] == shards_balance
+            assert wallets[2]['balance'] == Decimal('0.4')
+
+    @pytest.mark.asyncio
+    async def test_credit_slots(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test only not debited hot wallets are credited to shards."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+            wallets = await lock_wallets(conn, wallet_ids=[1, 2])
+        assert set(credit_slots(wallets, debits={})) == {1}
+        assert credit_slots(wallets, debits={1: Decimal(1)}) == {}
+
+    @pytest.mark.asyncio
+    async def test_fail_missing_shard(
+        self,
+        conn,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: shards of wallet were changed.
+        """
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        with pytest.raises(WalletShardDoesNotExists):
+            await add_to_wallet_shard(
+                conn,
+                wallet_id=1,
+                slot=5,
+                amount=Decimal('0.5'),
+            )
+
+    @pytest.mark.asyncio
+    async def test_unset_shards(
+        self,
+        conn,
+        user_with_wallet,
+    ):
+        """Test wallet is not hot without shards."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=0)
+
+        wallet_record = await conn.fetchrow(wallet.select())
+        assert wallet_record['balance'] == Decimal('0.8')
+        assert wallet_record['shards'] == 0
+        assert not await conn.fetch(wallet_shard.select())
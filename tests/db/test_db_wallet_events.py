@@ -0,0 +1,138 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from billing.currency_rate.rates_table import ExchangeRates
+from billing.db.models import (
+    TRANSACTION_LOG_CHANNEL,
+    TransactionState,
+)
+from billing.db.transaction import (
+    create_transactions,
+    execute_transaction,
+)
+from billing.db.wallet_events import WalletEvents
+
+
+@pytest.fixture
+def events():
+    """Listening wallets events."""
+    wallet_events = WalletEvents(queue_size=2)
+    wallet_events.set_listening(True)
+    return wallet_events
+
+
+def transaction_event(event_id, from_wallet_id=1, to_wallet_id=2):
+    """Event of transaction log."""
+    return {
+        'id': event_id,
+        'from_wallet_id': from_wallet_id,
+        'to_wallet_id': to_wallet_id,
+    }
+
+
+@pytest.fixture
+async def transaction_logs(pg_pool):
+    """Notified transactions logs."""
+    logs = []
+    async with pg_pool.acquire() as connection:
+        await connection.add_listener(
+            TRANSACTION_LOG_CHANNEL,
+            lambda *args: logs.append(json.loads(args[-1])),
+        )
+        yield logs
+        await connection.reset()
+
+
+class TestWalletEvents:
+    """Test wallets events."""
+
+    @pytest.mark.asyncio
+    async def test_publish(self, events):
+        """Test events are put to subscriptions of both wallets."""
+        from_subscription = events.subscribe(1)
+        to_subscription = events.subscribe(2)
+        other_subscription = events.subscribe(3)
+        events.publish(transaction_event(1))
+        assert await from_subscription.get() == transaction_event(1)
+        assert await to_subscription.get() == transaction_event(1)
+
+        events.unsubscribe(to_subscription)
+        assert await to_subscription.get() is None
+        assert len(events) == 2
+        assert other_subscription.put(transaction_event(2, 3, 3))
+        assert await other_subscription.get() == transaction_event(2, 3, 3)
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber(self, events):
+        """Test subscriber with full queue is closed."""
+        subscription = events.subscribe(1)
+        for event_id in range(3):
+            events.publish(transaction_event(event_id))
+        assert subscription.closed
+        assert len(events) == 0
+        assert await subscription.get() == transaction_event(0)
+        assert await subscription.get() == transaction_event(1)
+        assert await subscription.get() is None
+
+    @pytest.mark.asyncio
+    async def test_wait(self, events):
+        """Test subscriber waits next event."""
+        subscription = events.subscribe(2)
+        next_event = asyncio.ensure_future(subscription.get())
+        await asyncio.sleep(0)
+        assert not next_event.done()
+        events.publish(transaction_event(1))
+        assert await next_event == transaction_event(1)
+
+    @pytest.mark.asyncio
+    async def test_not_listening(self, events):
+        """Test subscriptions are closed when events are not listened."""
+        subscription = events.subscribe(1)
+        events.set_listening(False)
+        assert await subscription.get() is None
+        assert events.subscribe(1).closed
+        assert len(events) == 0
+
+
+class TestTransactionLogNotifications:
+    """Test transactions logs are notified on commit."""
+
+    @pytest.mark.asyncio
+    async def test_transaction_logs(
+        self,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+        transaction_logs,
+        wait_until,
+    ):
+        """Test logs of created and executed transactions."""
+        async with conn.transaction():
+            transaction_ids = await create_transactions(
+                conn,
+                transfers=[(1, 2, Decimal('0.1')), (2, 1, Decimal('0.2'))],
+            )
+        await wait_until(lambda: len(transaction_logs) == 2)
+        created_log = transaction_logs[0]
+        assert created_log['transaction_id'] == transaction_ids[0]
+        assert created_log['from_wallet_id'] == 1
+        assert created_log['to_wallet_id'] == 2
+        assert created_log['amount'] == '0.1'
+        assert created_log['state'] == 'CREATED'
+        assert created_log['comment'] == 'Transaction created'
+
+        async with conn.transaction():
+            await execute_transaction(
+                conn,
+                transaction_id=transaction_ids[0],
+                from_wallet_id=1,
+                to_wallet_id=2,
+                amount=Decimal('0.1'),
+                exchange_rates=ExchangeRates(Decimal('1.1'), Decimal('0.14')),
+            )
+        await wait_until(lambda: len(transaction_logs) == 3)
+        assert transaction_logs[2]['transaction_id'] == transaction_ids[0]
+        assert transaction_logs[2]['state'] == TransactionState.SUCCESED.name
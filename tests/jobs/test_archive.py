@@ -0,0 +1,93 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from billing.db.models import (
+    TransactionState,
+    transaction,
+    transaction_log,
+)
+from billing.db.transaction import (
+    create_transactions,
+    iter_transfers_history,
+    transfers_history,
+)
+from billing.jobs.archive import archive_transactions
+
+
+class TestArchiveTransactions:
+    """Test archive transactions."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+        archive,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test old finished transactions are moved to archive.
+
+        History with archive is the same as before archivation.
+        """
+        await create_transactions(
+            conn,
+            transfers=[(1, 2, Decimal('0.01'))] * 5,
+        )
+        await conn.execute(
+            transaction.update().where(
+                transaction.c.id <= 4,
+            ).values(created_at=datetime(2020, 1, 1)),
+        )
+        await conn.execute(
+            transaction.update().where(
+                transaction.c.id != 2,
+            ).values(state=TransactionState.SUCCESED),
+        )
+        history = await transfers_history(conn, wallet_id=1)
+
+        archived = await archive_transactions(
+            pg_pool,
+            archive,
+            age=90,
+            batch_size=2,
+        )
+        assert archived == 3
+        live_ids = [
+            record['id'] for record in await conn.fetch(transaction.select())
+        ]
+        assert sorted(live_ids) == [2, 5]
+        log_ids = {
+            record['transaction_id']
+            for record in await conn.fetch(transaction_log.select())
+        }
+        assert log_ids == {2, 5}
+        archived_logs = (
+            await archive.wallet_transactions(wallet_id=2)
+        )[0]['logs']
+        assert [log['state'] for log in archived_logs] == ['CREATED']
+
+        assert await transfers_history(
+            conn,
+            wallet_id=1,
+            archive=archive,
+        ) == history
+        assert await transfers_history(
+            conn,
+            wallet_id=1,
+            after=(datetime(2020, 1, 1), 1),
+            limit=2,
+            archive=archive,
+        ) == history[1:3]
+        async with conn.transaction():
+            assert [
+                record
+                async for record in iter_transfers_history(
+                    conn,
+                    wallet_id=1,
+                    prefetch=1,
+                    archive=archive,
+                )
+            ] == history
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+import pytest
+
+from billing.db.models import (
+    wallet_balance_snapshot,
+    wallet_top_up,
+)
+from billing.jobs.balance_snapshots import snapshot_balances
+
+
+class TestSnapshotBalances:
+    """Test snapshot balances."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+    ):
+        """Test only new days are snapshotted."""
+        today = await conn.fetchval('SELECT current_date')
+        yesterday = today - timedelta(days=1)
+        await conn.execute(
+            wallet_top_up.update().values(created_at=yesterday),
+        )
+        assert await snapshot_balances(pg_pool, delay=0) == 1
+        assert await snapshot_balances(pg_pool, delay=0) == 0
+        snapshots = await conn.fetch(wallet_balance_snapshot.select())
+        assert [
+            (snapshot['wallet_id'], snapshot['day'])
+            for snapshot in snapshots
+        ] == [(1, yesterday)]
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+from billing.db.idempotency import claim_idempotency_key
+from billing.db.models import idempotent_request
+from billing.jobs.idempotency_cleanup import cleanup_expired_requests
+
+
+class TestCleanupExpiredRequests:
+    """Test cleanup expired requests."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+    ):
+        """Test expired requests are deleted batch by batch."""
+        for key_number in range(5):
+            await claim_idempotency_key(
+                conn,
+                endpoint='/v1/wallet_top_up',
+                idempotency_key=str(key_number),
+                request_hash='hash',
+            )
+        await conn.execute(
+            idempotent_request.update().where(
+                idempotent_request.c.idempotency_key != '0',
+            ).values(created_at=datetime(2020, 1, 1)),
+        )
+
+        deleted = await cleanup_expired_requests(
+            pg_pool,
+            retention=3600,
+            batch_size=2,
+        )
+        assert deleted == 4
+        requests = await conn.fetch(idempotent_request.select())
+        assert [record['idempotency_key'] for record in requests] == ['0']
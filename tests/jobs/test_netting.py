@@ -0,0 +1,182 @@
+from decimal import Decimal
+
+import pytest
+from asyncpg.exceptions import DataError
+
+from billing.currency_rate.rates_table import (
+    ExchangeRates,
+    rates_table,
+)
+from billing.db.models import (
+    TransactionState,
+    transaction,
+    transaction_log,
+)
+from billing.db.transaction import create_transaction
+from billing.db.wallet import get_wallet_info
+from billing.jobs import transfer_worker
+from billing.jobs.netting import net_transfers
+from billing.jobs.transfer_worker import process_transfers
+
+
+class TestNetTransfers:
+    """Test net transfers."""
+
+    def test_success(self):
+        """Test transfers are netted as executed one by one."""
+        transfers = [
+            {'id': 1, 'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': 5},
+            {'id': 2, 'from_wallet_id': 2, 'to_wallet_id': 1, 'amount': 20},
+            {'id': 3, 'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': 15},
+            {'id': 4, 'from_wallet_id': 1, 'to_wallet_id': 3, 'amount': 10},
+        ]
+        same_rates = ExchangeRates(from_rate=Decimal(1), to_rate=Decimal(1))
+        netted_transfers, new_balances = net_transfers(
+            transfers,
+            balances={1: Decimal(10), 2: Decimal(15), 3: Decimal(0)},
+            exchange_rates={
+                transfer['id']: same_rates for transfer in transfers
+            },
+        )
+        assert [netted.state for netted in netted_transfers] == [
+            TransactionState.SUCCESED,
+            TransactionState.SUCCESED,
+            TransactionState.SUCCESED,
+            TransactionState.SUCCESED,
+        ]
+        assert netted_transfers[1].new_balance_from == 0
+        assert netted_transfers[1].new_balance_to == 25
+        # Wallet 2 balance is not changed by batch
+        assert new_balances == {1: 0, 3: 10}
+
+    def test_not_enough_money(self):
+        """Test transfer fails on balance left by previous ones."""
+        transfers = [
+            {'id': 1, 'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': 5},
+            {'id': 2, 'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': 6},
+        ]
+        netted_transfers, new_balances = net_transfers(
+            transfers,
+            balances={1: Decimal(10), 2: Decimal(0)},
+            exchange_rates={
+                1: ExchangeRates(from_rate=Decimal(2), to_rate=Decimal(1)),
+                2: ExchangeRates(from_rate=Decimal(2), to_rate=Decimal(1)),
+            },
+        )
+        assert [netted.state for netted in netted_transfers] == [
+            TransactionState.SUCCESED,
+            TransactionState.FAILED,
+        ]
+        assert netted_transfers[0].credit_amount == 10
+        assert netted_transfers[1].new_balance_from is None
+        assert netted_transfers[1].credit_amount is None
+        assert new_balances == {1: 5, 2: 10}
+
+
+class TestProcessNettedTransfers:
+    """Test process transfers queue with netting."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test netted transfers results are same as sequential ones."""
+        wallet1 = user_with_wallet[1]
+        wallet2 = user2_with_wallet[1]
+        for from_wallet_id, to_wallet_id, amount in (
+            (wallet1, wallet2, '0.1'),
+            (wallet2, wallet1, '0.5'),
+            (wallet2, wallet1, '0.2'),
+            (wallet1, wallet2, '0.45'),
+        ):
+            await create_transaction(
+                conn,
+                from_wallet_id=from_wallet_id,
+                to_wallet_id=to_wallet_id,
+                amount=Decimal(amount),
+            )
+
+        snapshot = rates_table.publish({'EUR': Decimal(2), 'CNY': Decimal(1)})
+        try:  # NOQA: WPS501
+            processed = await process_transfers(
+                pg_pool,
+                batch_size=10,
+                netting=True,
+            )
+        finally:
+            rates_table.clear()
+        assert processed == 4
+
+        transactions = await conn.fetch(
+            transaction.select().order_by(transaction.c.id),
+        )
+        assert [
+            (
+                record['state'],
+                record['failed_reason'],
+                record['new_balance_from'],
+                record['new_balance_to'],
+            )
+            for record in transactions
+        ] == [
+            ('SUCCESED', None, Decimal('0.2'), Decimal('0.6')),
+            ('SUCCESED', None, Decimal('0.1'), Decimal('0.45')),
+            ('FAILED', 'NEM_FROM_WALLET', None, None),
+            ('SUCCESED', None, Decimal('0.00'), Decimal('1.00')),
+        ]
+        assert transactions[0]['exchange_rates_snapshot_id'] == (
+            snapshot.snapshot_id
+        )
+        assert transactions[2]['exchange_from_rate'] is None
+        assert [record['credit_amount'] for record in transactions] == [
+            Decimal('0.2'),
+            Decimal('0.25'),
+            None,
+            Decimal('0.9'),
+        ]
+
+        logs = await conn.fetch(
+            transaction_log.select().where(
+                transaction_log.c.state != 'CREATED',
+            ).order_by(transaction_log.c.transaction_id),
+        )
+        assert [log['comment'] for log in logs] == [
+            'Success',
+            'Success',
+            'Not enough balance',
+            'Success',
+        ]
+        wallet1_info = await get_wallet_info(conn, wallet_id=wallet1)
+        wallet2_info = await get_wallet_info(conn, wallet_id=wallet2)
+        assert wallet1_info['balance'] == 0
+        assert wallet2_info['balance'] == 1
+
+    @pytest.mark.asyncio
+    async def test_broken_transfer(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+        rates_snapshot,
+        monkeypatch,
+    ):
+        """Test transfer with broken data is failed when netting fails."""
+        async def broken(*args, **kwargs):
+            raise DataError('numeric field overflow')
+
+        monkeypatch.setattr(transfer_worker, 'settle_netted_transfers', broken)
+        monkeypatch.setattr(transfer_worker, 'execute_transaction', broken)
+        processed = await process_transfers(
+            pg_pool,
+            batch_size=10,
+            netting=True,
+        )
+        assert processed == 1
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'FAILED'
+        assert transaction_info['failed_reason'] == 'UNKNOWN'
@@ -0,0 +1,18 @@
+import pytest
+
+from billing.jobs.partitions import maintain_partitions
+
+
+class TestMaintainPartitions:
+    """Test maintain partitions."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+    ):
+        """Test missing partitions are created once."""
+        created = await maintain_partitions(pg_pool, months_ahead=2)
+        # Current and two next months of both tables
+        assert len(created) == 6
+        assert await maintain_partitions(pg_pool, months_ahead=2) == []
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import asyncio
+
+import pytest
+
+from billing.db.exceptions import WalletDoesNotExists
+from billing.db.models import wallet
+from billing.db.wallet import add_to_wallet_query
+from billing.jobs.top_up_coalescer import TopUpCoalescer
+
+
+class TestTopUpCoalescer:
+    """Test group commit of top ups."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+    ):
+        """Test concurrent top ups are applied by one update."""
+        top_up_coalescer = TopUpCoalescer(pg_pool, window=0.01, max_size=100)
+        hits = add_to_wallet_query.stats['hits']
+        new_balances = await asyncio.gather(
+            *[
+                top_up_coalescer.top_up(
+                    wallet_id=user_with_wallet[1],
+                    amount=Decimal(amount),
+                )
+                for amount in ('0.1', '0.2', '0.3')
+            ],
+        )
+        assert add_to_wallet_query.stats['hits'] == hits + 1
+        # Balances after every top up in order of arrival
+        assert new_balances == [Decimal('0.4'), Decimal('0.6'), Decimal('0.9')]
+        wallet_info = await conn.fetchrow(wallet.select())
+        assert wallet_info['balance'] == Decimal('0.9')
+
+    @pytest.mark.asyncio
+    async def test_max_size(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+    ):
+        """Test full group is applied without waiting window."""
+        top_up_coalescer = TopUpCoalescer(pg_pool, window=60, max_size=2)
+        hits = add_to_wallet_query.stats['hits']
+        new_balances = await asyncio.wait_for(
+            asyncio.gather(
+                *[
+                    top_up_coalescer.top_up(
+                        wallet_id=user_with_wallet[1],
+                        amount=Decimal('0.1'),
+                    )
+                    for _ in range(4)
+                ],
+            ),
+            timeout=5,
+        )
+        assert add_to_wallet_query.stats['hits'] == hits + 2
+        assert new_balances[-1] == Decimal('0.7')
+
+    @pytest.mark.asyncio
+    async def test_close(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+    ):
+        """Test pending top ups are applied on close."""
+        top_up_coalescer = TopUpCoalescer(pg_pool, window=60, max_size=100)
+        top_up = asyncio.ensure_future(
+            top_up_coalescer.top_up(
+                wallet_id=user_with_wallet[1],
+                amount=Decimal('0.1'),
+            ),
+        )
+        await asyncio.sleep(0)
+        await top_up_coalescer.close()
+        assert await top_up == Decimal('0.4')
+
+    @pytest.mark.asyncio
+    async def test_fail_unknown_wallet(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: wallet does not exists, every top up of group fails.
+        """
+        top_up_coalescer = TopUpCoalescer(pg_pool, window=0.01, max_size=100)
+        results = await asyncio.gather(
+            *[
+                top_up_coalescer.top_up(wallet_id=5, amount=Decimal('0.1'))
+                for _ in range(2)
+            ],
+            return_exceptions=True,
+        )
+        assert all(
+            isinstance(top_up_result, WalletDoesNotExists)
+            for top_up_result in results
+        )
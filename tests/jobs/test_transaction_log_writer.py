@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from asyncpg.exceptions import NotNullViolationError
+
+from billing.db.models import (
+    TransactionState,
+    transaction_log,
+)
+from billing.jobs.transaction_log_writer import (
+    LogEntry,
+    TransactionLogWriter,
+)
+
+
+class TestTransactionLogWriter:
+    """Test buffered writer of transaction logs."""
+
+    @pytest.mark.asyncio
+    async def test_flush(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+    ):
+        """Test buffered logs are written by flush."""
+        log_writer = TransactionLogWriter(
+            pg_pool,
+            flush_interval=60,
+            flush_size=100,
+        )
+        log_writer.add(
+            [
+                LogEntry(wallet_transaction, TransactionState.SUCCESED, 'Success'),
+            ],
+        )
+        assert len(await conn.fetch(transaction_log.select())) == 1
+
+        assert await log_writer.flush() == 1
+        assert not log_writer
+        logs = await conn.fetch(
+            transaction_log.select().order_by(transaction_log.c.id),
+        )
+        assert [(log['state'], log['comment']) for log in logs] == [
+            ('CREATED', 'Transaction created'),
+            ('SUCCESED', 'Success'),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_run(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+    ):
+        """Test full buffer is flushed without waiting interval.
+
+        Buffered logs are flushed on cancel.
+        """
+        log_writer = TransactionLogWriter(
+            pg_pool,
+            flush_interval=60,
+            flush_size=2,
+        )
+        writer_task = asyncio.ensure_future(log_writer.run())
+        entry = LogEntry(wallet_transaction, TransactionState.FAILED, 'Failed')
+        log_writer.add([entry, entry])
+        await asyncio.sleep(0.5)
+        assert len(await conn.fetch(transaction_log.select())) == 3
+
+        log_writer.add([entry])
+        writer_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await writer_task
+        assert len(await conn.fetch(transaction_log.select())) == 4
+
+    @pytest.mark.asyncio
+    async def test_fail_flush(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+    ):
+        """Test fail.
+
+        Case: logs can not be written, they stay buffered.
+        """
+        log_writer = TransactionLogWriter(
+            pg_pool,
+            flush_interval=60,
+            flush_size=100,
+        )
+        log_writer.add([LogEntry(None, TransactionState.SUCCESED, 'Success')])
+        with pytest.raises(NotNullViolationError):
+            await log_writer.flush()
+        assert len(log_writer) == 1
@@ -0,0 +1,277 @@
+from decimal import Decimal
+
+import asyncio
+
+import pytest
+from asyncpg.exceptions import (
+    DataError,
+    QueryCanceledError,
+)
+
+from billing.db.models import (
+    transaction,
+    transaction_log,
+    wallet,
+)
+from billing.db.transaction import create_transaction
+from billing.db.wallet import (
+    add_to_wallet,
+    get_wallet_info,
+    set_wallet_shards,
+)
+from billing.jobs import transfer_worker
+from billing.jobs.transaction_log_writer import TransactionLogWriter
+from billing.jobs.transfer_worker import (
+    fail_transfer,
+    process_transfers,
+)
+
+
+def raise_error(error):
+    """Coroutine function which raises error."""
+    async def failing(*args, **kwargs):
+        raise error
+    return failing
+
+
+class TestProcessTransfers:
+    """Test process transfers queue."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+        rates_snapshot,
+    ):
+        """Test queued transfers are executed."""
+        for amount in ('0.1', '0.15', '0.1'):
+            await create_transaction(
+                conn,
+                from_wallet_id=user_with_wallet[1],
+                to_wallet_id=user2_with_wallet[1],
+                amount=Decimal(amount),
+            )
+
+        assert await process_transfers(pg_pool, batch_size=2) == 2
+        assert await process_transfers(pg_pool, batch_size=2) == 1
+        assert await process_transfers(pg_pool, batch_size=2) == 0
+
+        transactions = await conn.fetch(
+            transaction.select().order_by(transaction.c.id),
+        )
+        states = [record['state'] for record in transactions]
+        assert states == ['SUCCESED', 'SUCCESED', 'FAILED']
+        wallet_from_info = await get_wallet_info(
+            conn,
+            wallet_id=user_with_wallet[1],
+        )
+        # 0.3 - 0.1 - 0.15
+        assert wallet_from_info['balance'] == Decimal('0.05')
+
+    @pytest.mark.asyncio
+    async def test_skip_locked(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+        rates_snapshot,
+    ):
+        """Test transfers claimed by other worker are skipped."""
+        async with pg_pool.acquire() as other_worker_conn:
+            async with other_worker_conn.transaction():
+                await other_worker_conn.execute(
+                    transaction.select().with_for_update(),
+                )
+                assert await process_transfers(pg_pool, batch_size=10) == 0
+
+        assert await process_transfers(pg_pool, batch_size=10) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_opposite_transfers(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+        rates_snapshot,
+    ):
+        """Test concurrent workers with transfers A -> B and B -> A.
+
+        Wallets are locked in the same order: there are no deadlocks.
+        """
+        wallet_ids = (user_with_wallet[1], user2_with_wallet[1])
+        for wallet_id in wallet_ids:
+            await add_to_wallet(conn, wallet_id=wallet_id, amount=Decimal(10))
+        for direction in (1, -1) * 10:
+            from_wallet_id, to_wallet_id = wallet_ids[::direction]
+            await create_transaction(
+                conn,
+                from_wallet_id=from_wallet_id,
+                to_wallet_id=to_wallet_id,
+                amount=Decimal(1),
+            )
+
+        await asyncio.gather(
+            *[process_transfers(pg_pool, batch_size=2) for _ in range(10)],
+        )
+        while await process_transfers(pg_pool, batch_size=2):
+            pass  # NOQA: WPS420
+
+        states = await conn.fetch(transaction.select())
+        assert {record['state'] for record in states} == {'SUCCESED'}
+
+    @pytest.mark.asyncio
+    async def test_no_rates_snapshot(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+    ):
+        """Test transfers wait for rates snapshot."""
+        assert await process_transfers(pg_pool, batch_size=10) == 0
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'CREATED'
+
+    @pytest.mark.asyncio
+    async def test_broken_transfer(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+        rates_snapshot,
+        monkeypatch,
+    ):
+        """Test transfer with broken data is failed."""
+        monkeypatch.setattr(
+            transfer_worker,
+            'execute_transaction',
+            raise_error(DataError('numeric field overflow')),
+        )
+        assert await process_transfers(pg_pool, batch_size=10) == 1
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'FAILED'
+        assert transaction_info['failed_reason'] == 'UNKNOWN'
+
+    @pytest.mark.asyncio
+    async def test_transient_error(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+        rates_snapshot,
+        monkeypatch,
+    ):
+        """Test transfer stays queued on transient error."""
+        monkeypatch.setattr(
+            transfer_worker,
+            'execute_transaction',
+            raise_error(QueryCanceledError('statement timeout')),
+        )
+        with pytest.raises(QueryCanceledError):
+            await process_transfers(pg_pool, batch_size=10)
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'CREATED'
+
+    @pytest.mark.parametrize('netting', [False, True])
+    @pytest.mark.asyncio
+    async def test_hot_wallet_credit(
+        self,
+        pg_pool,
+        conn,
+        user_with_wallet,
+        user2_with_wallet,
+        rates_snapshot,
+        netting,
+    ):
+        """Test credits of hot wallet go to shard."""
+        async with conn.transaction():
+            await set_wallet_shards(conn, wallet_id=1, shards=2)
+        await add_to_wallet(conn, wallet_id=1, amount=Decimal('0.5'))
+        for _ in range(2):
+            await create_transaction(
+                conn,
+                from_wallet_id=user2_with_wallet[1],
+                to_wallet_id=user_with_wallet[1],
+                amount=Decimal('0.14'),
+            )
+
+        assert await process_transfers(
+            pg_pool,
+            batch_size=10,
+            netting=netting,
+        ) == 2
+
+        hot_wallet = await conn.fetchrow(
+            wallet.select().where(wallet.c.id == 1),
+        )
+        # Wallet row is not updated
+        assert hot_wallet['balance'] == Decimal('0.3')
+        # 0.3 + 0.5 + 2 * 0.14 * 0.14 [CNY -> USD] / 1.1 [USD -> EUR]
+        wallet_info = await get_wallet_info(conn, wallet_id=1)
+        assert round(wallet_info['balance'], 4) == Decimal('0.8356')
+        transactions = await conn.fetch(
+            transaction.select().order_by(transaction.c.id),
+        )
+        assert transactions[-1]['new_balance_to'] == wallet_info['balance']
+
+    @pytest.mark.parametrize('netting', [False, True])
+    @pytest.mark.asyncio
+    async def test_buffered_logs(
+        self,
+        pg_pool,
+        conn,
+        wallet_transaction,
+        rates_snapshot,
+        netting,
+    ):
+        """Test logs of executed transfers are passed to writer."""
+        log_writer = TransactionLogWriter(
+            pg_pool,
+            flush_interval=60,
+            flush_size=100,
+        )
+        assert await process_transfers(
+            pg_pool,
+            batch_size=10,
+            netting=netting,
+            log_writer=log_writer,
+        ) == 1
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'SUCCESED'
+        assert len(await conn.fetch(transaction_log.select())) == 1
+
+        assert await log_writer.flush() == 1
+        logs = await conn.fetch(
+            transaction_log.select().order_by(transaction_log.c.id),
+        )
+        assert [(log['state'], log['comment']) for log in logs] == [
+            ('CREATED', 'Transaction created'),
+            ('SUCCESED', 'Success'),
+        ]
+
+
+class TestFailTransfer:
+    """Test fail broken transfer."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        conn,
+        wallet_transaction,
+    ):
+        """Test created transfer is failed once."""
+        await fail_transfer(conn, transaction_id=wallet_transaction)
+        await fail_transfer(conn, transaction_id=wallet_transaction)
+
+        transaction_info = await conn.fetchrow(transaction.select())
+        assert transaction_info['state'] == 'FAILED'
+        assert transaction_info['failed_reason'] == 'UNKNOWN'
+        logs = await conn.fetch(transaction_log.select())
+        assert len(logs) == 2
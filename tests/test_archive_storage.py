@@ -0,0 +1,80 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+
+def archived_transaction(transaction_id, from_wallet_id, to_wallet_id, day):
+    """Archived transaction data."""
+    return {
+        'id': transaction_id,
+        'from_wallet_id': from_wallet_id,
+        'to_wallet_id': to_wallet_id,
+        'amount': Decimal('0.1'),
+        'created_at': datetime(2020, 1, day),
+        'state': 'SUCCESED',
+        'logs': [],
+    }
+
+
+class TestArchiveStorage:
+    """Test archive storage."""
+
+    @pytest.mark.asyncio
+    async def test_success(
+        self,
+        archive,
+    ):
+        """Test wallet transactions are read from its segments."""
+        await archive.write_segment([
+            archived_transaction(1, 1, 2, 1),
+            archived_transaction(2, 2, 3, 2),
+        ])
+        await archive.write_segment([
+            archived_transaction(3, 3, 1, 3),
+            archived_transaction(4, 2, 3, 4),
+        ])
+
+        transactions = await archive.wallet_transactions(wallet_id=1)
+        assert [transaction['id'] for transaction in transactions] == [1, 3]
+        assert transactions[0] == {
+            'id': 1,
+            'from_wallet_id': 1,
+            'to_wallet_id': 2,
+            'amount': '0.1',
+            'created_at': '2020-01-01 00:00:00',
+            'state': 'SUCCESED',
+            'logs': [],
+        }
+
+        transactions = await archive.wallet_transactions(
+            wallet_id=3,
+            start=datetime(2020, 1, 3),
+            end=datetime(2020, 1, 3),
+        )
+        assert [transaction['id'] for transaction in transactions] == [3]
+
+        transactions = await archive.wallet_transactions(
+            wallet_id=2,
+            after=(datetime(2020, 1, 2), 2),
+        )
+        assert [transaction['id'] for transaction in transactions] == [4]
+
+    @pytest.mark.asyncio
+    async def test_duplicates(
+        self,
+        archive,
+    ):
+        """Test transaction written twice is read once."""
+        for _ in range(2):
+            await archive.write_segment([archived_transaction(1, 1, 2, 1)])
+        transactions = await archive.wallet_transactions(wallet_id=2)
+        assert [transaction['id'] for transaction in transactions] == [1]
+
+    @pytest.mark.asyncio
+    async def test_not_archived(
+        self,
+        archive,
+    ):
+        """Test wallet without archived transactions."""
+        assert await archive.wallet_transactions(wallet_id=1) == []
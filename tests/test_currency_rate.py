@@ -1,8 +1,13 @@
+import asyncio
 from decimal import Decimal
 
 import pytest
 
-from billing.currency_rate.currency_rate import get_currency_rate
+from billing.currency_rate.currency_rate import (
+    CurrencyRateCache,
+    get_currency_rate,
+    get_currency_rates,
+)
 
 
 @pytest.mark.asyncio
@@ -15,3 +20,93 @@ async def test_get_currency_rate():
 
     with pytest.raises(ValueError):
         await get_currency_rate('UNKNOWN_VALUE')
+
+
+@pytest.mark.asyncio
+async def test_get_currency_rates():
+    """Test get many currency rates."""
+    usd_rate, eur_rate = await get_currency_rates('USD', 'EUR')
+    assert round(usd_rate, 4) == Decimal('1')
+    assert round(eur_rate, 4) == Decimal('1.1532')
+
+
+class TestCurrencyRateCache:
+    """Test currency rate cache."""
+
+    def rate_source(self, rates):
+        """Rate source mock.
+
+        Rates are returned in order, exceptions are raised.
+        """
+        calls = []
+
+        async def get_rate(currency_name):
+            calls.append(currency_name)
+            await asyncio.sleep(0)
+            rate = rates[len(calls) - 1]
+            if isinstance(rate, Exception):
+                raise rate
+            return rate
+
+        return get_rate, calls
+
+    @pytest.mark.asyncio
+    async def test_hit(self):
+        """Test fresh rate is taken from cache."""
+        get_rate, calls = self.rate_source([Decimal('1.1')])
+        cache = CurrencyRateCache(get_rate, ttl=60, max_staleness=600)
+
+        assert await cache.get('EUR') == Decimal('1.1')
+        assert await cache.get('EUR') == Decimal('1.1')
+        assert calls == ['EUR']
+        assert cache.stats == {'hits': 1, 'misses': 1}
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        """Test concurrent misses share one request."""
+        get_rate, calls = self.rate_source([Decimal('1.1')])
+        cache = CurrencyRateCache(get_rate, ttl=60, max_staleness=600)
+
+        currency_rates = await asyncio.gather(
+            *[cache.get('EUR') for _ in range(10)],
+        )
+        assert currency_rates == [Decimal('1.1')] * 10
+        assert calls == ['EUR']
+        assert cache.stats == {'misses': 1, 'collapsed': 9}
+
+    @pytest.mark.asyncio
+    async def test_expired(self):
+        """Test expired rate is requested again."""
+        get_rate, calls = self.rate_source([Decimal('1.1'), Decimal('1.2')])
+        cache = CurrencyRateCache(get_rate, ttl=0, max_staleness=600)
+
+        assert await cache.get('EUR') == Decimal('1.1')
+        assert await cache.get('EUR') == Decimal('1.2')
+        assert calls == ['EUR', 'EUR']
+
+    @pytest.mark.asyncio
+    async def test_stale(self):
+        """Test stale rate is used if rate source fails."""
+        get_rate, _ = self.rate_source(
+            [Decimal('1.1'), RuntimeError('Api not available')],
+        )
+        cache = CurrencyRateCache(get_rate, ttl=0, max_staleness=600)
+
+        assert await cache.get('EUR') == Decimal('1.1')
+        assert await cache.get('EUR') == Decimal('1.1')
+        assert cache.stats['stale'] == 1
+
+    @pytest.mark.asyncio
+    async def test_too_stale(self):
+        """Test fail.
+
+        Case: cached rate is older than max staleness.
+        """
+        get_rate, _ = self.rate_source(
+            [Decimal('1.1'), RuntimeError('Api not available')],
+        )
+        cache = CurrencyRateCache(get_rate, ttl=0, max_staleness=0)
+
+        assert await cache.get('EUR') == Decimal('1.1')
+        with pytest.raises(RuntimeError):
+            await cache.get('EUR')
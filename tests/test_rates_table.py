@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+import pytest
+
+from billing.currency_rate.rates_table import (
+    ExchangeRates,
+    RatesTable,
+    rates_table,
+    refresh_rates,
+)
+
+
+class TestRatesTable:
+    """Test currency rates table."""
+
+    def test_empty(self):
+        """Test there are no rates before first snapshot."""
+        assert RatesTable().get_exchange_rates('EUR', 'USD') is None
+
+    def test_publish(self):
+        """Test publish snapshots."""
+        table = RatesTable()
+        first_snapshot = table.publish({'EUR': Decimal('1.1'), 'USD': 1})
+        second_snapshot = table.publish({'EUR': Decimal('1.2'), 'USD': 1})
+        assert second_snapshot.snapshot_id > first_snapshot.snapshot_id
+
+        assert table.get_exchange_rates('EUR', 'USD') == ExchangeRates(
+            from_rate=Decimal('1.2'),
+            to_rate=1,
+            snapshot_id=second_snapshot.snapshot_id,
+        )
+        # First snapshot is immutable
+        assert first_snapshot.rates['EUR'] == Decimal('1.1')
+        with pytest.raises(TypeError):
+            first_snapshot.rates['EUR'] = Decimal('1.3')
+
+    def test_stale(self):
+        """Test stale snapshot is not used."""
+        table = RatesTable()
+        snapshot = table.publish({'EUR': Decimal('1.1'), 'USD': 1})
+        table.snapshot = snapshot._replace(  # NOQA: WPS437
+            published_at=snapshot.published_at - 10 ** 6,
+        )
+        assert table.get_exchange_rates('EUR', 'USD') is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_rates():
+    """Test refresh all currencies rates."""
+    try:  # NOQA: WPS501
+        snapshot = await refresh_rates()
+        assert rates_table.snapshot is snapshot
+    finally:
+        rates_table.clear()
+    assert set(snapshot.rates) == {'USD', 'EUR', 'CAD', 'CNY'}
+    assert round(snapshot.rates['EUR'], 4) == Decimal('1.1532')
@@ -0,0 +1,39 @@
+from billing.views.db_routing import PRIMARY_PIN_COOKIE
+
+
+class TestDbRouting:
+    """Test routing of views reads."""
+
+    async def test_read_your_writes(self, cli, user_with_wallet):
+        """Test reads of client go to primary after its write."""
+        db_router = cli.app['db_router']
+        read_pools = []
+        read_pool = db_router.read_pool
+
+        def spy_read_pool(**kwargs):  # NOQA: WPS430
+            pool = read_pool(**kwargs)
+            read_pools.append(pool)
+            return pool
+        db_router.read_pool = spy_read_pool
+
+        response = await cli.post('/v1/transactions_history', data={'wallet_id': 1})
+        assert response.status == 200
+        assert read_pools == [db_router.replicas[0].pool]
+
+        response = await cli.post(
+            '/v1/wallet_top_up',
+            data={'wallet_id': 1, 'amount': '0.1'},
+        )
+        assert response.cookies[PRIMARY_PIN_COOKIE]['max-age'] == '5'
+        response = await cli.post('/v1/transactions_history', data={'wallet_id': 1})
+        assert response.status == 200
+        assert read_pools[1] is cli.app['db']
+
+    async def test_failed_write(self, cli, user_with_wallet):
+        """Test failed write does not pin reads."""
+        response = await cli.post(
+            '/v1/wallet_top_up',
+            data={'wallet_id': 5, 'amount': '0.1'},
+        )
+        assert response.status == 404
+        assert PRIMARY_PIN_COOKIE not in response.cookies
@@ -0,0 +1,121 @@
+import pytest
+from aiohttp import web
+from dynaconf import settings
+
+from billing.views.request_connection import (
+    DbMode,
+    request_connection,
+    request_db,
+)
+from main import init_app
+
+INSERT_USER = "INSERT INTO \"user\" (name, country, city) VALUES ('a', 'b', 'c')"
+
+
+async def insert_and_fail(request):
+    """Insert user and fail."""
+    conn = await request_connection(request)
+    await conn.execute(INSERT_USER)
+    raise ValueError('Failed')
+
+
+async def insert_user(request):
+    """Insert user."""
+    conn = await request_connection(request)
+    await conn.execute(INSERT_USER)
+    return web.json_response({})
+
+
+async def sleep(request):
+    """Long query."""
+    conn = await request_connection(request)
+    await conn.execute('SELECT pg_sleep(1)')
+    return web.json_response({})
+
+
+async def no_db(request):
+    """View without queries."""
+    return web.json_response({})
+
+
+@pytest.fixture
+def request_db_cli(loop, aiohttp_client, pg_database):
+    """Cli of app with views of all modes."""
+    app = init_app()
+    for mode in DbMode:
+        prefix = '/test/{0}'.format(mode.name.lower())
+        for handler in (insert_and_fail, insert_user, sleep, no_db):
+            app.router.add_get(
+                '{0}/{1}'.format(prefix, handler.__name__),
+                request_db(mode)(handler),
+            )
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+async def users_count(cli):
+    """Count of users in db."""
+    async with cli.app['db'].acquire() as conn:
+        return await conn.fetchval('SELECT count(*) FROM "user"')
+
+
+class TestRequestConnection:
+    """Test connection of request."""
+
+    async def test_commit(self, request_db_cli):
+        """Test write view is committed."""
+        response = await request_db_cli.get('/test/write/insert_user')
+        assert response.status == 200
+        assert await users_count(request_db_cli) == 1
+
+    async def test_rollback(self, request_db_cli):
+        """Test write view is rolled back on error."""
+        response = await request_db_cli.get('/test/write/insert_and_fail')
+        assert response.status == 500
+        assert await users_count(request_db_cli) == 0
+
+    async def test_read_only(self, request_db_cli):
+        """Test read only view can not write."""
+        response = await request_db_cli.get('/test/read_only/insert_user')
+        assert response.status == 500
+        assert await users_count(request_db_cli) == 0
+
+    @pytest.mark.parametrize('mode', ['write', 'read_only', 'no_transaction'])
+    async def test_statement_timeout(self, request_db_cli, monkeypatch, mode):
+        """Test long query is cancelled."""
+        monkeypatch.setattr(settings.REQUEST_DB, 'statement_timeout', 0.1)
+        response = await request_db_cli.get('/test/{0}/sleep'.format(mode))
+        assert response.status == 503
+        assert response.reason == 'Query timeout'
+        # Connection is released and usable
+        response = await request_db_cli.get('/test/write/insert_user')
+        assert response.status == 200
+
+    async def test_endpoint_timeout(self, request_db_cli, monkeypatch):
+        """Test timeout of endpoint overrides default."""
+        monkeypatch.setattr(settings.REQUEST_DB, 'statement_timeout', 0.1)
+        monkeypatch.setattr(
+            settings.REQUEST_DB,
+            'endpoints',
+            {'sleep': {'statement_timeout': 0}},
+        )
+        response = await request_db_cli.get('/test/write/sleep')
+        assert response.status == 200
+
+    async def test_lazy_acquire(self, request_db_cli, monkeypatch):
+        """Test connection is acquired by views which query db only."""
+        monkeypatch.setattr(settings.REQUEST_DB, 'acquire_timeout', 0.1)
+        pool = request_db_cli.app['db']
+        connections = [
+            await pool.acquire()
+            for _ in range(pool._maxsize)  # NOQA: WPS437
+        ]
+        try:
+            response = await request_db_cli.get('/test/write/no_db')
+            assert response.status == 200
+            response = await request_db_cli.get('/test/write/insert_user')
+            assert response.status == 503
+            assert response.reason == 'Database is busy'
+        finally:
+            for connection in connections:
+                await pool.release(connection)
+        assert await users_count(request_db_cli) == 0
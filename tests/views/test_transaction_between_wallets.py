@@ -1,13 +1,9 @@
-import billing.views.transaction_between_wallets  # NOQA: WPS301
+from decimal import Decimal
 
-
-async def transfer_between_wallets_job_mock(
-    from_wallet_id,
-    to_wallet_id,
-    amount,
-):
-    """Transfer job mock function."""
-    return None  # NOQA: WPS324
+from billing.db.models import (
+    transaction,
+    transaction_log,
+)
 
 
 class TestTransactionBetweenWallets:
@@ -20,14 +16,11 @@ class TestTransactionBetweenWallets:
         cli,
         user_with_wallet,
         user2_with_wallet,
-        monkeypatch,
     ):
-        """Test succes transaction."""
-        monkeypatch.setattr(
-            billing.views.transaction_between_wallets,
-            'transfer_between_wallets_job',
-            transfer_between_wallets_job_mock,
-        )
+        """Test succes transaction.
+
+        Transaction is queued for transfer workers.
+        """
         response = await cli.post(
             self.url,
             data={
@@ -38,6 +31,40 @@ class TestTransactionBetweenWallets:
         )
         response_json = await response.json()
         assert response_json['msg'] == 'Transaction created'
+        assert response_json['transaction_id'] == 1
+
+        async with cli.app['db'].acquire() as connection:
+            transaction_info = await connection.fetchrow(transaction.select())
+            assert transaction_info['id'] == 1
+            assert transaction_info['state'] == 'CREATED'
+            assert transaction_info['amount'] == Decimal('0.01')
+            logs = await connection.fetch(transaction_log.select())
+            assert len(logs) == 1
+
+    async def test_idempotency_key(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test retries with idempotency key create one transaction."""
+        for _ in range(2):
+            cli.app['idempotent_responses'].clear()
+            response = await cli.post(
+                self.url,
+                data={
+                    'from_wallet_id': 1,
+                    'to_wallet_id': 2,
+                    'amount': '0.01',
+                },
+                headers={'Idempotency-Key': 'transfer-1'},
+            )
+            response_json = await response.json()
+            assert response_json['transaction_id'] == 1
+
+        async with cli.app['db'].acquire() as connection:
+            transactions = await connection.fetch(transaction.select())
+            assert len(transactions) == 1
 
     async def test_fail_bad_amount_type(
         self,
@@ -0,0 +1,131 @@
+from decimal import Decimal
+
+from billing.db.models import (
+    transaction,
+    transaction_log,
+)
+
+
+class TestTransactionsBatch:
+    """Test batch of transactions between wallets."""
+
+    url = '/v1/transactions_batch'
+
+    async def test_success(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test succes batch.
+
+        Transactions are queued for transfer workers.
+        """
+        response = await cli.post(
+            self.url,
+            json={
+                'transactions': [
+                    {'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': '0.01'},
+                    {'from_wallet_id': 2, 'to_wallet_id': 1, 'amount': '0.02'},
+                ],
+            },
+        )
+        assert response.status == 200
+        response_json = await response.json()
+        assert response_json['transaction_ids'] == [1, 2]
+
+        async with cli.app['db'].acquire() as connection:
+            transactions = await connection.fetch(
+                transaction.select().order_by(transaction.c.id),
+            )
+            assert [
+                transaction_info['amount'] for transaction_info in transactions
+            ] == [Decimal('0.01'), Decimal('0.02')]
+            assert {
+                transaction_info['state'] for transaction_info in transactions
+            } == {'CREATED'}
+            logs = await connection.fetch(transaction_log.select())
+            assert len(logs) == 2
+
+    async def test_fail_empty(
+        self,
+        cli,
+    ):
+        """Test fail.
+
+        Case: empty batch.
+        """
+        response = await cli.post(self.url, json={'transactions': []})
+        assert response.status == 422
+
+    async def test_fail_negative_amount(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test fail.
+
+        Case: negative amount.
+        """
+        response = await cli.post(
+            self.url,
+            json={
+                'transactions': [
+                    {'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': '-10'},
+                ],
+            },
+        )
+        assert response.status == 422
+        response_json = await response.json()
+        assert response_json['transactions'] == {
+            '0': {'amount': ['Negative amount.']},
+        }
+
+    async def test_fail_transfer_yourself(
+        self,
+        cli,
+    ):
+        """Test fail.
+
+        Case: transfer yourself.
+        """
+        response = await cli.post(
+            self.url,
+            json={
+                'transactions': [
+                    {'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': '10'},
+                    {'from_wallet_id': 1, 'to_wallet_id': 1, 'amount': '10'},
+                ],
+            },
+        )
+        assert response.status == 422
+        response_text = await response.text()
+        assert response_text == '422: Transfer yourself (transaction 1)'
+
+    async def test_fail_bad_wallet(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test fail.
+
+        Case: wallets do not exist, nothing is created.
+        """
+        response = await cli.post(
+            self.url,
+            json={
+                'transactions': [
+                    {'from_wallet_id': 1, 'to_wallet_id': 2, 'amount': '10'},
+                    {'from_wallet_id': 4, 'to_wallet_id': 3, 'amount': '10'},
+                ],
+            },
+        )
+        assert response.status == 404
+        response_text = await response.text()
+        assert response_text == '404: Wallets 3, 4 do not exist'
+
+        async with cli.app['db'].acquire() as connection:
+            transactions = await connection.fetch(transaction.select())
+            assert not transactions
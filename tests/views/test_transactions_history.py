@@ -0,0 +1,132 @@
+from datetime import datetime
+from decimal import Decimal
+
+from billing.db.transaction import create_transactions
+
+
+class TestTransactionsHistory:
+    """Test transactions history."""
+
+    url = '/v1/transactions_history'
+
+    async def test_pages(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test history is read page by page."""
+        async with cli.app['db'].acquire() as connection:
+            for _ in range(5):
+                await create_transactions(
+                    connection,
+                    transfers=[(2, 1, Decimal('0.01'))],
+                )
+
+        transaction_ids = []
+        request_data = {'wallet_id': 1, 'limit': 2}
+        for _ in range(3):
+            response = await cli.post(self.url, json=request_data)
+            assert response.status == 200
+            response_json = await response.json()
+            transaction_ids.append(
+                [record['transaction_id'] for record in response_json['history']],
+            )
+            request_data['cursor'] = response_json['next_cursor']
+        assert transaction_ids == [[1, 2], [3, 4], [5]]
+        assert response_json['next_cursor'] is None
+
+    async def test_default_limit(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test empty history."""
+        response = await cli.post(self.url, json={'wallet_id': 1})
+        assert response.status == 200
+        response_json = await response.json()
+        assert response_json == {'history': [], 'next_cursor': None}
+
+    async def test_fail_bad_cursor(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: cursor is not cursor of history page.
+        """
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 1, 'cursor': 'bad'},
+        )
+        assert response.status == 422
+        response_text = await response.text()
+        assert response_text == '422: Bad cursor'
+
+    async def test_fail_big_limit(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: page size is bigger than maximum.
+        """
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 1, 'limit': 1001},
+        )
+        assert response.status == 422
+
+    async def test_fail_unknown_wallet(
+        self,
+        cli,
+    ):
+        """Test fail.
+
+        Case: wallet does not exists.
+        """
+        response = await cli.post(self.url, json={'wallet_id': 1})
+        assert response.status == 404
+
+    async def test_archived(
+        self,
+        cli,
+        archive,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test archived transactions are read with live ones."""
+        cli.app['archive'] = archive
+        async with cli.app['db'].acquire() as connection:
+            await create_transactions(
+                connection,
+                transfers=[(2, 1, Decimal('0.01'))] * 3,
+            )
+        await archive.write_segment([
+            {
+                'id': 100,
+                'from_wallet_id': 1,
+                'to_wallet_id': 2,
+                'amount': Decimal('0.02'),
+                'created_at': datetime(2020, 1, 1),
+                'state': 'SUCCESED',
+                'new_balance_from': Decimal('0.28'),
+                'new_balance_to': Decimal('0.42'),
+                'logs': [],
+            },
+        ])
+
+        transaction_ids = []
+        request_data = {'wallet_id': 1, 'limit': 2}
+        for _ in range(2):
+            response = await cli.post(self.url, json=request_data)
+            assert response.status == 200
+            response_json = await response.json()
+            transaction_ids.append(
+                [record['transaction_id'] for record in response_json['history']],
+            )
+            request_data['cursor'] = response_json['next_cursor']
+        assert transaction_ids == [[100, 1], [2, 3]]
+        assert response_json['next_cursor'] is None
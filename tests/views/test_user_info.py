@@ -0,0 +1,48 @@
+import asyncio
+
+from billing.db.models import user
+
+
+class TestUserInfo:
+    """Test user info."""
+
+    url = '/v1/user_info'
+
+    async def test_success(self, cli, user_with_wallet):
+        """Test user info."""
+        response = await cli.post(self.url, data={'user_id': 1})
+        assert response.status == 200
+        assert await response.json() == {
+            'name': 'Ivanov',
+            'city': 'Angarsk',
+            'country': 'Russia',
+            'balance': '0.3',
+            'currency': 'EUR',
+        }
+
+    async def test_not_found(self, cli, user_with_wallet):
+        """Test unknown user."""
+        response = await cli.post(self.url, data={'user_id': 2})
+        assert response.status == 404
+
+    async def test_cached(self, cli, user_with_wallet, wait_until):
+        """Test info is cached until balance is changed."""
+        await wait_until(lambda: cli.app['user_info_cache'].enabled)
+        await cli.post(self.url, data={'user_id': 1})
+        async with cli.app['db'].acquire() as connection:
+            await connection.execute(user.update().values(name='Petrov'))
+        response = await cli.post(self.url, data={'user_id': 1})
+        assert (await response.json())['name'] == 'Ivanov'
+
+        await cli.post(
+            '/v1/wallet_top_up',
+            data={'wallet_id': 1, 'amount': '0.2'},
+        )
+        for _ in range(100):
+            response = await cli.post(self.url, data={'user_id': 1})
+            response_json = await response.json()
+            if response_json['balance'] == '0.5':
+                break
+            await asyncio.sleep(0.01)
+        assert response_json['name'] == 'Petrov'
+        assert response_json['balance'] == '0.5'
@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from billing.db.models import (
+    Currency,
+    user,
+    wallet,
+)
+
+
+class TestUserRegisterBatch:
+    """Test batch user registration."""
+
+    url = '/v1/user_register_batch'
+
+    def default_user(self, name):
+        """Succesed default user data."""
+        return {
+            'name': name,
+            'country': 'Russia',
+            'city': 'Angarsk',
+            'currency': Currency.EUR.value,
+            'balance': '0.3',
+        }
+
+    async def test_success(self, cli):
+        """Test succes batch registration."""
+        users = [self.default_user('Ivanov'), self.default_user('Petrov')]
+        del users[1]['balance']  # NOQA: WPS420
+        response = await cli.post(self.url, json={'users': users})
+        assert response.status == 200
+        response_json = await response.json()
+        assert response_json['users'] == [
+            {'new_user_id': 1, 'new_wallet_id': 1},
+            {'new_user_id': 2, 'new_wallet_id': 2},
+        ]
+
+        async with cli.app['db'].acquire() as connection:
+            new_users = await connection.fetch(
+                user.select().order_by(user.c.id),
+            )
+            assert [
+                user_info['name'] for user_info in new_users
+            ] == ['Ivanov', 'Petrov']
+            new_wallets = await connection.fetch(
+                wallet.select().order_by(wallet.c.id),
+            )
+            assert [
+                wallet_info['balance'] for wallet_info in new_wallets
+            ] == [Decimal('0.3'), Decimal(0)]
+
+    async def test_fail_empty(self, cli):
+        """Test fail.
+
+        Case: empty batch.
+        """
+        response = await cli.post(self.url, json={'users': []})
+        assert response.status == 422
+
+    async def test_fail_negative_balance(self, cli):
+        """Test fail.
+
+        Case: negative balance, nothing is created.
+        """
+        users = [self.default_user('Ivanov'), self.default_user('Petrov')]
+        users[1]['balance'] = '-1'
+        response = await cli.post(self.url, json={'users': users})
+        assert response.status == 422
+        response_json = await response.json()
+        assert response_json['users'] == {
+            '1': {'balance': ['Negative balance.']},
+        }
+
+        async with cli.app['db'].acquire() as connection:
+            assert not await connection.fetch(user.select())
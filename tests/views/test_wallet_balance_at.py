@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from billing.db.wallet import add_to_wallet
+
+
+class TestWalletBalanceAt:
+    """Test wallet balance at time."""
+
+    url = '/v1/wallet_balance_at'
+
+    async def test_success(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test balance before and after top up."""
+        async with cli.app['db'].acquire() as connection:
+            at = await connection.fetchval('SELECT localtimestamp')
+            async with connection.transaction():
+                await add_to_wallet(
+                    connection,
+                    wallet_id=1,
+                    amount=Decimal('1'),
+                )
+
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 1, 'at': at.isoformat()},
+        )
+        assert response.status == 200
+        assert await response.json() == {'balance': '0.3'}
+
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 1, 'at': '2100-01-01T00:00:00'},
+        )
+        assert response.status == 200
+        assert await response.json() == {'balance': '1.3'}
+
+    async def test_fail_unknown_wallet(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: wallet does not exists.
+        """
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 2, 'at': '2020-01-01T00:00:00'},
+        )
+        assert response.status == 404
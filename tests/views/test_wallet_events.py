@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from dynaconf import settings
+
+from billing.db.transaction import create_transaction
+
+
+async def read_event(response):
+    """Read next server-sent event (heartbeats are skipped)."""
+    lines = []
+    while True:
+        line = (await response.content.readline()).decode().rstrip('\n')
+        if line:
+            lines.append(line)
+        elif lines and not lines[0].startswith(':'):
+            return dict(line.split(': ', 1) for line in lines)
+        else:
+            lines = []
+
+
+class TestWalletEvents:
+    """Test wallet events stream."""
+
+    url = '/v1/wallets/{0}/events'
+
+    async def test_success(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+        wait_until,
+        monkeypatch,
+    ):
+        """Test logs of wallet transactions are pushed."""
+        # Gone client is detected by heartbeat
+        monkeypatch.setattr(settings.WALLET_EVENTS, 'heartbeat_interval', 0.05)
+        wallet_events = cli.app['wallet_events']
+        await wait_until(lambda: wallet_events.listening)
+        response = await cli.get(self.url.format(2))
+        assert response.status == 200
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        await wait_until(lambda: len(wallet_events) == 1)
+
+        async with cli.app['db'].acquire() as connection:
+            transaction_id = await create_transaction(
+                connection,
+                from_wallet_id=1,
+                to_wallet_id=2,
+                amount='0.1',
+            )
+        event = await asyncio.wait_for(read_event(response), timeout=2)
+        assert event['event'] == 'transaction'
+        event_data = json.loads(event['data'])
+        assert event_data['transaction_id'] == transaction_id
+        assert event_data['state'] == 'CREATED'
+        assert event['id'] == str(event_data['id'])
+
+        response.close()
+        await wait_until(lambda: len(wallet_events) == 0)
+
+    async def test_not_listening(self, cli, user_with_wallet, wait_until):
+        """Test stream ends when events are not listened."""
+        wallet_events = cli.app['wallet_events']
+        await wait_until(lambda: wallet_events.listening)
+        response = await cli.get(self.url.format(1))
+        await wait_until(lambda: len(wallet_events) == 1)
+        wallet_events.set_listening(False)
+        assert await response.content.read() == b''
+
+        response = await cli.get(self.url.format(1))
+        assert response.status == 503
+
+    async def test_wallet_not_exists(self, cli, user_with_wallet):
+        """Test unknown wallet."""
+        response = await cli.get(self.url.format(2))
+        assert response.status == 404
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from billing.db.models import (
+    wallet,
+    wallet_shard,
+)
+
+
+class TestWalletShards:
+    """Test set wallet shards."""
+
+    url = '/v1/wallet_shards'
+
+    async def test_success(self, cli, user_with_wallet):
+        """Test wallet becomes hot."""
+        response = await cli.post(
+            self.url,
+            data={'wallet_id': 1, 'shards': 4},
+        )
+        response_json = await response.json()
+        assert response_json == {'wallet_id': 1, 'shards': 4}
+
+        response = await cli.post(
+            '/v1/wallet_top_up',
+            data={'wallet_id': 1, 'amount': '0.21'},
+        )
+        response_json = await response.json()
+        assert response_json['new_balance'] == '0.51'
+
+        async with cli.app['db'].acquire() as connection:
+            wallet_record = await connection.fetchrow(wallet.select())
+            assert wallet_record['shards'] == 4
+            assert wallet_record['balance'] == Decimal('0.3')
+            shards = await connection.fetch(wallet_shard.select())
+            assert len(shards) == 4
+
+    async def test_fail_bad_wallet_id(self, cli):
+        """Testing failed set wallet shards.
+
+        case: bad wallet id
+        """
+        response = await cli.post(
+            self.url,
+            data={'wallet_id': 2, 'shards': 4},
+        )
+        assert response.status == 404
+        response_text = await response.text()
+        assert response_text == '404: Wallet does not exists'
+
+    async def test_fail_bad_shards(self, cli, user_with_wallet):
+        """Testing failed set wallet shards.
+
+        case: negative shards count
+        """
+        response = await cli.post(
+            self.url,
+            data={'wallet_id': 1, 'shards': -1},
+        )
+        assert response.status == 422
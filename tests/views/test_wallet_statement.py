@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from billing.db.transaction import create_transactions
+from billing.views import wallet_statement
+
+
+class TestWalletStatement:
+    """Test wallet statement export."""
+
+    url = '/v1/wallet_statement'
+
+    async def create_transfers(self, cli, count):
+        """Create transfers to wallet 1."""
+        async with cli.app['db'].acquire() as connection:
+            await create_transactions(
+                connection,
+                transfers=[(2, 1, Decimal('0.01'))] * count,
+            )
+
+    async def test_ndjson(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+        monkeypatch,
+    ):
+        """Test statement is streamed chunk by chunk as json lines."""
+        monkeypatch.setattr(wallet_statement, 'CHUNK_SIZE', 2)
+        await self.create_transfers(cli, 5)
+
+        response = await cli.post(self.url, json={'wallet_id': 1})
+        assert response.status == 200
+        assert response.content_type == 'application/x-ndjson'
+        response_text = await response.text()
+        records = [json.loads(line) for line in response_text.splitlines()]
+        assert [record['transaction_id'] for record in records] == [
+            1, 2, 3, 4, 5,
+        ]
+        assert records[0]['amount'] == '0.01'
+        assert records[0]['state'] == 'CREATED'
+
+    async def test_csv(
+        self,
+        cli,
+        user_with_wallet,
+        user2_with_wallet,
+    ):
+        """Test statement as csv with header."""
+        await self.create_transfers(cli, 2)
+
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 2, 'format': 'csv'},
+        )
+        assert response.status == 200
+        assert response.content_type == 'text/csv'
+        rows = list(csv.reader(io.StringIO(await response.text())))
+        assert rows[0] == list(wallet_statement.STATEMENT_COLUMNS)
+        assert [row[0] for row in rows[1:]] == ['1', '2']
+
+    async def test_fail_unknown_wallet(
+        self,
+        cli,
+    ):
+        """Test fail.
+
+        Case: wallet does not exists.
+        """
+        response = await cli.post(self.url, json={'wallet_id': 1})
+        assert response.status == 404
+
+    async def test_fail_bad_format(
+        self,
+        cli,
+        user_with_wallet,
+    ):
+        """Test fail.
+
+        Case: unknown format.
+        """
+        response = await cli.post(
+            self.url,
+            json={'wallet_id': 1, 'format': 'xml'},
+        )
+        assert response.status == 422
@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+import asyncio
+
 from billing.db.models import wallet
 
 
@@ -40,6 +42,100 @@ class TestWalletTopUp:
             new_wallet = await connection.fetchrow(wallet.select())
             assert new_wallet['balance'] == Decimal('0.72')
 
+    async def test_concurrent_success(self, cli, user_with_wallet):
+        """Test concurrent top ups are coalesced."""
+        responses = await asyncio.gather(
+            *[
+                cli.post(self.url, data={'wallet_id': 1, 'amount': '0.1'})
+                for _ in range(3)
+            ],
+        )
+        new_balances = [
+            (await response.json())['new_balance'] for response in responses
+        ]
+        assert sorted(new_balances) == ['0.4', '0.5', '0.6']
+
+        async with cli.app['db'].acquire() as connection:
+            new_wallet = await connection.fetchrow(wallet.select())
+            assert new_wallet['balance'] == Decimal('0.6')
+
+    async def test_idempotency_key(self, cli, user_with_wallet):
+        """Test retries with idempotency key top up wallet once."""
+        request_data = {'wallet_id': 1, 'amount': '0.21'}
+        headers = {'Idempotency-Key': 'top-up-1'}
+        for _ in range(2):
+            response = await cli.post(
+                self.url,
+                data=request_data,
+                headers=headers,
+            )
+            response_json = await response.json()
+            assert response_json['new_balance'] == '0.51'
+
+        # Replay of stored response from db
+        cli.app['idempotent_responses'].clear()
+        response = await cli.post(self.url, data=request_data, headers=headers)
+        response_json = await response.json()
+        assert response_json['new_balance'] == '0.51'
+
+        # Other key is other top up
+        response = await cli.post(
+            self.url,
+            data=request_data,
+            headers={'Idempotency-Key': 'top-up-2'},
+        )
+        response_json = await response.json()
+        assert response_json['new_balance'] == '0.72'
+
+        async with cli.app['db'].acquire() as connection:
+            new_wallet = await connection.fetchrow(wallet.select())
+            assert new_wallet['balance'] == Decimal('0.72')
+
+    async def test_fail_reused_idempotency_key(self, cli, user_with_wallet):
+        """Testing failed wallet top up.
+
+        case: idempotency key is reused with other amount
+        """
+        headers = {'Idempotency-Key': 'top-up-1'}
+        response = await cli.post(
+            self.url,
+            data={'wallet_id': 1, 'amount': '0.21'},
+            headers=headers,
+        )
+        assert response.status == 200
+
+        for _ in range(2):
+            response = await cli.post(
+                self.url,
+                data={'wallet_id': 1, 'amount': '0.5'},
+                headers=headers,
+            )
+            assert response.status == 422
+            # Db check after cached response check
+            cli.app['idempotent_responses'].clear()
+
+        async with cli.app['db'].acquire() as connection:
+            new_wallet = await connection.fetchrow(wallet.select())
+            assert new_wallet['balance'] == Decimal('0.51')
+
+    async def test_fail_bad_wallet_id_idempotency_key(self, cli):
+        """Testing failed wallet top up.
+
+        case: bad wallet id, request with idempotency key is replayed
+        """
+        request_data = {'wallet_id': 2, 'amount': '0.21'}
+        headers = {'Idempotency-Key': 'top-up-1'}
+        for _ in range(2):
+            response = await cli.post(
+                self.url,
+                data=request_data,
+                headers=headers,
+            )
+            assert response.status == 404
+            response_text = await response.text()
+            assert response_text == '404: Wallet does not exists'
+            cli.app['idempotent_responses'].clear()
+
     async def test_fail_bad_wallet_id(self, cli):
         """Testing failed wallet top up.
 